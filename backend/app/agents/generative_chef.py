@@ -7,37 +7,57 @@ Uses Groq primary / Ollama fallback (same pattern as substitution_expert).
 """
 
 import json
-import re
+import logging
 
 from langchain_ollama import ChatOllama
 from langchain_core.messages import HumanMessage
 
 from app.config import Settings
-from app.tools.notion_pantry import query_pantry_inventory
-from app.services.academic_fuel import calculate_academic_fuel_score
+from app.tools.notion_pantry import get_pantry_food_items
+from app.services.academic_fuel import calculate_academic_fuel_scores
+from app.services.metrics import time_stage
+from app.services.prompt_context import select_for_generation
+from app.services.single_flight import canonical_key, llm_flights
+from app.services.rate_governor import groq_governor
+from app.services.structured_output import StructuredOutputError, ainvoke_structured, groq_json_mode
 from app.schemas.recipes import (
     GenerateRecipesResponse,
     Recipe,
     RecipeIngredient,
 )
 from app.schemas.common import IngredientStatus
+from app.schemas.llm import GeneratedRecipe, GeneratedRecipes
+
+logger = logging.getLogger(__name__)
+
+# Completion tokens reserved against Groq's TPM budget per generation (1-3 recipes)
+CHEF_COMPLETION_TOKENS = 1024
 
 
 def _get_text_llm(settings: Settings):
     """Get the text LLM: Groq primary, Ollama fallback."""
     if settings.GROQ_API_KEY:
         from langchain_groq import ChatGroq
-        print("[GenerativeChef] Using Groq cloud LLM (primary)")
+        logger.debug("Using Groq cloud LLM (primary)")
         return ChatGroq(
             api_key=settings.GROQ_API_KEY,
             model=settings.GROQ_MODEL,
             temperature=0.7,
+            model_kwargs=groq_json_mode(),
+            http_async_client=groq_governor.http_async_client(),
         )
-    print("[GenerativeChef] Using Ollama local LLM (no Groq key configured)")
+    logger.debug("Using Ollama local LLM (no Groq key configured)")
+    return _get_ollama_llm(settings)
+
+
+def _get_ollama_llm(settings: Settings) -> ChatOllama:
+    """Ollama constrained to the GeneratedRecipes JSON schema."""
     return ChatOllama(
         model=settings.OLLAMA_TEXT_MODEL,
         base_url=settings.OLLAMA_BASE_URL,
+        keep_alive=settings.OLLAMA_KEEP_ALIVE,
         temperature=0.7,
+        format=GeneratedRecipes.model_json_schema(),
     )
 
 
@@ -71,44 +91,56 @@ IMPORTANT RULES:
 - If the ingredients are not enough to make a recipe, don't give one.
 -Sort ingerdients by complexity, the simple ones should be at the bottom.
 
-Return ONLY a JSON array of recipes in this exact format, no other text:
-[
-  {{
-    "title": "Recipe Name",
-    "ingredients": [
-      {{"name": "Ingredient Name", "quantity": "amount"}},
-    ],
-    "instructions": [
-      "Step 1...",
-      "Step 2..."
-    ]
-  }}
-]
-
-Return ONLY the JSON array, no markdown fences, no explanation."""
-
-
-def _parse_recipes_json(content: str) -> list[dict]:
-    """Parse LLM response into recipe dicts, handling common formatting issues."""
-    # Try direct parse
-    try:
-        data = json.loads(content)
-        if isinstance(data, list):
-            return data
-    except json.JSONDecodeError:
-        pass
-
-    # Try extracting JSON array from response
-    match = re.search(r"\[.*\]", content, re.DOTALL)
-    if match:
-        try:
-            data = json.loads(match.group())
-            if isinstance(data, list):
-                return data
-        except json.JSONDecodeError:
-            pass
+Return ONLY a JSON object in this exact format, no other text:
+{{
+  "recipes": [
+    {{
+      "title": "Recipe Name",
+      "ingredients": [
+        {{"name": "Ingredient Name", "quantity": "amount"}}
+      ],
+      "instructions": [
+        "Step 1...",
+        "Step 2..."
+      ]
+    }}
+  ]
+}}
+
+If no recipe fits, return {{"recipes": []}}.
+Return ONLY the JSON object, no markdown fences, no explanation."""
+
+
+async def _generate(prompt: str, settings: Settings) -> list[GeneratedRecipe]:
+    """Run the chef prompt (Groq primary, Ollama fallback) and return the validated recipes."""
+    provider = "groq" if settings.GROQ_API_KEY else "ollama"
+    # Queue for Groq's rate budget unless the wait would outlast an Ollama call
+    if provider == "groq" and not await groq_governor.acquire(
+        "chef", prompt, CHEF_COMPLETION_TOKENS, can_fall_back=bool(settings.OLLAMA_BASE_URL)
+    ):
+        provider = "ollama"
+    llm = _get_text_llm(settings) if provider == "groq" else _get_ollama_llm(settings)
+    messages = [HumanMessage(content=prompt)]
 
-    return []
+    try:
+        with time_stage("chef_generation"):
+            result = await ainvoke_structured(llm, messages, GeneratedRecipes, provider, "chef")
+        logger.debug("LLM call succeeded", extra={"provider": provider})
+    except StructuredOutputError:
+        raise
+    except Exception as e:
+        logger.warning("Primary LLM failed: %s", e, extra={"provider": provider})
+        # Groq failed — try Ollama fallback
+        if provider == "groq" and settings.OLLAMA_BASE_URL:
+            logger.info("Falling back to Ollama local LLM")
+            with time_stage("chef_generation"):
+                result = await ainvoke_structured(
+                    _get_ollama_llm(settings), messages, GeneratedRecipes, "ollama", "chef"
+                )
+            logger.debug("Ollama fallback succeeded")
+        else:
+            raise
+    return result.recipes
 
 
 async def run_generative_chef(
@@ -116,86 +148,82 @@ async def run_generative_chef(
     filters: list[str],
     dietary_preferences: list[str],
     settings: Settings,
+    available: list[str] | None = None,
 ) -> GenerateRecipesResponse:
     """
     Generate fully original recipes using AI based on available ingredients.
     No spreadsheet lookup — purely LLM-generated.
-    """
-    # Step 1: Get pantry inventory to combine with scanned items
-    try:
-        pantry_json = await query_pantry_inventory.ainvoke({"category": ""})
-        pantry_items_raw = json.loads(pantry_json)
-        pantry_names = [item["name"] for item in pantry_items_raw]
-    except Exception:
-        pantry_names = []
-
-    all_available = list(set(ingredients + pantry_names))
-    print(f"[GenerativeChef] User items: {ingredients}")
-    print(f"[GenerativeChef] Notion pantry items: {pantry_names}")
-    print(f"[GenerativeChef] Combined available ({len(all_available)}): {all_available}")
-
-    # Step 2: Build prompt and call LLM
-    prompt = _build_prompt(all_available, filters, dietary_preferences)
-    llm = _get_text_llm(settings)
 
+    `available` is the precomputed user + pantry item list from a scan
+    session; when given, the pantry fetch and merge are skipped.
+    """
+    if available is None:
+        # Step 1: Get pantry inventory to combine with scanned items
+        try:
+            pantry_names = [item.name for item in await get_pantry_food_items()]
+        except Exception:
+            pantry_names = []
+
+        all_available = list(set(ingredients + pantry_names))
+        logger.debug("Merged user and pantry items", extra={"user_items": ingredients, "pantry_items": pantry_names})
+    else:
+        all_available = available
+        logger.debug("Reusing scan session items", extra={"user_items": ingredients})
+    logger.debug("Combined available items", extra={"available_count": len(all_available)})
+
+    # Step 2: Build prompt and call LLM. Identical concurrent requests (same
+    # items, filters and preferences) share one in-flight generation.
+    # Only the user's items plus the pantry items that best complement them
+    # go into the prompt, capped at the token budget.
+    prompt_items = all_available
+    if settings.PROMPT_PANTRY_TOKEN_BUDGET > 0:
+        prompt_items = select_for_generation(ingredients, all_available, settings.PROMPT_PANTRY_TOKEN_BUDGET)
+    prompt = _build_prompt(prompt_items, filters, dietary_preferences)
+    key = canonical_key(
+        "chef",
+        settings.GROQ_MODEL if settings.GROQ_API_KEY else settings.OLLAMA_TEXT_MODEL,
+        sorted({item.strip().lower() for item in prompt_items}),
+        sorted(filters),
+        sorted(dietary_preferences),
+    )
     try:
-        response = await llm.ainvoke([HumanMessage(content=prompt)])
-        print("[GenerativeChef] LLM call succeeded")
-    except Exception as e:
-        print(f"[GenerativeChef] Primary LLM failed: {e}")
-        # Groq failed — try Ollama fallback
-        if settings.GROQ_API_KEY and settings.OLLAMA_BASE_URL:
-            print("[GenerativeChef] Falling back to Ollama local LLM...")
-            fallback = ChatOllama(
-                model=settings.OLLAMA_TEXT_MODEL,
-                base_url=settings.OLLAMA_BASE_URL,
-                temperature=0.7,
-            )
-            response = await fallback.ainvoke([HumanMessage(content=prompt)])
-            print("[GenerativeChef] Ollama fallback succeeded")
-        else:
-            raise
-
-    # Step 3: Parse response
-    raw_recipes = _parse_recipes_json(response.content)
-    if not raw_recipes:
-        print(f"[GenerativeChef] Failed to parse LLM response: {response.content[:200]}")
+        generated = await llm_flights.do(key, lambda: _generate(prompt, settings), label="chef")
+    except StructuredOutputError as e:
+        # Already retried once with the validation error; give up on this request
+        logger.warning("LLM reply failed validation after repair", extra={"error": str(e)[:200]})
         return GenerateRecipesResponse(recipes=[])
 
     # Step 4: Build Recipe objects with academic fuel scoring
-    available_set = {item.strip().lower() for item in all_available}
-    recipes = []
-    for i, raw in enumerate(raw_recipes):
+    parsed = []
+    for generated_recipe in generated:
         recipe_ings = []
         ing_names = []
 
-        for ing in raw.get("ingredients", []):
-            name = ing.get("name", "") if isinstance(ing, dict) else str(ing)
-            quantity = ing.get("quantity", "") if isinstance(ing, dict) else ""
-            display_name = f"{quantity} {name}".strip() if quantity else name
+        for ing in generated_recipe.ingredients:
+            display_name = f"{ing.quantity} {ing.name}".strip() if ing.quantity else ing.name
 
             recipe_ings.append(RecipeIngredient(
                 name=display_name,
                 status=IngredientStatus.available,
                 substitution=None,
             ))
-            ing_names.append(name)
+            ing_names.append(ing.name)
 
-        # Academic fuel score
-        score, summary = calculate_academic_fuel_score(ing_names)
+        parsed.append((recipe_ings, ing_names))
 
-        instructions = raw.get("instructions", [])
-        if isinstance(instructions, str):
-            instructions = [s.strip() for s in instructions.split("\n") if s.strip()]
+    # Academic fuel scores for all generated recipes in one batch
+    scores = calculate_academic_fuel_scores([ing_names for _, ing_names in parsed])
 
+    recipes = []
+    for i, (generated_recipe, (recipe_ings, _), (score, summary)) in enumerate(zip(generated, parsed, scores)):
         recipes.append(Recipe(
             id=f"ai_recipe_{i + 1:03d}",
-            title=raw.get("title", "AI Chef Recipe"),
+            title=generated_recipe.title,
             academic_fuel_score=score,
             fuel_summary=summary,
             ingredients=recipe_ings,
-            instructions=instructions,
+            instructions=generated_recipe.instructions,
         ))
 
-    print(f"[GenerativeChef] Generated {len(recipes)} recipes")
+    logger.info("Generated recipes", extra={"count": len(recipes)})
     return GenerateRecipesResponse(recipes=recipes)
@@ -2,20 +2,20 @@
 Planner Agent: top-level orchestration for recipe generation.
 Uses LangChain tool-calling agent with ChatOllama to decide when to call
 the Recipe Database Tool vs the Substitution Tool.
-"""
 
-import json
+The direct pipeline calls the typed service functions behind those tools
+(search_recipes, get_pantry_food_items) and gets Python objects back; the
+@tool wrappers only serialize for an agent.
+"""
 
-from langchain_ollama import ChatOllama
-from langchain_core.messages import SystemMessage, HumanMessage
-from langgraph.prebuilt import create_react_agent
+import logging
 
 from app.config import Settings
-from app.tools.google_sheets_recipes import query_recipe_database
-from app.tools.notion_pantry import query_pantry_inventory
-from app.tools.substitution import run_substitution_check
-from app.agents.substitution_expert import run_substitution_check as direct_substitution
-from app.services.academic_fuel import calculate_academic_fuel_score
+from app.tools.google_sheets_recipes import search_recipes
+from app.tools.notion_pantry import get_pantry_food_items
+from app.agents.substitution_expert import table_substitution_pass, fill_llm_substitutions
+from app.services.metrics import time_stage
+from app.services.recipe_facets import requested_facets
 from app.schemas.recipes import (
     GenerateRecipesResponse,
     Recipe,
@@ -23,6 +23,8 @@ from app.schemas.recipes import (
 )
 from app.schemas.common import IngredientStatus
 
+logger = logging.getLogger(__name__)
+
 PLANNER_SYSTEM = """You are the Planner agent for Scan, Swap, Sustain — a food equity app
 for UC Davis students. Given a list of available pantry ingredients and user preferences:
 
@@ -38,13 +40,68 @@ async def run_planner_agent(
     filters: list[str],
     dietary_preferences: list[str],
     settings: Settings,
+    available: list[str] | None = None,
+    prepared: dict | None = None,
 ) -> GenerateRecipesResponse:
     """
     Orchestrate recipe generation.
     Uses the direct pipeline (more reliable for hackathon).
     Falls back gracefully on any error.
+
+    `available` is the precomputed user + pantry item list from a scan
+    session; when given, the pantry fetch and merge are skipped.
+    `prepared` is a prefetched result of prepare_candidates(); when given,
+    only the LLM substitution pass is left to run.
     """
-    return await _direct_pipeline(ingredients, filters, dietary_preferences, settings)
+    return await _direct_pipeline(ingredients, filters, dietary_preferences, settings, available, prepared)
+
+
+async def prepare_candidates(
+    ingredients: list[str],
+    available: list[str] | None = None,
+    facets: list[str] | None = None,
+) -> dict:
+    """
+    Everything in the direct pipeline that doesn't need an LLM: pantry merge,
+    recipe search, table substitution pass and academic fuel scoring.
+    Returns plain JSON-serializable data so it can be parked in a scan session.
+
+    `facets` (see recipe_facets) restrict the search, so recipes the user
+    filtered out never reach the substitution passes.
+    """
+    facets = facets or []
+    if available is None:
+        # Step 1: Get pantry inventory
+        pantry_names = [item.name for item in await get_pantry_food_items()]
+
+        all_available = list(set(ingredients + pantry_names))
+        logger.debug("Merged user and pantry items", extra={"user_items": ingredients, "pantry_items": pantry_names})
+    else:
+        all_available = available
+        logger.debug("Reusing scan session items", extra={"user_items": ingredients})
+
+    # Step 2: Search recipes
+    logger.debug("Combined available items", extra={"available_count": len(all_available)})
+    recipes = await search_recipes(all_available, max_results=5, facets=facets)
+
+    # Step 3: For each recipe, run table substitution pass (ingredient lines,
+    # instructions and academic fuel scores all come parsed from the recipe index)
+    candidates = []
+    for recipe in recipes:
+        with time_stage("table_substitution"):
+            sub_results, llm_needed = table_substitution_pass(recipe.ingredient_lines, all_available)
+
+        candidates.append({
+            "id": recipe.id,
+            "title": recipe.title,
+            "ingredients": sub_results,
+            "llm_needed": llm_needed,
+            "instructions": list(recipe.instructions),
+            "academic_fuel_score": recipe.academic_fuel_score,
+            "fuel_summary": recipe.fuel_summary,
+        })
+
+    return {"available": all_available, "candidates": candidates, "facets": facets}
 
 
 async def _direct_pipeline(
@@ -52,52 +109,34 @@ async def _direct_pipeline(
     filters: list[str],
     dietary_preferences: list[str],
     settings: Settings,
+    available: list[str] | None = None,
+    prepared: dict | None = None,
 ) -> GenerateRecipesResponse:
     """
     Direct pipeline: call tools sequentially without agent orchestration.
     More reliable for hackathon demo.
     """
-    # Step 1: Get pantry inventory
-    pantry_json = await query_pantry_inventory.ainvoke({"category": ""})
-    try:
-        pantry_items_raw = json.loads(pantry_json)
-        pantry_names = [item["name"] for item in pantry_items_raw]
-    except (json.JSONDecodeError, KeyError):
-        pantry_names = ingredients  # fallback to user-provided items
-
-    # Step 2: Search recipes
-    all_available = list(set(ingredients + pantry_names))
-    print(f"[Planner] User items: {ingredients}")
-    print(f"[Planner] Notion pantry items: {pantry_names}")
-    print(f"[Planner] Combined available ({len(all_available)}): {all_available}")
-    recipes_json = await query_recipe_database.ainvoke({
-        "ingredients": all_available,
-        "max_results": 5,
-    })
-
-    try:
-        raw_recipes = json.loads(recipes_json)
-    except json.JSONDecodeError:
-        raw_recipes = []
-
-    # Step 3: For each recipe, run substitution check + academic fuel scoring
+    # Filters and dietary preferences that map to recipe facets prune the search
+    facets = requested_facets(filters + dietary_preferences)
+    if prepared is not None and prepared.get("facets", []) != facets:
+        logger.debug("Prefetched candidates were searched without these facets", extra={"facets": facets})
+        prepared = None
+
+    if prepared is None:
+        prepared = await prepare_candidates(ingredients, available, facets)
+    else:
+        logger.debug("Using prefetched candidates", extra={"user_items": ingredients})
+
+    # Step 4: LLM substitution for anything the table didn't cover
     recipes = []
-    for i, raw in enumerate(raw_recipes):
-        # Ingredient lines are already parsed by the sheets tool
-        recipe_ingredients = raw.get("ingredient_lines", [])
-        if not recipe_ingredients:
-            # Fallback: split newline-separated raw text
-            recipe_ingredients = [
-                line.strip()
-                for line in raw.get("ingredients_raw", "").split("\n")
-                if line.strip()
-            ]
-
-        # Run substitution expert
-        sub_results = await direct_substitution(
-            recipe_ingredients=recipe_ingredients,
-            pantry_items=all_available,
-            settings=settings,
+    for candidate in prepared["candidates"]:
+        # Copy so a prefetched session result isn't mutated by the LLM pass
+        sub_results = [dict(sub) for sub in candidate["ingredients"]]
+        await fill_llm_substitutions(
+            sub_results,
+            candidate["llm_needed"],
+            prepared["available"],
+            settings,
         )
 
         # Build ingredient list
@@ -109,28 +148,13 @@ async def _direct_pipeline(
                 substitution=sub.get("substitution"),
             ))
 
-        # Academic fuel score
-        ing_names = [sub["name"] for sub in sub_results]
-        score, summary = calculate_academic_fuel_score(ing_names)
-
-        # Instructions are already parsed by the sheets tool
-        instructions = raw.get("instructions", [])
-        if not instructions:
-            instructions_raw = raw.get("instructions_raw", "")
-            instructions = [
-                s.strip() for s in instructions_raw.split("\n")
-                if s.strip()
-            ]
-
         recipes.append(Recipe(
-            id=raw.get("id", f"recipe_{i + 1:03d}"),
-            title=raw.get("title", "Untitled Recipe"),
-            academic_fuel_score=score,
-            fuel_summary=summary,
+            id=candidate["id"],
+            title=candidate["title"],
+            academic_fuel_score=candidate["academic_fuel_score"],
+            fuel_summary=candidate["fuel_summary"],
             ingredients=recipe_ings,
-            instructions=instructions,
+            instructions=candidate["instructions"],
         ))
 
     return GenerateRecipesResponse(recipes=recipes)
-
-
@@ -5,12 +5,26 @@ Uses a hardcoded substitution table for accuracy, with LLM fallback for edge cas
 """
 
 import json
+import logging
 import re
 
 from langchain_ollama import ChatOllama
 from langchain_core.messages import SystemMessage, HumanMessage
 
 from app.config import Settings
+from app.services.fuzzy_match import FuzzyIndex, index_for
+from app.services.vocabulary import vocabulary
+from app.services.metrics import time_stage
+from app.services.prompt_context import select_for_substitution
+from app.services.single_flight import canonical_key, llm_flights
+from app.services.rate_governor import groq_governor
+from app.services.structured_output import StructuredOutputError, ainvoke_structured, groq_json_mode
+from app.schemas.llm import Substitutions
+
+logger = logging.getLogger(__name__)
+
+# Completion tokens reserved against Groq's TPM budget per substitution call
+SUBSTITUTION_COMPLETION_TOKENS = 256
 
 # Hardcoded cooking substitution table.
 # Key = missing ingredient (lowercase), Value = (substitution description, category hint)
@@ -103,6 +117,12 @@ SUBSTITUTION_TABLE: dict[str, str] = {
     "flour": "blended Oats",
 }
 
+# Table keys by vocabulary id, so "Tomato" or "garbanzo beans" find their entry
+# without a partial scan. The first spelling listed wins ("egg" over "eggs").
+SUBSTITUTION_BY_ID: dict[int, str] = {}
+for _key, _sub in SUBSTITUTION_TABLE.items():
+    SUBSTITUTION_BY_ID.setdefault(vocabulary.intern(_key), _sub)
+
 
 def _normalize_ingredient(raw: str) -> str:
     """Strip quantities, units, and prep notes to get the base ingredient name."""
@@ -143,17 +163,9 @@ def _normalize_ingredient(raw: str) -> str:
     return cleaned.strip().lower()
 
 
-def _is_available(ingredient: str, pantry_set: set[str]) -> bool:
+def _is_available(ingredient: str, pantry: FuzzyIndex) -> bool:
     """Check if an ingredient is available in the pantry (fuzzy match)."""
-    norm = _normalize_ingredient(ingredient)
-    # Direct match
-    if norm in pantry_set:
-        return True
-    # Check if any pantry item contains the ingredient or vice versa
-    for pantry_item in pantry_set:
-        if norm in pantry_item or pantry_item in norm:
-            return True
-    return False
+    return pantry.contains(_normalize_ingredient(ingredient))
 
 
 def _find_substitution(ingredient: str) -> str | None:
@@ -164,6 +176,11 @@ def _find_substitution(ingredient: str) -> str | None:
     if norm in SUBSTITUTION_TABLE:
         return SUBSTITUTION_TABLE[norm]
 
+    # Same canonical ingredient (plural, alias)
+    ingredient_id = vocabulary.lookup(norm)
+    if ingredient_id in SUBSTITUTION_BY_ID:
+        return SUBSTITUTION_BY_ID[ingredient_id]
+
     # Partial match — check if any table key is contained in the ingredient
     for key, sub in SUBSTITUTION_TABLE.items():
         if key in norm or norm in key:
@@ -172,22 +189,22 @@ def _find_substitution(ingredient: str) -> str | None:
     return None
 
 
-async def run_substitution_check(
+def table_substitution_pass(
     recipe_ingredients: list[str],
     pantry_items: list[str],
-    settings: Settings,
-) -> list[dict]:
+) -> tuple[list[dict], list[str]]:
     """
-    Check each recipe ingredient against pantry, suggest substitutions for missing ones.
+    Check each recipe ingredient against pantry and the hardcoded table.
 
-    Uses the hardcoded table first, LLM fallback for unknowns.
+    Returns (results, llm_needed): missing items with no table entry are left
+    with substitution None and listed in llm_needed for the LLM pass.
     """
-    pantry_set = {p.strip().lower() for p in pantry_items}
+    pantry = index_for(p.strip().lower() for p in pantry_items)
     results = []
     llm_needed = []
 
     for ing in recipe_ingredients:
-        if _is_available(ing, pantry_set):
+        if _is_available(ing, pantry):
             results.append({
                 "name": ing,
                 "status": "available",
@@ -210,10 +227,20 @@ async def run_substitution_check(
                     "substitution": None,  # placeholder
                 })
 
-    # LLM fallback for items not in the table
+    return results, llm_needed
+
+
+async def fill_llm_substitutions(
+    results: list[dict],
+    llm_needed: list[str],
+    pantry_items: list[str],
+    settings: Settings,
+) -> list[dict]:
+    """LLM fallback for items the table pass couldn't cover. Updates results in place."""
     if llm_needed:
         try:
-            llm_subs = await _llm_substitution(llm_needed, pantry_items, settings)
+            with time_stage("llm_substitution"):
+                llm_subs = await _llm_substitution(llm_needed, pantry_items, settings)
             # Merge LLM results back
             for r in results:
                 if r["substitution"] is None and r["status"] == "missing":
@@ -226,21 +253,45 @@ async def run_substitution_check(
     return results
 
 
+async def run_substitution_check(
+    recipe_ingredients: list[str],
+    pantry_items: list[str],
+    settings: Settings,
+) -> list[dict]:
+    """
+    Check each recipe ingredient against pantry, suggest substitutions for missing ones.
+
+    Uses the hardcoded table first, LLM fallback for unknowns.
+    """
+    with time_stage("table_substitution"):
+        results, llm_needed = table_substitution_pass(recipe_ingredients, pantry_items)
+    return await fill_llm_substitutions(results, llm_needed, pantry_items, settings)
+
+
 def _get_text_llm(settings: Settings):
     """Get the text LLM: Groq primary, Ollama fallback."""
     if settings.GROQ_API_KEY:
         from langchain_groq import ChatGroq
-        print("[SubstitutionExpert] Using Groq cloud LLM (primary)")
+        logger.debug("Using Groq cloud LLM (primary)")
         return ChatGroq(
             api_key=settings.GROQ_API_KEY,
             model=settings.GROQ_MODEL,
             temperature=0,
+            model_kwargs=groq_json_mode(),
+            http_async_client=groq_governor.http_async_client(),
         )
-    print("[SubstitutionExpert] Using Ollama local LLM (no Groq key configured)")
+    logger.debug("Using Ollama local LLM (no Groq key configured)")
+    return _get_ollama_llm(settings)
+
+
+def _get_ollama_llm(settings: Settings) -> ChatOllama:
+    """Ollama constrained to the Substitutions JSON schema."""
     return ChatOllama(
         model=settings.OLLAMA_TEXT_MODEL,
         base_url=settings.OLLAMA_BASE_URL,
+        keep_alive=settings.OLLAMA_KEEP_ALIVE,
         temperature=0,
+        format=Substitutions.model_json_schema(),
     )
 
 
@@ -250,7 +301,28 @@ async def _llm_substitution(
     settings: Settings,
 ) -> dict[str, str | None]:
     """Ask the LLM for substitutions for items not in the hardcoded table.
-    Uses Groq (fast cloud) primary, Ollama (local) fallback."""
+    Concurrent identical asks (same missing items and pantry) share one call."""
+    if settings.PROMPT_PANTRY_TOKEN_BUDGET > 0:
+        # Only the pantry items most relevant to the missing ones go into the prompt
+        pantry_items = select_for_substitution(missing_items, pantry_items, settings.PROMPT_PANTRY_TOKEN_BUDGET)
+    key = canonical_key(
+        "substitution",
+        settings.GROQ_MODEL if settings.GROQ_API_KEY else settings.OLLAMA_TEXT_MODEL,
+        sorted(missing_items),
+        sorted(pantry_items),
+    )
+    subs = await llm_flights.do(
+        key, lambda: _call_substitution_llm(missing_items, pantry_items, settings), label="substitution"
+    )
+    return dict(subs)
+
+
+async def _call_substitution_llm(
+    missing_items: list[str],
+    pantry_items: list[str],
+    settings: Settings,
+) -> dict[str, str | None]:
+    """Uses Groq (fast cloud) primary, Ollama (local) fallback."""
 
     prompt = f"""You are a cooking substitution expert. For each missing ingredient below,
 suggest a practical cooking substitution using ONLY items from the available pantry list.
@@ -264,38 +336,33 @@ Example: {{"ginger": "1/4 tsp dried ginger", "saffron": null}}
 Return ONLY the JSON object, no other text."""
 
     # Try Groq first, fall back to Ollama
-    llm = _get_text_llm(settings)
+    provider = "groq" if settings.GROQ_API_KEY else "ollama"
+    # Queue for Groq's rate budget unless the wait would outlast an Ollama call
+    if provider == "groq" and not await groq_governor.acquire(
+        "substitution", prompt, SUBSTITUTION_COMPLETION_TOKENS, can_fall_back=bool(settings.OLLAMA_BASE_URL)
+    ):
+        provider = "ollama"
+    llm = _get_text_llm(settings) if provider == "groq" else _get_ollama_llm(settings)
+    messages = [HumanMessage(content=prompt)]
     try:
-        response = await llm.ainvoke([HumanMessage(content=prompt)])
-        print("[SubstitutionExpert] LLM call succeeded (Groq)" if settings.GROQ_API_KEY else "[SubstitutionExpert] LLM call succeeded (Ollama)")
-    except Exception as e:
-        print(f"[SubstitutionExpert] Primary LLM failed: {e}")
-        # Groq failed (rate limit, network, etc.) — try Ollama
-        if settings.GROQ_API_KEY and settings.OLLAMA_BASE_URL:
-            print("[SubstitutionExpert] Falling back to Ollama local LLM...")
-            fallback = ChatOllama(
-                model=settings.OLLAMA_TEXT_MODEL,
-                base_url=settings.OLLAMA_BASE_URL,
-                temperature=0,
+        try:
+            result = await ainvoke_structured(llm, messages, Substitutions, provider, "substitution")
+            logger.debug("LLM call succeeded", extra={"provider": provider})
+        except StructuredOutputError:
+            raise
+        except Exception as e:
+            logger.warning("Primary LLM failed: %s", e, extra={"provider": provider})
+            # Groq failed (rate limit, network, etc.) — try Ollama
+            if not (provider == "groq" and settings.OLLAMA_BASE_URL):
+                logger.warning("No fallback available, returning empty")
+                return {}
+            logger.info("Falling back to Ollama local LLM")
+            result = await ainvoke_structured(
+                _get_ollama_llm(settings), messages, Substitutions, "ollama", "substitution"
             )
-            response = await fallback.ainvoke([HumanMessage(content=prompt)])
-            print("[SubstitutionExpert] Ollama fallback succeeded")
-        else:
-            print("[SubstitutionExpert] No fallback available, returning empty")
-            return {}
+            logger.debug("Ollama fallback succeeded")
+    except StructuredOutputError as e:
+        logger.warning("LLM reply failed validation after repair", extra={"error": str(e)[:200]})
+        return {}
 
-    try:
-        data = json.loads(response.content)
-        if isinstance(data, dict):
-            return {k.lower(): v for k, v in data.items()}
-    except json.JSONDecodeError:
-        match = re.search(r"\{.*\}", response.content, re.DOTALL)
-        if match:
-            try:
-                data = json.loads(match.group())
-                if isinstance(data, dict):
-                    return {k.lower(): v for k, v in data.items()}
-            except json.JSONDecodeError:
-                pass
-
-    return {}
+    return {k.lower(): v for k, v in result.root.items()}
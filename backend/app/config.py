@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,19 +7,66 @@ class Settings(BaseSettings):
     # Groq (cloud - primary for text)
     GROQ_API_KEY: str = ""
     GROQ_MODEL: str = "llama-3.1-8b-instant"
+    # Client-side rate governor (0 = no limit); calls queue for Groq unless the
+    # wait would exceed Ollama's expected latency
+    GROQ_RPM_LIMIT: int = 30
+    GROQ_TPM_LIMIT: int = 6000
+    OLLAMA_EXPECTED_LATENCY_SECONDS: float = 15.0  # Until Ollama calls have been observed
 
     # Ollama (local - vision + text fallback)
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_VISION_MODEL: str = "llava"
     OLLAMA_TEXT_MODEL: str = "llama3"
+    OLLAMA_KEEP_ALIVE: str = "30m"  # How long Ollama keeps a model loaded after a call ("-1" = forever)
+    # Load YOLO and both Ollama models at startup, then re-ping the Ollama models
+    # every interval so idle unloads don't hit a student's scan (0 = no pings)
+    MODEL_WARMUP: bool = True
+    OLLAMA_KEEP_WARM_INTERVAL_SECONDS: int = 600
+    # Approximate prompt tokens spent on the available-items list (0 = send every item)
+    PROMPT_PANTRY_TOKEN_BUDGET: int = 400
 
     # Notion
     NOTION_API_KEY: str = ""
     NOTION_PANTRY_DATABASE_ID: str = ""
+    PANTRY_CACHE_TTL_SECONDS: int = 300
+    # Refresh by querying only pages edited since the last sync (allows a TTL of seconds)
+    PANTRY_SYNC_INCREMENTAL: bool = False
+    PANTRY_FULL_RESYNC_SECONDS: int = 3600  # Full pull to pick up deleted items / new databases
+    # SQLite file holding one pantry snapshot for every worker on the host, with one
+    # worker at a time refreshing it from Notion (empty = each worker caches its own)
+    PANTRY_SHARED_CACHE_PATH: str = ""
 
     # Google Sheets
     GOOGLE_SERVICE_ACCOUNT_JSON: str = "credentials.json"
     GOOGLE_SHEETS_RECIPE_SPREADSHEET_ID: str = ""
+    # Parsed recipe corpus snapshot (empty disables it); refreshed from the sheet after the TTL
+    RECIPE_INDEX_DIR: str = "recipe_index"
+    RECIPE_INDEX_TTL_SECONDS: int = 600
+
+    # Scan sessions (in-memory TTL; set SESSION_DB_PATH to also persist to SQLite)
+    SESSION_TTL_SECONDS: int = 1800
+    SESSION_MAX_ENTRIES: int = 1000
+    SESSION_DB_PATH: str = ""
+    # Run recipe search + table substitutions in the background after /scan
+    SCAN_PREFETCH_RECIPES: bool = False
+    # /scan/batch: max images per request, and llava prompts in flight at once
+    SCAN_BATCH_MAX_IMAGES: int = 6
+    VISION_BATCH_CONCURRENCY: int = 2
+    # Decode + YOLO in a pool of worker processes instead of the API process
+    VISION_PROCESS_POOL: bool = False
+    VISION_POOL_WORKERS: int = 0  # 0 = one per CPU core
+    # Scan cascade (overridable per request with ?mode=): "fast" = YOLO only,
+    # "accurate" = YOLO + llava on every image, "auto" = llava only for images
+    # where YOLO found fewer items, lower confidence or less of the frame's
+    # objects than the thresholds below
+    VISION_MODE: Literal["fast", "auto", "accurate"] = "accurate"
+    VISION_AUTO_MIN_ITEMS: int = 1
+    VISION_AUTO_MIN_CONFIDENCE: float = 0.5
+    VISION_AUTO_MIN_COVERAGE: float = 0.8  # Share of YOLO's detected objects that are food
+
+    # Tracing / logging
+    TRACE_SAMPLE_RATE: float = 0.1  # Fraction of requests traced (send "X-Trace: 1" to force)
+    LOG_LEVEL: str = "INFO"
 
     # App
     CORS_ORIGINS: list[str] = ["http://localhost:3000"]
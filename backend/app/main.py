@@ -3,33 +3,67 @@ Scan, Swap, Sustain — FastAPI Backend
 Entry point and API routing.
 """
 
+import asyncio
+import logging
+import time
 import httpx
 from contextlib import asynccontextmanager
+from functools import partial
 from uuid import uuid4
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 
 from app.config import settings
-from app.schemas.scan import ScanResponse, IdentifiedItem
+from app.schemas.scan import ScanResponse, IdentifiedItem, VisionMode
 from app.schemas.recipes import GenerateRecipesRequest, GenerateAIRecipeRequest, GenerateRecipesResponse
-from app.tools.image_processor import analyze_pantry_image
-from app.agents.planner import run_planner_agent
+from app.tools.image_processor import analyze_pantry_image, analyze_pantry_images, warm_up_yolo
+from app.tools import vision_pool
+from app.agents.planner import run_planner_agent, prepare_candidates
 from app.agents.generative_chef import run_generative_chef
-from app.services.pantry_cache import PantryCache
-
-pantry_cache = PantryCache()
+from app.tools.notion_pantry import filter_food_items, pantry_cache
+from app.tools.google_sheets_recipes import get_corpus, recipe_index
+from app.services.session_store import SessionStore
+from app.services.model_warmup import ModelWarmer
+from app.services import metrics, tracing
+from app.services.vocabulary import vocabulary
+
+session_store = SessionStore(
+    ttl_seconds=settings.SESSION_TTL_SECONDS,
+    max_entries=settings.SESSION_MAX_ENTRIES,
+    db_path=settings.SESSION_DB_PATH,
+)
+model_warmer = ModelWarmer(
+    settings,
+    yolo_warmup=partial(vision_pool.warm_up, settings) if settings.VISION_PROCESS_POOL else warm_up_yolo,
+)
+logger = logging.getLogger(__name__)
+# In-flight recipe prefetches by session_id (also keeps the tasks referenced)
+_prefetch_tasks: dict[str, asyncio.Task] = {}
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    tracing.configure_logging(settings.LOG_LEVEL)
+    # Load YOLO and the Ollama models in the background and keep them loaded
+    if settings.MODEL_WARMUP:
+        model_warmer.start()
     # Warm pantry cache on startup if Notion is configured
     if settings.NOTION_API_KEY:
         try:
             await pantry_cache.get_items()
         except Exception:
             pass  # Don't block startup if Notion is unreachable
+    # Serve recipe search from the on-disk snapshot right away; get_corpus()
+    # sees it as stale and refreshes from the sheet in the background
+    if settings.GOOGLE_SHEETS_RECIPE_SPREADSHEET_ID:
+        if await asyncio.to_thread(recipe_index.load_snapshot):
+            get_corpus()
     yield
+    await model_warmer.stop()
+    vision_pool.shutdown()
+    tracing.shutdown_logging()
 
 
 app = FastAPI(
@@ -37,6 +71,7 @@ app = FastAPI(
     description="Food equity backend for UC Davis students — ASUCD Pantry recipe engine",
     version="0.1.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 app.add_middleware(
@@ -45,21 +80,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Trace a sample of requests and report their stage timings in Server-Timing."""
+    trace = tracing.start_trace(settings.TRACE_SAMPLE_RATE, force=request.headers.get("x-trace") == "1")
+    response = await call_next(request)
+    if trace is not None:
+        total_ms = (time.perf_counter() - trace.start) * 1000
+        response.headers["Server-Timing"] = trace.server_timing(total_ms)
+        response.headers["Timing-Allow-Origin"] = ", ".join(settings.CORS_ORIGINS)
+        logger.info("request", extra={
+            "trace_id": trace.trace_id,
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 1),
+            "spans": trace.spans,
+        })
+    return response
+
+
 # ---------- Health ----------
 
 @app.get("/health")
 async def health_check():
-    """Check API and Ollama connectivity."""
+    """Check API and Ollama connectivity, and whether each model is loaded."""
     ollama_ok = False
-    try:
-        async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient() as client:
+        try:
             resp = await client.get(f"{settings.OLLAMA_BASE_URL}/api/tags", timeout=5)
             ollama_ok = resp.status_code == 200
-    except Exception:
-        pass
+        except Exception:
+            pass
+        models = await model_warmer.status(client)
 
     return {
         "status": "ok",
@@ -67,9 +124,18 @@ async def health_check():
         "ollama_url": settings.OLLAMA_BASE_URL,
         "vision_model": settings.OLLAMA_VISION_MODEL,
         "text_model": settings.OLLAMA_TEXT_MODEL,
+        "models": models,
     }
 
 
+# ---------- Metrics ----------
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Stage latency histograms, LLM call/error counters and cache hit ratios (Prometheus text format)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # ---------- POST /scan ----------
 
 SUGGESTED_FILTERS_MAP = {
@@ -84,25 +150,87 @@ SUGGESTED_FILTERS_MAP = {
     "oats": ["No-Cook", "Quick (<15 min)"],
     "bread": ["No-Cook"],
 }
+SUGGESTED_FILTERS_BY_ID = {vocabulary.intern(name): filters for name, filters in SUGGESTED_FILTERS_MAP.items()}
 
 
-def _suggest_filters(item_names: list[str]) -> list[str]:
-    """Rule-based filter suggestions from identified items."""
+def _suggest_filters(item_ids: list[int | None]) -> list[str]:
+    """Rule-based filter suggestions from identified items (vocabulary ids; None = unknown name)."""
     filters = set()
-    for name in item_names:
-        key = name.strip().lower()
-        if key in SUGGESTED_FILTERS_MAP:
-            filters.update(SUGGESTED_FILTERS_MAP[key])
+    for ingredient_id in item_ids:
+        filters.update(SUGGESTED_FILTERS_BY_ID.get(ingredient_id, ()))
     if not filters:
         filters.add("Quick (<15 min)")
     return sorted(filters)
 
 
+def _normalize_names(names: list[str]) -> set[str]:
+    return {name.strip().lower() for name in names if name.strip()}
+
+
+async def _merge_with_pantry(item_names: list[str]) -> list[str] | None:
+    """User items + Notion pantry food items, as the agents would build it.
+    Returns None if the pantry can't be read so the agents fetch it themselves."""
+    try:
+        pantry_items = await pantry_cache.get_items()
+    except Exception:
+        return None
+    pantry_names = [item.name for item in filter_food_items(pantry_items)]
+    return list(set(item_names + pantry_names))
+
+
+async def _resolve_session_items(
+    session_id: str, identified_items: list[str]
+) -> tuple[list[str], list[str] | None, dict | None]:
+    """
+    Return (ingredients, available list, session) for a generate request.
+    The scan session is reused when the client omits identified_items or sends
+    the same items it was given; an edited list falls back to the full path
+    and no session is returned. The available list (scanned items + pantry) is
+    built here rather than at scan time, so /scan never waits on Notion for it.
+    """
+    session = await session_store.get(session_id)
+    if session is None:
+        return identified_items, None, None
+    if identified_items and _normalize_names(identified_items) != set(session["normalized_items"]):
+        return identified_items, None, None
+    return session["item_names"], await _merge_with_pantry(session["item_names"]), session
+
+
+async def _prefetch_recipes(session_id: str):
+    """Run the LLM-free part of /generate-recipes for a fresh scan and park it in the session."""
+    session = await session_store.get(session_id)
+    if session is None:
+        return
+    try:
+        available = await _merge_with_pantry(session["item_names"])
+        prepared = await prepare_candidates(session["item_names"], available)
+    except Exception:
+        return  # /generate-recipes will just do the work itself
+    session["prefetched"] = prepared
+    await session_store.put(session_id, session)
+
+
+def _start_prefetch(session_id: str):
+    # Detached from the /scan trace, which is emitted before the prefetch finishes
+    task = asyncio.create_task(_prefetch_recipes(session_id), context=tracing.detached_context())
+    _prefetch_tasks[session_id] = task
+    task.add_done_callback(lambda _: _prefetch_tasks.pop(session_id, None))
+
+
+async def _get_prefetched(session_id: str) -> dict | None:
+    """Prefetched candidates for a session, waiting on an in-flight prefetch if needed."""
+    task = _prefetch_tasks.get(session_id)
+    if task is not None:
+        await asyncio.shield(task)
+    session = await session_store.get(session_id)
+    return session.get("prefetched") if session else None
+
+
 @app.post("/scan", response_model=ScanResponse)
-async def scan_pantry(image: UploadFile = File(...)):
+async def scan_pantry(image: UploadFile = File(...), mode: VisionMode | None = None):
     """
     Upload a pantry image. Returns identified food items and suggested filters.
-    This is the "Focus Moment" endpoint.
+    This is the "Focus Moment" endpoint. `mode` overrides VISION_MODE.
     """
     image_bytes = await image.read()
 
@@ -111,16 +239,48 @@ async def scan_pantry(image: UploadFile = File(...)):
 
     # Step 1: Vision model identifies items
     try:
-        raw_items = await analyze_pantry_image(image_bytes, settings)
+        raw_items, path = await analyze_pantry_image(image_bytes, settings, mode)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Vision model error: {str(e)}")
 
-    # Step 2: Cross-reference with pantry cache
-    pantry_names = pantry_cache.get_item_names()
+    return await _scan_response(raw_items, mode or settings.VISION_MODE, path)
+
+
+@app.post("/scan/batch", response_model=ScanResponse)
+async def scan_pantry_batch(images: list[UploadFile] = File(...), mode: VisionMode | None = None):
+    """
+    Upload several photos (cupboard, fridge, shelf...) in one request.
+    Items are merged and deduplicated into a single scan session.
+    """
+    if len(images) > settings.SCAN_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.SCAN_BATCH_MAX_IMAGES} images per batch",
+        )
+    images_bytes = [await image.read() for image in images]
+    if not images_bytes or not all(images_bytes):
+        raise HTTPException(status_code=400, detail="Empty image file")
+
+    try:
+        raw_items, path = await analyze_pantry_images(images_bytes, settings, mode)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Vision model error: {str(e)}")
+
+    return await _scan_response(raw_items, mode or settings.VISION_MODE, path)
+
+
+async def _scan_response(raw_items: list[dict], mode: VisionMode, path: str) -> ScanResponse:
+    """Tag, suggest filters for and store one scan's items (shared by /scan and /scan/batch)."""
+    # Step 2: Cross-reference with pantry cache (exact id hit first, then fuzzy).
+    # lookup, not intern: scan names are request data and mustn't grow the vocabulary.
+    item_ids = [vocabulary.lookup(item["name"]) for item in raw_items]
+    pantry_ids = pantry_cache.get_item_ids()
+    pantry_index = pantry_cache.get_name_index()
 
     identified = []
-    for item in raw_items:
-        source = "ASUCD Pantry" if item["name"].lower() in pantry_names else "Personal"
+    for item, item_id in zip(raw_items, item_ids):
+        in_pantry = item_id in pantry_ids or pantry_index.contains(item["name"])
+        source = "ASUCD Pantry" if in_pantry else "Personal"
         identified.append(IdentifiedItem(
             name=item["name"],
             confidence=item["confidence"],
@@ -129,12 +289,25 @@ async def scan_pantry(image: UploadFile = File(...)):
 
     # Step 3: Suggest filters
     item_names = [item["name"] for item in raw_items]
-    filters = _suggest_filters(item_names)
+    filters = _suggest_filters(item_ids)
+
+    # Step 4: Keep the scan server-side so the generate endpoints can reuse it
+    session_id = str(uuid4())
+    await session_store.put(session_id, {
+        "identified_items": [item.model_dump() for item in identified],
+        "item_names": item_names,
+        "normalized_items": sorted(_normalize_names(item_names)),
+    })
+    if settings.SCAN_PREFETCH_RECIPES and item_names:
+        # Hide the search/substitution latency in the user's think time
+        _start_prefetch(session_id)
 
     return ScanResponse(
-        session_id=str(uuid4()),
+        session_id=session_id,
         identified_items=identified,
         suggested_filters=filters,
+        vision_mode=mode,
+        vision_path=path,
     )
 
 
@@ -145,15 +318,20 @@ async def generate_recipes(request: GenerateRecipesRequest):
     """
     Generate recipe recommendations with substitution engine and academic fuel scores.
     """
-    if not request.identified_items:
+    ingredients, available, session = await _resolve_session_items(request.session_id, request.identified_items)
+    if not ingredients:
         raise HTTPException(status_code=400, detail="No ingredients provided")
 
+    prepared = await _get_prefetched(request.session_id) if session is not None else None
+
     try:
         result = await run_planner_agent(
-            ingredients=request.identified_items,
+            ingredients=ingredients,
             filters=request.filters,
             dietary_preferences=request.dietary_preferences,
             settings=settings,
+            available=available,
+            prepared=prepared,
         )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Recipe generation error: {str(e)}")
@@ -169,15 +347,17 @@ async def generate_ai_recipe(request: GenerateAIRecipeRequest):
     Generate fully original AI-created recipes from available ingredients.
     No spreadsheet lookup — purely LLM-generated.
     """
-    if not request.identified_items:
+    ingredients, available, _ = await _resolve_session_items(request.session_id, request.identified_items)
+    if not ingredients:
         raise HTTPException(status_code=400, detail="No ingredients provided")
 
     try:
         result = await run_generative_chef(
-            ingredients=request.identified_items,
+            ingredients=ingredients,
             filters=request.filters,
             dietary_preferences=request.dietary_preferences,
             settings=settings,
+            available=available,
         )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"AI recipe generation error: {str(e)}")
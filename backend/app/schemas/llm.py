@@ -0,0 +1,48 @@
+from pydantic import BaseModel, ConfigDict, Field, RootModel, field_validator
+
+
+# Shapes the LLMs are asked to return (sent as the JSON schema / JSON mode
+# request). Top-level values are objects because Groq JSON mode requires one.
+
+class GeneratedIngredient(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    name: str
+    quantity: str = ""
+
+
+class GeneratedRecipe(BaseModel):
+    title: str = "AI Chef Recipe"
+    ingredients: list[GeneratedIngredient]
+    instructions: list[str]
+
+    @field_validator("ingredients", mode="before")
+    @classmethod
+    def _names_as_ingredients(cls, value):
+        if isinstance(value, list):
+            return [{"name": item} if isinstance(item, str) else item for item in value]
+        return value
+
+    @field_validator("instructions", mode="before")
+    @classmethod
+    def _split_instructions(cls, value):
+        if isinstance(value, str):
+            return [s.strip() for s in value.split("\n") if s.strip()]
+        return value
+
+
+class GeneratedRecipes(BaseModel):
+    recipes: list[GeneratedRecipe]
+
+
+class DetectedItem(BaseModel):
+    name: str
+    confidence: float = Field(default=0.7, ge=0.0, le=1.0)
+
+
+class DetectedItems(BaseModel):
+    items: list[DetectedItem]
+
+
+class Substitutions(RootModel[dict[str, str | None]]):
+    """Missing ingredient → substitution text, or null if nothing fits."""
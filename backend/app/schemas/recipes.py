@@ -19,14 +19,14 @@ class Recipe(BaseModel):
 
 class GenerateRecipesRequest(BaseModel):
     session_id: str
-    identified_items: list[str]
+    identified_items: list[str] = []
     filters: list[str] = []
     dietary_preferences: list[str] = []
 
 
 class GenerateAIRecipeRequest(BaseModel):
     session_id: str
-    identified_items: list[str]
+    identified_items: list[str] = []
     filters: list[str] = []
     dietary_preferences: list[str] = []
 
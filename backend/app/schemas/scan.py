@@ -1,6 +1,11 @@
+from typing import Literal
+
 from pydantic import BaseModel, Field
 from uuid import uuid4
 
+# fast = YOLO only, auto = llava when YOLO comes up short, accurate = YOLO + llava
+VisionMode = Literal["fast", "auto", "accurate"]
+
 
 class IdentifiedItem(BaseModel):
     name: str
@@ -12,3 +17,5 @@ class ScanResponse(BaseModel):
     session_id: str = Field(default_factory=lambda: str(uuid4()))
     identified_items: list[IdentifiedItem]
     suggested_filters: list[str]
+    vision_mode: VisionMode
+    vision_path: str  # "yolo" or "yolo+llava"
@@ -1,9 +1,13 @@
 """
 Academic Fuel scoring service.
 Calculates a 1-10 "Brain Power" score based on protein, Omega-3s, and complex carbs.
-Pure Python — no LLM dependency.
+No LLM dependency; batch scoring is vectorized with NumPy.
 """
 
+import numpy as np
+
+from app.services.vocabulary import vocabulary
+
 NUTRIENT_PROFILES: dict[str, dict[str, float]] = {
     # Proteins
     "peanut butter": {"protein": 7, "omega3": 0.5, "complex_carbs": 2, "fiber": 2},
@@ -60,6 +64,42 @@ NUTRIENT_PROFILES: dict[str, dict[str, float]] = {
 }
 
 
+# NUTRIENT_PROFILES compiled to a matrix for batch scoring: one row per ingredient,
+# columns in SCORED_NUTRIENTS order. Rows are found by vocabulary id, so plurals
+# and aliases ("Eggs", "garbanzo beans") hit the same profile.
+SCORED_NUTRIENTS = ("protein", "omega3", "complex_carbs")
+_PROFILES = list(NUTRIENT_PROFILES.values())
+NUTRIENT_ROW: dict[int, int] = {}
+for _row, _name in enumerate(NUTRIENT_PROFILES):
+    NUTRIENT_ROW.setdefault(vocabulary.intern(_name), _row)
+NUTRIENT_MATRIX = np.array(
+    [[profile[n] for n in SCORED_NUTRIENTS] for profile in _PROFILES],
+    dtype=np.float64,
+)
+
+
+def _nutrient_row(name: str) -> int | None:
+    ingredient_id = vocabulary.lookup(name)
+    return None if ingredient_id is None else NUTRIENT_ROW.get(ingredient_id)
+
+
+def _fuel_summary(final: float, protein_score: float, omega3_score: float, carb_score: float) -> str:
+    highlights = []
+    if protein_score > 2.5:
+        highlights.append("protein")
+    if omega3_score > 2.0:
+        highlights.append("Omega-3s")
+    if carb_score > 2.0:
+        highlights.append("complex carbs")
+
+    if highlights:
+        return f"High in {' and '.join(highlights)} for sustained focus."
+    elif final >= 5.0:
+        return "A solid balanced meal for steady energy."
+    else:
+        return "A light meal — consider adding protein or whole grains."
+
+
 def calculate_academic_fuel_score(
     ingredient_names: list[str],
 ) -> tuple[float, str]:
@@ -78,9 +118,9 @@ def calculate_academic_fuel_score(
     total_carbs = 0.0
 
     for name in ingredient_names:
-        key = name.strip().lower()
-        profile = NUTRIENT_PROFILES.get(key)
-        if profile:
+        row = _nutrient_row(name)
+        if row is not None:
+            profile = _PROFILES[row]
             total_protein += profile["protein"]
             total_omega3 += profile["omega3"]
             total_carbs += profile["complex_carbs"]
@@ -92,19 +132,67 @@ def calculate_academic_fuel_score(
     final = round(protein_score + omega3_score + carb_score, 1)
     final = max(1.0, min(10.0, final))
 
-    highlights = []
-    if protein_score > 2.5:
-        highlights.append("protein")
-    if omega3_score > 2.0:
-        highlights.append("Omega-3s")
-    if carb_score > 2.0:
-        highlights.append("complex carbs")
+    return final, _fuel_summary(final, protein_score, omega3_score, carb_score)
 
-    if highlights:
-        summary = f"High in {' and '.join(highlights)} for sustained focus."
-    elif final >= 5.0:
-        summary = "A solid balanced meal for steady energy."
-    else:
-        summary = "A light meal — consider adding protein or whole grains."
 
-    return final, summary
+def _summary_code(protein_score, omega3_score, carb_score, final):
+    """Bit-pack the inputs of _fuel_summary(); works on scalars and NumPy arrays."""
+    return (
+        (protein_score > 2.5) * 1
+        + (omega3_score > 2.0) * 2
+        + (carb_score > 2.0) * 4
+        + (final >= 5.0) * 8
+    )
+
+
+# Every summary _fuel_summary() can produce, indexed by _summary_code()
+_SUMMARIES = [
+    _fuel_summary(
+        5.0 if code & 8 else 1.0,
+        3.0 if code & 1 else 0.0,
+        3.0 if code & 2 else 0.0,
+        3.0 if code & 4 else 0.0,
+    )
+    for code in range(16)
+]
+
+
+def calculate_academic_fuel_scores(
+    recipes: list[list[str]],
+) -> list[tuple[float, str]]:
+    """
+    Score many recipes at once; same formula and clamping as
+    calculate_academic_fuel_score(), one (score, summary) per recipe.
+
+    Ingredient names are resolved to NUTRIENT_MATRIX rows, then the
+    per-recipe nutrient totals, weighted scores and summaries are computed
+    in one vectorized pass.
+    """
+    if not recipes:
+        return []
+
+    recipe_ids = []
+    rows = []
+    for recipe_id, names in enumerate(recipes):
+        for name in names:
+            row = _nutrient_row(name)
+            if row is not None:
+                recipe_ids.append(recipe_id)
+                rows.append(row)
+
+    n = len(recipes)
+    ids = np.asarray(recipe_ids, dtype=np.intp)
+    values = NUTRIENT_MATRIX[np.asarray(rows, dtype=np.intp)]
+    totals = [np.bincount(ids, weights=values[:, j], minlength=n) for j in range(len(SCORED_NUTRIENTS))]
+
+    protein_score = np.minimum(totals[0] / 20, 1.0) * 4
+    omega3_score = np.minimum(totals[1] / 2.0, 1.0) * 3
+    carb_score = np.minimum(totals[2] / 15, 1.0) * 3
+
+    # Python's round() (correctly rounded) rather than np.round, so x.x5 ties
+    # come out exactly as in the single-recipe function
+    raw = (protein_score + omega3_score + carb_score).tolist()
+    final = np.array([max(1.0, min(10.0, round(value, 1))) for value in raw])
+    codes = _summary_code(protein_score, omega3_score, carb_score, final)
+
+    return [(score, _SUMMARIES[code]) for score, code in zip(final.tolist(), codes.tolist())]
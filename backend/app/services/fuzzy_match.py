@@ -0,0 +1,154 @@
+"""
+Fuzzy ingredient-name matching shared by /scan, recipe search and the
+substitution pass.
+
+Names are tokenized (lowercase, parentheticals dropped, plurals folded) and
+two names match when
+
+  - the tokens of one are a subset of the other's ("peanut butter" vs
+    "creamy peanut butter", "oil" vs "olive oil" — but not "oil" vs
+    "boiled eggs"), or
+  - their character trigram Dice similarity reaches the threshold (spelling
+    variants such as "parmesan" vs "parmesean").
+
+FuzzyIndex prebuilds token and trigram postings over a vocabulary, so a
+lookup only touches names sharing a token or one of the query's rarest
+trigrams instead of scanning the whole vocabulary.
+"""
+
+import math
+import re
+from collections import Counter
+from collections.abc import Iterable
+from functools import lru_cache
+
+DEFAULT_THRESHOLD = 0.7
+
+_PARENTHETICAL = re.compile(r"\([^)]*\)")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset({"a", "an", "and", "or", "of", "the", "to", "for", "with", "in"})
+
+
+@lru_cache(maxsize=8192)
+def singularize(token: str) -> str:
+    """Fold common English plurals: tomatoes → tomato, berries → berry, eggs → egg."""
+    if len(token) <= 3 or not token.endswith("s"):
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith(("oes", "ches", "shes", "xes", "sses")):
+        return token[:-2]
+    if token.endswith(("ss", "us", "is")):
+        return token
+    return token[:-1]
+
+
+@lru_cache(maxsize=65536)
+def tokenize(text: str) -> tuple[str, ...]:
+    """Lowercase word tokens with parentheticals, stopwords and plurals removed."""
+    text = _PARENTHETICAL.sub(" ", text.lower())
+    return tuple(singularize(t) for t in _TOKEN.findall(text) if t not in _STOPWORDS)
+
+
+def _trigrams(key: str) -> frozenset[str]:
+    padded = f" {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a: str, b: str) -> float:
+    """1.0 for token containment, else trigram Dice similarity (0.0 if either has no tokens)."""
+    ta, tb = tokenize(a), tokenize(b)
+    if not ta or not tb:
+        return 0.0
+    sa, sb = set(ta), set(tb)
+    if sa <= sb or sb <= sa:
+        return 1.0
+    ga, gb = _trigrams(" ".join(ta)), _trigrams(" ".join(tb))
+    return 2 * len(ga & gb) / (len(ga) + len(gb))
+
+
+class FuzzyIndex:
+    """Prebuilt token + trigram index over a vocabulary of names."""
+
+    def __init__(self, names: Iterable[str], threshold: float = DEFAULT_THRESHOLD):
+        self.names = list(names)
+        self.threshold = threshold
+        self._tokens: list[frozenset[str]] = []
+        self._grams: list[frozenset[str]] = []
+        self._by_key: dict[str, list[int]] = {}
+        self._by_token: dict[str, list[int]] = {}
+        self._by_gram: dict[str, list[int]] = {}
+
+        for i, name in enumerate(self.names):
+            tokens = tokenize(name)
+            key = " ".join(tokens)
+            token_set = frozenset(tokens)
+            grams = _trigrams(key) if tokens else frozenset()
+            self._tokens.append(token_set)
+            self._grams.append(grams)
+            if not tokens:
+                continue
+            self._by_key.setdefault(key, []).append(i)
+            for token in token_set:
+                self._by_token.setdefault(token, []).append(i)
+            for gram in grams:
+                self._by_gram.setdefault(gram, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def matching_ids(self, query: str, first_only: bool = False) -> set[int]:
+        """Ids of every vocabulary name that matches `query` (or just one, with first_only)."""
+        tokens = tokenize(query)
+        if not tokens:
+            return set()
+        query_tokens = set(tokens)
+        matched = set(self._by_key.get(" ".join(tokens), ()))
+        if matched and first_only:
+            return matched
+
+        # Token containment in either direction
+        shared = Counter()
+        for token in query_tokens:
+            shared.update(self._by_token.get(token, ()))
+        for i, count in shared.items():
+            if count == len(self._tokens[i]) or count == len(query_tokens):
+                matched.add(i)
+                if first_only:
+                    return matched
+
+        # Trigram Dice, with length and prefix filtering: a name similar enough
+        # must contain at least one of the query's (n - min_overlap + 1) rarest grams
+        grams = _trigrams(" ".join(tokens))
+        t, n = self.threshold, len(grams)
+        min_len = math.ceil(t * n / (2 - t))
+        max_len = math.floor(n * (2 - t) / t)
+        min_overlap = math.ceil(t * (n + min_len) / 2)
+        rarest = sorted(grams, key=lambda g: len(self._by_gram.get(g, ())))
+        candidates = set()
+        for gram in rarest[:max(n - min_overlap + 1, 1)]:
+            candidates.update(self._by_gram.get(gram, ()))
+        for i in candidates - matched:
+            other = self._grams[i]
+            if min_len <= len(other) <= max_len and 2 * len(grams & other) / (n + len(other)) >= t:
+                matched.add(i)
+                if first_only:
+                    return matched
+        return matched
+
+    def matches(self, query: str) -> list[str]:
+        return [self.names[i] for i in sorted(self.matching_ids(query))]
+
+    def contains(self, query: str) -> bool:
+        """True if `query` matches any vocabulary name."""
+        return bool(self.matching_ids(query, first_only=True))
+
+
+@lru_cache(maxsize=16)
+def _cached_index(names: tuple[str, ...]) -> FuzzyIndex:
+    return FuzzyIndex(names)
+
+
+def index_for(names: Iterable[str]) -> FuzzyIndex:
+    """A FuzzyIndex over `names`, reused across calls with the same names (e.g. one pantry)."""
+    return _cached_index(tuple(names))
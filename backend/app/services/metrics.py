@@ -0,0 +1,186 @@
+"""
+In-process metrics: per-stage latency histograms, LLM call/error counters
+and cache hit/miss counts, rendered in Prometheus text format for /metrics.
+Pure Python — no prometheus_client dependency.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from app.services.tracing import span
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Pipeline stages timed via time_stage(); listed so /metrics shows them before first use
+STAGES = (
+    "image_decode",
+    "yolo",
+    "llava",
+    "notion_fetch",
+    "sheets_fetch",
+    "recipe_search",
+    "table_substitution",
+    "llm_substitution",
+    "chef_generation",
+    "groq_queue",
+)
+
+_lock = threading.Lock()  # Stages also run in worker threads (asyncio.to_thread)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with _lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {_format_value(total)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> (per-bucket counts, sum, count)
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def _get_series(self, label_values: tuple[str, ...]) -> list:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+        return series
+
+    def declare(self, *label_values: str):
+        """Create an empty series so it is exported before the first observation."""
+        with _lock:
+            self._get_series(label_values)
+
+    def observe(self, value: float, *label_values: str):
+        with _lock:
+            series = self._get_series(label_values)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (bucket_counts, total, count) in sorted(self._series.items()):
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                le = _format_labels(self.labels, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {bucket_count}")
+            inf = _format_labels(self.labels, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {count}")
+        return lines
+
+
+STAGE_LATENCY = Histogram(
+    "aggie_stage_latency_seconds", "Latency of each pipeline stage in seconds.", ("stage",)
+)
+LLM_CALLS = Counter("aggie_llm_calls_total", "LLM calls made, by provider and caller.", ("provider", "caller"))
+LLM_ERRORS = Counter("aggie_llm_errors_total", "LLM calls that raised, by provider and caller.", ("provider", "caller"))
+CACHE_REQUESTS = Counter("aggie_cache_requests_total", "Cache lookups, by cache and hit/miss.", ("cache", "result"))
+LLM_COALESCED = Counter(
+    "aggie_llm_coalesced_total", "LLM requests served by joining an identical in-flight call.", ("caller",)
+)
+GROQ_ROUTING = Counter(
+    "aggie_groq_routing_total",
+    "Groq calls by rate-governor decision: immediate, queued, or rerouted to Ollama.",
+    ("caller", "decision"),
+)
+LLM_REPAIRS = Counter(
+    "aggie_llm_repairs_total", "LLM replies that failed schema validation, by whether the repair call fixed them.",
+    ("caller", "outcome"),
+)
+VISION_PATHS = Counter(
+    "aggie_vision_path_total", "Scanned images by vision mode and the path taken (yolo or yolo+llava).",
+    ("mode", "path"),
+)
+
+for _stage in STAGES:
+    STAGE_LATENCY.declare(_stage)
+
+
+@contextmanager
+def time_stage(stage: str):
+    """Time the enclosed block into the stage latency histogram (recorded even on error).
+    Also records a tracing span, so every timed stage shows up in Server-Timing."""
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage)
+
+
+@contextmanager
+def track_llm_call(provider: str, caller: str):
+    """Count an LLM call, and count it as an error if the enclosed block raises (cancellation isn't an error)."""
+    LLM_CALLS.inc(provider, caller)
+    try:
+        yield
+    except Exception:
+        LLM_ERRORS.inc(provider, caller)
+        raise
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def _render_cache_ratios() -> list[str]:
+    name = "aggie_cache_hit_ratio"
+    lines = [f"# HELP {name} Fraction of lookups served from cache since start.", f"# TYPE {name} gauge"]
+    caches = sorted({values[0] for values in CACHE_REQUESTS._values})
+    for cache in caches:
+        hits = CACHE_REQUESTS.get(cache, "hit")
+        total = hits + CACHE_REQUESTS.get(cache, "miss")
+        lines.append(f'{name}{{cache="{cache}"}} {_format_value(hits / total if total else 0.0)}')
+    return lines
+
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format."""
+    with _lock:
+        lines = []
+        for metric in (
+            STAGE_LATENCY, LLM_CALLS, LLM_ERRORS, LLM_COALESCED, LLM_REPAIRS, GROQ_ROUTING, VISION_PATHS, CACHE_REQUESTS,
+        ):
+            lines.extend(metric.render())
+        lines.extend(_render_cache_ratios())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,146 @@
+"""
+Model warmup and keep-warm for YOLO and the Ollama models.
+
+Without it, the first scan after a deploy pays for loading the YOLO weights
+and for Ollama loading llava into VRAM, and the first scan after Ollama's
+idle unload (5 minutes by default) pays for the reload again.
+
+At startup, YOLO runs one dummy inference and both Ollama models are
+preloaded with an empty /api/generate request carrying OLLAMA_KEEP_ALIVE.
+After that the Ollama models are re-pinged on a schedule, which resets
+their keep-alive timer. The warmup runs in the background so startup
+isn't held up by a slow or missing Ollama.
+
+/health reports each model's state. For Ollama models it asks /api/ps
+which models are actually loaded, so an unload (e.g. another model
+pushing one out of VRAM) shows up as "cold" right away.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+
+import httpx
+
+from app.config import Settings
+
+logger = logging.getLogger(__name__)
+
+# Loading a model from disk into VRAM can take a while on a cold machine
+PRELOAD_TIMEOUT_SECONDS = 300
+STATUS_TIMEOUT_SECONDS = 2
+
+
+def _model_key(name: str) -> str:
+    """Ollama reports "llava" as "llava:latest"."""
+    return name if ":" in name else f"{name}:latest"
+
+
+class ModelWarmer:
+    def __init__(self, settings: Settings, yolo_warmup: Callable[[], None] | None = None):
+        self._settings = settings
+        self._yolo_warmup = yolo_warmup
+        # model -> {"state": "cold" | "warming" | "warm" | "error", "warmed_at", "load_ms", "error"}
+        self._models: dict[str, dict] = {}
+        self._task: asyncio.Task | None = None
+        for name in self._tracked():
+            self._models[name] = {"state": "cold"}
+
+    def _ollama_models(self) -> list[str]:
+        return list(dict.fromkeys([self._settings.OLLAMA_VISION_MODEL, self._settings.OLLAMA_TEXT_MODEL]))
+
+    def _tracked(self) -> list[str]:
+        return (["yolo"] if self._yolo_warmup else []) + self._ollama_models()
+
+    def _mark(self, name: str, state: str, started: float | None = None, error: str | None = None):
+        record = {"state": state}
+        if state == "warm":
+            record["warmed_at"] = time.time()
+            if started is not None:
+                record["load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        elif error:
+            record["error"] = error
+        self._models[name] = record
+
+    async def warm_yolo(self):
+        if self._yolo_warmup is None:
+            return
+        self._mark("yolo", "warming")
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._yolo_warmup)
+        except Exception as e:
+            logger.warning("YOLO warmup failed", extra={"error": str(e)})
+            self._mark("yolo", "error", error=str(e))
+            return
+        self._mark("yolo", "warm", started)
+
+    async def warm_ollama(self, client: httpx.AsyncClient, model: str):
+        """Load `model` (or reset its keep-alive timer) with an empty generate request."""
+        if self._models.get(model, {}).get("state") != "warm":
+            self._mark(model, "warming")
+        started = time.perf_counter()
+        try:
+            resp = await client.post(
+                f"{self._settings.OLLAMA_BASE_URL}/api/generate",
+                json={"model": model, "keep_alive": self._settings.OLLAMA_KEEP_ALIVE},
+                timeout=PRELOAD_TIMEOUT_SECONDS,
+            )
+            resp.raise_for_status()
+        except Exception as e:
+            logger.warning("Ollama preload failed", extra={"model": model, "error": str(e)})
+            self._mark(model, "error", error=str(e))
+            return
+        self._mark(model, "warm", started)
+
+    async def warm_all(self):
+        async with httpx.AsyncClient() as client:
+            await asyncio.gather(self.warm_yolo(), *(self.warm_ollama(client, m) for m in self._ollama_models()))
+        logger.info("Model warmup done", extra={"models": {k: v["state"] for k, v in self._models.items()}})
+
+    async def _run(self):
+        await self.warm_all()
+        interval = self._settings.OLLAMA_KEEP_WARM_INTERVAL_SECONDS
+        if interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            async with httpx.AsyncClient() as client:
+                for model in self._ollama_models():
+                    await self.warm_ollama(client, model)
+
+    def start(self):
+        """Warm everything in the background, then keep the Ollama models loaded."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def status(self, client: httpx.AsyncClient) -> dict[str, dict]:
+        """Warm/cold state per model; Ollama models are checked against what /api/ps has loaded."""
+        models = {name: dict(record) for name, record in self._models.items()}
+        try:
+            resp = await client.get(f"{self._settings.OLLAMA_BASE_URL}/api/ps", timeout=STATUS_TIMEOUT_SECONDS)
+            resp.raise_for_status()
+            loaded = {_model_key(m.get("name", "")): m for m in resp.json().get("models", [])}
+        except Exception:
+            loaded = {}  # Ollama unreachable: nothing is loaded
+        for name in self._ollama_models():
+            record = models[name]
+            running = loaded.get(_model_key(name))
+            if running is not None:
+                record["state"] = "warm"
+                record.pop("error", None)
+                if running.get("expires_at"):
+                    record["expires_at"] = running["expires_at"]
+            elif record["state"] == "warm":
+                record["state"] = "cold"  # Unloaded since it was last warmed
+        return models
@@ -1,31 +1,130 @@
+import asyncio
 import time
 
+import orjson
+
+from app.services.fuzzy_match import FuzzyIndex
+from app.services.metrics import record_cache
+from app.services.records import PantryItem
+from app.services.shared_cache import FileLock, SnapshotStore
+from app.services.vocabulary import vocabulary
+
+SNAPSHOT_KEY = "pantry"
+
 
 class PantryCache:
-    """In-memory TTL cache for Notion pantry inventory."""
+    """In-memory TTL cache for Notion pantry inventory.
 
-    def __init__(self, ttl_seconds: int = 300):
-        self._cache: list[dict] | None = None
+    With incremental=True a stale cache is refreshed by patching in only the
+    pages edited since the last sync (full resync every full_resync_seconds),
+    which makes a TTL of seconds affordable.
+
+    With a shared_path, the workers on a host share one snapshot in a SQLite
+    file: a worker whose copy is stale first adopts a fresher snapshot another
+    worker wrote, and only the worker holding the refresh lock fetches from
+    Notion. The others keep serving their copy meanwhile (or wait for the
+    leader on a cold start), so Notion sees one fetch per TTL whatever the
+    worker count, and all workers serve the same stock.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = 300,
+        incremental: bool = False,
+        full_resync_seconds: int = 3600,
+        shared_path: str = "",
+    ):
+        self._cache: list[PantryItem] | None = None
         self._last_fetch: float = 0
         self._ttl = ttl_seconds
+        self._name_index: FuzzyIndex | None = None
+        self._item_ids: frozenset[int] = frozenset()
+        self._item_names: frozenset[str] = frozenset()
+        self._sync = None
+        self._shared = SnapshotStore(shared_path) if shared_path else None
+        self._refresh_lock = FileLock(f"{shared_path}.lock") if shared_path else None
+        self._shared_version = 0
+        if incremental:
+            from app.tools.notion_pantry import IncrementalPantrySync
+            self._sync = IncrementalPantrySync(full_resync_seconds)
 
     @property
     def is_stale(self) -> bool:
         return self._cache is None or (time.time() - self._last_fetch) > self._ttl
 
-    async def get_items(self) -> list[dict]:
+    async def get_items(self) -> list[PantryItem]:
+        record_cache("pantry", hit=not self.is_stale)
         if self.is_stale:
-            from app.tools.notion_pantry import get_all_pantry_items
-            self._cache = await get_all_pantry_items()
-            self._last_fetch = time.time()
+            if self._shared is None:
+                self._set(await self._fetch(), time.time())
+            else:
+                await self._refresh_shared()
         return self._cache
 
-    def get_item_names(self) -> set[str]:
-        """Return all pantry item names (regardless of current stock status).
-        For demo purposes, we treat all known pantry items as 'ASUCD Pantry' sourced."""
-        if self._cache is None:
-            return set()
-        return {item["name"].lower() for item in self._cache}
+    async def _fetch(self) -> list[PantryItem]:
+        if self._sync is not None:
+            return await self._sync.sync()
+        from app.tools.notion_pantry import get_all_pantry_items
+        return await get_all_pantry_items()
+
+    def _set(self, items: list[PantryItem], fetched_at: float):
+        self._cache = items
+        self._last_fetch = fetched_at
+        self._name_index = None
+        self._item_ids = vocabulary.intern_all(item.name for item in items)
+        self._item_names = frozenset(item.name.lower() for item in items)
+
+    async def _refresh_shared(self):
+        if await asyncio.to_thread(self._adopt_shared):
+            return
+        # Only the lock holder fetches. Without a copy to serve, wait for
+        # whoever holds it; its snapshot is then adopted below.
+        if not await asyncio.to_thread(self._refresh_lock.acquire, self._cache is None):
+            return
+        try:
+            if await asyncio.to_thread(self._adopt_shared):
+                return
+            items = await self._fetch()
+            fetched_at = time.time()
+            self._shared_version = await asyncio.to_thread(
+                self._shared.write, SNAPSHOT_KEY, orjson.dumps(items), fetched_at
+            )
+            self._set(items, fetched_at)
+        finally:
+            self._refresh_lock.release()
+
+    def _adopt_shared(self) -> bool:
+        """Take the shared snapshot if it is within the TTL; True if there is nothing to fetch."""
+        row = self._shared.read(SNAPSHOT_KEY, self._shared_version)
+        if row is None or (time.time() - row[1]) > self._ttl:
+            return False
+        version, fetched_at, data = row
+        if data is None:
+            self._last_fetch = fetched_at  # Already holding this snapshot
+        else:
+            self._set([PantryItem.create(**item) for item in orjson.loads(data)], fetched_at)
+            self._shared_version = version
+        return True
+
+    def get_item_names(self) -> frozenset[str]:
+        """Return all pantry item names, lowercased (regardless of current stock status).
+        For demo purposes, we treat all known pantry items as 'ASUCD Pantry' sourced.
+        Built once per refresh."""
+        return self._item_names
+
+    def get_item_ids(self) -> frozenset[int]:
+        """Vocabulary ids of all pantry items (same set as get_item_names())."""
+        return self._item_ids
+
+    def get_name_index(self) -> FuzzyIndex:
+        """Fuzzy index over get_item_names(), rebuilt when the cache refreshes."""
+        if self._name_index is None:
+            self._name_index = FuzzyIndex(self.get_item_names())
+        return self._name_index
 
     def invalidate(self):
         self._cache = None
+        self._name_index = None
+        self._item_ids = frozenset()
+        self._item_names = frozenset()
+        self._shared_version = 0
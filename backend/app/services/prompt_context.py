@@ -0,0 +1,135 @@
+"""
+Context selection for LLM prompts: rank pantry items by relevance to the
+request and keep only as many as fit a token budget, instead of pasting
+the whole merged pantry into every prompt.
+
+Relevance uses a coarse culinary role per ingredient (fat, acid, grain,
+protein...) from keywords in its name:
+
+  - substitution: pantry items similar to a missing ingredient, or sharing
+    its role, rank first; candidates are interleaved across the missing
+    ingredients so each one gets its best options. Whatever budget is left
+    goes to the rest of the pantry, round-robin across roles, so an
+    ingredient nothing resembles still gets a varied list to pick from.
+  - generation: the user's own items are always kept; pantry items are
+    added round-robin across roles, starting with roles the user's items
+    don't already cover, so the list complements what was scanned.
+"""
+
+from app.services.fuzzy_match import similarity, tokenize
+
+ROLE_KEYWORDS: dict[str, frozenset[str]] = {
+    "fat": frozenset({"oil", "butter", "margarine", "ghee", "lard", "shortening", "spray"}),
+    "acid": frozenset({"vinegar", "lemon", "lime", "juice"}),
+    "sweetener": frozenset({"sugar", "honey", "syrup", "molasses", "jam", "jelly"}),
+    "dairy": frozenset({"milk", "cheese", "yogurt", "cream", "parmesan", "mozzarella", "cheddar"}),
+    "protein": frozenset({
+        "egg", "chicken", "beef", "pork", "tuna", "salmon", "fish", "tofu", "bean", "lentil",
+        "chickpea", "turkey", "ham", "bacon", "sausage", "peanut", "nut", "almond", "seed",
+    }),
+    "grain": frozenset({
+        "rice", "pasta", "noodle", "bread", "tortilla", "oat", "flour", "cereal", "quinoa",
+        "cracker", "spaghetti", "macaroni", "couscous", "barley", "cornmeal",
+    }),
+    "sauce": frozenset({"sauce", "ketchup", "mustard", "mayonnaise", "salsa", "dressing", "paste", "broth", "soup"}),
+    "spice": frozenset({
+        "salt", "pepper", "cinnamon", "cumin", "paprika", "oregano", "basil", "garlic", "ginger",
+        "chili", "seasoning", "spice", "powder", "flake", "thyme", "parsley", "cilantro", "vanilla",
+    }),
+    "produce": frozenset({
+        "apple", "banana", "orange", "tomato", "onion", "potato", "carrot", "spinach", "lettuce",
+        "broccoli", "pepper", "corn", "pea", "celery", "cucumber", "avocado", "berry", "fruit",
+        "vegetable", "mushroom", "cabbage", "zucchini", "squash", "kale",
+    }),
+}
+# Checked in this order, so "peanut butter" is protein before it is fat
+_ROLE_ORDER = ("protein", "dairy", "grain", "sauce", "sweetener", "acid", "fat", "spice", "produce")
+
+
+def ingredient_role(name: str) -> str | None:
+    tokens = set(tokenize(name))
+    for role in _ROLE_ORDER:
+        if tokens & ROLE_KEYWORDS[role]:
+            return role
+    return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of prompt text (~4 characters per token); shared with the Groq rate governor."""
+    return (len(text) + 3) // 4
+
+
+def _item_tokens(item: str) -> int:
+    """Cost of one item in a JSON list prompt: its text plus quotes and comma."""
+    return estimate_tokens(item) + 1
+
+
+def _take_within_budget(items: list[str], budget_tokens: int) -> list[str]:
+    selected, used = [], 0
+    for item in items:
+        cost = _item_tokens(item)
+        if used + cost > budget_tokens:
+            break
+        selected.append(item)
+        used += cost
+    return selected
+
+
+def select_for_substitution(missing_items: list[str], pantry_items: list[str], budget_tokens: int) -> list[str]:
+    """Pantry items most useful as swaps for `missing_items`, within the token budget."""
+    pantry = list(dict.fromkeys(pantry_items))
+    if sum(_item_tokens(p) for p in pantry) <= budget_tokens:
+        return pantry
+
+    pantry_roles = [ingredient_role(p) for p in pantry]
+    rankings = []
+    for missing in missing_items:
+        role = ingredient_role(missing)
+        scored = []
+        for item, item_role in zip(pantry, pantry_roles):
+            score = similarity(missing, item) + (0.5 if role is not None and item_role == role else 0.0)
+            if score > 0:
+                scored.append((-score, item))
+        scored.sort()
+        rankings.append([item for _, item in scored])
+
+    # Interleave so every missing ingredient gets its top candidates
+    ranked = list(dict.fromkeys(
+        ranking[i] for i in range(max(map(len, rankings), default=0)) for ranking in rankings if i < len(ranking)
+    ))
+    ranked_set = set(ranked)
+    rest = _round_robin_by_role([p for p in pantry if p not in ranked_set], covered=set())
+    return _take_within_budget(ranked + rest, budget_tokens)
+
+
+def _round_robin_by_role(items: list[str], covered: set[str | None]) -> list[str]:
+    """`items` bucketed by role and interleaved across buckets; roles in `covered` and role-less items go last."""
+    buckets: dict[str | None, list[str]] = {}
+    for item in sorted(items, key=str.lower):
+        buckets.setdefault(ingredient_role(item), []).append(item)
+    roles = sorted(buckets, key=lambda r: (r is None, r in covered, r or ""))
+
+    ordered = []
+    depth = max((len(b) for b in buckets.values()), default=0)
+    for i in range(depth):
+        ordered.extend(buckets[r][i] for r in roles if i < len(buckets[r]))
+    return ordered
+
+
+def select_for_generation(user_items: list[str], available: list[str], budget_tokens: int) -> list[str]:
+    """
+    The user's items plus the pantry items that best complement them,
+    within the token budget (the user's items are always kept).
+    """
+    user_keys = {u.strip().lower() for u in user_items}
+    user = [a for a in dict.fromkeys(available) if a.strip().lower() in user_keys]
+    user += [u for u in dict.fromkeys(user_items) if u not in user]
+    pantry = [a for a in dict.fromkeys(available) if a.strip().lower() not in user_keys]
+    if sum(_item_tokens(p) for p in user + pantry) <= budget_tokens:
+        return user + pantry
+
+    # Roles the user doesn't have yet go first
+    ordered = _round_robin_by_role(pantry, covered={ingredient_role(u) for u in user})
+
+    remaining = budget_tokens - sum(_item_tokens(u) for u in user)
+    return user + _take_within_budget(ordered, max(remaining, 0))
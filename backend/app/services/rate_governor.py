@@ -0,0 +1,186 @@
+"""
+Client-side rate governor for Groq, shared by every Groq caller.
+
+Requests-per-minute and tokens-per-minute are each tracked as a GCRA
+(generic cell rate algorithm) budget: a "theoretical arrival time" that
+advances by cost / rate per admitted request and may run at most one
+minute ahead of now. Admitting a request reserves its share right away,
+so concurrent callers queue up in order behind each other without a
+lock-step token refill loop, and the projected wait for the next request
+is known before it is made.
+
+Before each call, acquire() works out how long the request would have to
+wait. If that wait is longer than the caller's expected Ollama latency (an
+EWMA of observed Ollama calls), the request is routed to Ollama instead.
+Otherwise it waits its turn and goes to Groq, so load spikes stay on the
+fast provider instead of bouncing to the slow one.
+
+Groq's rate-limit headers (x-ratelimit-remaining-*, x-ratelimit-reset-*,
+retry-after) are read from every response through an httpx event hook
+and only ever tighten the local budgets, e.g. when other processes share
+the same API key.
+"""
+
+import asyncio
+import logging
+import re
+import threading
+import time
+
+import httpx
+
+from app.config import settings
+from app.services.metrics import GROQ_ROUTING, time_stage
+from app.services.prompt_context import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Completion tokens reserved per call on top of the prompt estimate
+DEFAULT_COMPLETION_TOKENS = 512
+EWMA_ALPHA = 0.2
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_reset(value: str) -> float | None:
+    """Seconds from a Groq reset header ("7.66s", "2m59.56s", "1h2m3s", "120ms") or a plain number."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+class _Budget:
+    """One GCRA budget: `limit` units per `period` seconds, burst up to `limit`."""
+
+    def __init__(self, limit: int, period: float = 60.0):
+        self.limit = limit
+        self.period = period
+        self.interval = period / limit if limit else 0.0
+        self.tat = 0.0  # theoretical arrival time (monotonic)
+
+    def start_time(self, cost: float, now: float) -> float:
+        """Earliest time a request costing `cost` units fits."""
+        if not self.limit:
+            return now
+        return max(now, self.tat + min(cost, self.limit) * self.interval - self.period)
+
+    def reserve(self, cost: float, start: float):
+        if self.limit:
+            self.tat = max(self.tat, start) + min(cost, self.limit) * self.interval
+
+    def release(self, cost: float):
+        """Give back a reservation that won't be used (later reservations keep their slots)."""
+        if self.limit:
+            self.tat -= min(cost, self.limit) * self.interval
+
+    def sync_remaining(self, remaining: float, now: float):
+        """Tighten to a server-reported remaining allowance (never loosens)."""
+        if self.limit:
+            self.tat = max(self.tat, now + self.period - remaining * self.interval)
+
+
+class RateGovernor:
+    def __init__(self, rpm_limit: int, tpm_limit: int, ollama_latency_seconds: float):
+        self._requests = _Budget(rpm_limit)
+        self._tokens = _Budget(tpm_limit)
+        self._default_ollama_latency = ollama_latency_seconds
+        self._ollama_latency: dict[str, float] = {}
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._requests.limit or self._tokens.limit)
+
+    def _start_time(self, tokens: int, now: float) -> float:
+        return max(self._requests.start_time(1, now), self._tokens.start_time(tokens, now), self._blocked_until)
+
+    def projected_wait(self, tokens: int) -> float:
+        """Seconds a request of `tokens` would queue if it were admitted now."""
+        now = time.monotonic()
+        with self._lock:
+            return self._start_time(tokens, now) - now
+
+    def expected_ollama_latency(self, caller: str) -> float:
+        return self._ollama_latency.get(caller, self._default_ollama_latency)
+
+    def observe_latency(self, provider: str, caller: str, seconds: float):
+        """Feed an observed LLM call duration (only Ollama's are used, for routing)."""
+        if provider != "ollama":
+            return
+        with self._lock:
+            previous = self._ollama_latency.get(caller)
+            self._ollama_latency[caller] = (
+                seconds if previous is None else (1 - EWMA_ALPHA) * previous + EWMA_ALPHA * seconds
+            )
+
+    async def acquire(self, caller: str, prompt: str, completion_tokens: int = DEFAULT_COMPLETION_TOKENS,
+                      can_fall_back: bool = True) -> bool:
+        """
+        Reserve Groq capacity for one call and wait for its turn. Returns False
+        (reserving nothing) when the wait would exceed the expected Ollama
+        latency and a fallback is available: the caller should use Ollama.
+        """
+        if not self.enabled:
+            return True
+        tokens = estimate_tokens(prompt) + completion_tokens
+        now = time.monotonic()
+        with self._lock:
+            start = self._start_time(tokens, now)
+            wait = start - now
+            if can_fall_back and wait > self.expected_ollama_latency(caller):
+                GROQ_ROUTING.inc(caller, "rerouted")
+                logger.info("Groq queue too long, routing to Ollama", extra={"caller": caller, "wait_s": round(wait, 2)})
+                return False
+            self._requests.reserve(1, start)
+            self._tokens.reserve(tokens, start)
+
+        if wait <= 0:
+            GROQ_ROUTING.inc(caller, "immediate")
+            return True
+        GROQ_ROUTING.inc(caller, "queued")
+        try:
+            with time_stage("groq_queue"):
+                await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # The caller went away while queued; don't leave its share booked
+            with self._lock:
+                self._requests.release(1)
+                self._tokens.release(tokens)
+            raise
+        return True
+
+    def observe_headers(self, headers: httpx.Headers, status_code: int):
+        """Fold Groq's rate-limit headers into the local budgets."""
+        now = time.monotonic()
+        with self._lock:
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            if remaining_tokens is not None and remaining_tokens.isdigit():
+                self._tokens.sync_remaining(float(remaining_tokens), now)
+            # Requests are limited per day on Groq; only an exhausted allowance matters here
+            if headers.get("x-ratelimit-remaining-requests") == "0":
+                reset = parse_reset(headers.get("x-ratelimit-reset-requests", ""))
+                if reset:
+                    self._blocked_until = max(self._blocked_until, now + reset)
+            if status_code == 429:
+                retry_after = parse_reset(headers.get("retry-after", "")) or 1.0
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def http_async_client(self) -> httpx.AsyncClient:
+        """Shared httpx client for ChatGroq whose response hook feeds observe_headers."""
+        if self._client is None:
+            async def hook(response: httpx.Response):
+                self.observe_headers(response.headers, response.status_code)
+            self._client = httpx.AsyncClient(event_hooks={"response": [hook]}, timeout=httpx.Timeout(60.0))
+        return self._client
+
+
+# Shared by every Groq caller in this process
+groq_governor = RateGovernor(settings.GROQ_RPM_LIMIT, settings.GROQ_TPM_LIMIT, settings.OLLAMA_EXPECTED_LATENCY_SECONDS)
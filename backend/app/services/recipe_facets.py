@@ -0,0 +1,187 @@
+"""
+Recipe facets: dietary and meal-style tags derived from a recipe's
+ingredient names and preparation text, matching the filter and dietary
+preference labels the frontend sends.
+
+Tags are keyword rules over the ingredient tokens (fuzzy_match.tokenize),
+with phrase exceptions for the usual false friends ("peanut butter" is not
+dairy, "coconut" and "nutmeg" are not nuts, "rice noodles" are gluten
+free). They are conservative: a recipe only gets a tag when nothing in it
+contradicts it.
+
+The recipe index stores one bitmap per facet, so a search intersects the
+requested facets with a few bitwise ANDs before ranking.
+
+Labels with no rule here (Halal, Kosher, Budget Friendly, Meal Prep,
+Weight Loss) can't be derived from the sheet and don't restrict results.
+"""
+
+import re
+
+import numpy as np
+
+from app.services.fuzzy_match import tokenize
+
+FACETS = (
+    "Vegetarian",
+    "Vegan",
+    "No Dairy",
+    "Gluten Free",
+    "Nut Free",
+    "High Protein",
+    "Quick (<15 min)",
+    "No-Cook",
+)
+_FACET_BY_KEY = {facet.lower(): facet for facet in FACETS}
+
+
+def _keywords(*words: str) -> frozenset[str]:
+    """Keyword phrases in tokenized form (stopwords and plurals dropped), as _phrases produces them."""
+    return frozenset(" ".join(tokenize(word)) for word in words)
+
+
+MEAT = _keywords(
+    "chicken", "beef", "pork", "bacon", "ham", "turkey", "sausage", "pepperoni", "salami", "lamb",
+    "steak", "meat", "meatball", "tuna", "salmon", "fish", "shrimp", "prawn", "crab", "anchovy",
+    "sardine", "tilapia", "cod", "gelatin", "chorizo", "prosciutto", "hot dog",
+)
+DAIRY = _keywords(
+    "milk", "cheese", "butter", "cream", "yogurt", "parmesan", "mozzarella", "cheddar", "ricotta",
+    "feta", "ghee", "whey", "buttermilk", "custard",
+)
+NON_DAIRY = _keywords(
+    "peanut butter", "almond butter", "apple butter", "sunflower butter", "cocoa butter",
+    "almond milk", "soy milk", "oat milk", "rice milk", "coconut milk", "coconut cream",
+    "cream of tartar", "vegan cheese", "vegan butter", "dairy free",
+)
+ANIMAL = _keywords("egg", "honey", "mayonnaise")
+GLUTEN = _keywords(
+    "flour", "wheat", "bread", "pasta", "spaghetti", "macaroni", "noodle", "tortilla", "cracker",
+    "barley", "rye", "couscous", "bagel", "bun", "pita", "cereal", "breadcrumb", "panko", "seitan",
+    "soy sauce", "ramen", "udon", "biscuit", "cookie", "cake", "croissant", "muffin", "pancake",
+)
+GLUTEN_FREE = _keywords(
+    "rice noodle", "corn tortilla", "almond flour", "rice flour", "coconut flour", "corn flour",
+    "gluten free", "tamari", "rice cracker", "oat flour",
+)
+NUTS = _keywords(
+    "peanut", "almond", "walnut", "pecan", "cashew", "pistachio", "hazelnut", "macadamia", "nut",
+    "praline", "nutella",
+)
+PROTEIN = _keywords(
+    "chicken", "beef", "pork", "turkey", "tuna", "salmon", "fish", "shrimp", "egg", "tofu", "tempeh",
+    "bean", "lentil", "chickpea", "edamame", "seitan", "peanut butter", "greek yogurt",
+    "cottage cheese", "protein",
+)
+COOKING = frozenset({
+    "cook", "bake", "boil", "fry", "saute", "simmer", "roast", "grill", "microwave", "heat",
+    "toast", "steam", "broil", "preheat", "oven", "skillet", "stovetop", "stove", "poach",
+    "sear", "melt", "scramble", "reheat", "warm",
+})
+SLOW = frozenset({"overnight", "marinate", "chill", "refrigerate", "freeze", "rise", "slow", "hour", "hours"})
+
+_WORD = re.compile(r"[a-z]+")
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)\s*(?:-\s*\d+\s*)?(hours?|hrs?|minutes?|mins?)\b", re.IGNORECASE)
+QUICK_MINUTES = 15
+QUICK_MAX_STEPS = 4
+
+
+def _phrases(tokens: tuple[str, ...]) -> set[str]:
+    """Single tokens and adjacent pairs, so two-word keywords match."""
+    return set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+
+
+def _has(phrases: set[str], keywords: frozenset[str], exceptions: frozenset[str] = frozenset()) -> bool:
+    if not phrases & keywords:
+        return False
+    if not exceptions:
+        return True
+    # Drop the tokens of every exception phrase present, then look again
+    tokens = {p for p in phrases if " " not in p}
+    for phrase in phrases & exceptions:
+        tokens -= set(phrase.split())
+    remaining = {p for p in phrases if all(t in tokens for t in p.split())}
+    return bool(remaining & keywords)
+
+
+def _stated_minutes(text: str) -> float:
+    total = 0.0
+    for amount, unit in _DURATION.findall(text):
+        total += float(amount) * (60 if unit.lower().startswith("h") else 1)
+    return total
+
+
+# Ingredient flags, OR-ed across a recipe's ingredients
+MEAT_FLAG, DAIRY_FLAG, ANIMAL_FLAG, GLUTEN_FLAG, NUTS_FLAG, PROTEIN_FLAG = (1 << i for i in range(6))
+
+
+def ingredient_flags(name: str) -> int:
+    """Bitmask of what one normalized ingredient name contains (meat, dairy, gluten...)."""
+    phrases = _phrases(tokenize(name))
+    flags = 0
+    if _has(phrases, MEAT):
+        flags |= MEAT_FLAG
+    if _has(phrases, DAIRY, NON_DAIRY):
+        flags |= DAIRY_FLAG
+    if _has(phrases, ANIMAL):
+        flags |= ANIMAL_FLAG
+    if _has(phrases, GLUTEN, GLUTEN_FREE):
+        flags |= GLUTEN_FLAG
+    if _has(phrases, NUTS):
+        flags |= NUTS_FLAG
+    if _has(phrases, PROTEIN):
+        flags |= PROTEIN_FLAG
+    return flags
+
+
+def recipe_facets(flags: int, steps: list[str]) -> set[str]:
+    """Facet labels for one recipe, from its OR-ed ingredient flags and its preparation steps."""
+    facets = set()
+    if not flags & MEAT_FLAG:
+        facets.add("Vegetarian")
+        if not flags & (DAIRY_FLAG | ANIMAL_FLAG):
+            facets.add("Vegan")
+    if not flags & DAIRY_FLAG:
+        facets.add("No Dairy")
+    if not flags & GLUTEN_FLAG:
+        facets.add("Gluten Free")
+    if not flags & NUTS_FLAG:
+        facets.add("Nut Free")
+    if flags & PROTEIN_FLAG:
+        facets.add("High Protein")
+
+    text = " ".join(steps)
+    # Plain words: preparation text is long and unique, so it stays out of tokenize's cache
+    step_tokens = set(_WORD.findall(text.lower()))
+    if steps and not step_tokens & COOKING:
+        facets.add("No-Cook")
+    minutes = _stated_minutes(text)
+    if not step_tokens & SLOW and (
+        0 < minutes < QUICK_MINUTES or (minutes == 0 and len(steps) <= QUICK_MAX_STEPS)
+    ):
+        facets.add("Quick (<15 min)")
+    return facets
+
+
+def requested_facets(labels: list[str]) -> list[str]:
+    """The known facets among filter / dietary preference labels (case-insensitive), in FACETS order."""
+    wanted = {_FACET_BY_KEY.get(label.strip().lower()) for label in labels}
+    return [facet for facet in FACETS if facet in wanted]
+
+
+def facet_bitmaps(tags: list[set[str]]) -> np.ndarray:
+    """Packed bitmaps, one row per facet in FACETS order, one bit per recipe."""
+    bits = np.array([[facet in recipe for recipe in tags] for facet in FACETS], dtype=bool)
+    return np.packbits(bits.reshape(len(FACETS), len(tags)), axis=1)
+
+
+def eligible(bitmaps: np.ndarray, facet_names: list[str], facets: list[str], n_recipes: int) -> np.ndarray | None:
+    """
+    Bool mask of recipes carrying every facet in `facets` (None if no facet
+    restricts anything). `facet_names` is the row order `bitmaps` was built with.
+    """
+    rows = [facet_names.index(f) for f in facets if f in facet_names]
+    if not rows:
+        return None
+    packed = np.bitwise_and.reduce(bitmaps[rows], axis=0)
+    return np.unpackbits(packed, count=n_recipes).astype(bool)
@@ -0,0 +1,493 @@
+"""
+Recipe index: the Google Sheet parsed once into a compact columnar corpus,
+persisted as a versioned on-disk snapshot and memory-mapped on load.
+
+A snapshot is a directory of .npy arrays plus meta.json:
+
+  {titles,lines,names,pantry,steps}_{bytes,bounds}
+                                        string tables (UTF-8 bytes + string boundaries)
+  line_offsets, pantry_offsets,         per-recipe slices into the tables
+  step_offsets
+  line_name_ids                         each ingredient line's normalized name (id into `names`)
+  row_index                             original sheet row (recipe ids are recipe_{row+1:03d})
+  fuel_scores, fuel_summary_ids         precomputed academic fuel score per recipe
+  facet_bits                            packed bitmap per facet (rows in meta["facets"] order)
+
+BM25 indexes over the ingredient names and title tokens are derived from
+these arrays on first use, not stored.
+
+Snapshots live in <dir>/<version-id>/ with a CURRENT file naming the live
+one, so a new snapshot is published with a single atomic rename.
+
+The snapshot directory is also how the uvicorn workers on a host share the
+corpus. Only the worker holding <dir>/.refresh.lock refreshes from the sheet.
+CURRENT's mtime is when the published corpus was last confirmed against the
+sheet, so the other workers mmap the new snapshot (or just mark theirs
+fresh) instead of downloading the sheet themselves.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import numpy as np
+
+from app.services.academic_fuel import calculate_academic_fuel_scores
+from app.services.bm25 import BM25Index
+from app.services.fuzzy_match import FuzzyIndex, tokenize
+from app.services.recipe_facets import FACETS, eligible, facet_bitmaps, ingredient_flags, recipe_facets
+from app.services.records import Ingredient, RecipeRecord
+from app.services.shared_cache import FileLock
+from app.services.vocabulary import canonical, vocabulary
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT = "aggie-recipe-index"
+# Bump when parsing/normalization changes so old snapshots are rebuilt
+INDEX_VERSION = 4
+KEEP_SNAPSHOTS = 2
+# A worker that finds another one refreshing looks for its snapshot again after this long
+FOLLOWER_RECHECK_SECONDS = 5
+MAX_MEMOIZED_MATCHES = 50_000
+
+# fetch_rows(known_version) -> (rows, version); rows is None when the source
+# is still at known_version. version "" means the source couldn't tell.
+FetchRows = Callable[[str], tuple[list[dict] | None, str]]
+
+
+class StringTable:
+    """Read-only list of strings stored as one UTF-8 buffer plus offsets."""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, strings: list[str]) -> "StringTable":
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def slice(self, start: int, stop: int) -> list[str]:
+        return [self[i] for i in range(start, stop)]
+
+
+class RecipeCorpus:
+    """The parsed recipe sheet, in columnar arrays (see module docstring)."""
+
+    def __init__(self, arrays: dict[str, np.ndarray], meta: dict):
+        self.meta = meta
+        self.titles = StringTable(arrays["titles_bytes"], arrays["titles_bounds"])
+        self.lines = StringTable(arrays["lines_bytes"], arrays["lines_bounds"])
+        self.names = StringTable(arrays["names_bytes"], arrays["names_bounds"])
+        self.pantry = StringTable(arrays["pantry_bytes"], arrays["pantry_bounds"])
+        self.steps = StringTable(arrays["steps_bytes"], arrays["steps_bounds"])
+        self.line_offsets = arrays["line_offsets"]
+        self.pantry_offsets = arrays["pantry_offsets"]
+        self.step_offsets = arrays["step_offsets"]
+        self.line_name_ids = arrays["line_name_ids"]
+        self.row_index = arrays["row_index"]
+        self.fuel_scores = arrays["fuel_scores"]
+        self.fuel_summary_ids = arrays["fuel_summary_ids"]
+        self.facet_bits = arrays["facet_bits"]
+        self._arrays = arrays
+        self._name_list: list[str] | None = None
+        self._name_index: FuzzyIndex | None = None
+        self._matches_by_id: dict[int, np.ndarray] = {}
+        self._ingredient_bm25: BM25Index | None = None
+        self._title_bm25: BM25Index | None = None
+        self._title_vocab: dict[str, int] = {}
+        self.snapshot_id = ""  # Set once saved to / loaded from a snapshot
+
+    def __len__(self) -> int:
+        return len(self.row_index)
+
+    @property
+    def name_list(self) -> list[str]:
+        """Normalized ingredient vocabulary as Python strings (decoded once)."""
+        if self._name_list is None:
+            self._name_list = [self.names[i] for i in range(len(self.names))]
+        return self._name_list
+
+    @property
+    def name_index(self) -> FuzzyIndex:
+        """Fuzzy index over the ingredient vocabulary (built on first use)."""
+        if self._name_index is None:
+            self._name_index = FuzzyIndex(self.name_list)
+        return self._name_index
+
+    def name_ids_matching(self, ingredient_id: int) -> np.ndarray:
+        """
+        Ids into `names` that fuzzy-match a vocabulary ingredient. Memoized per
+        ingredient id, so a pantry that is searched on every request is only
+        matched against this corpus once.
+        """
+        found = self._matches_by_id.get(ingredient_id)
+        if found is None:
+            if len(self._matches_by_id) >= MAX_MEMOIZED_MATCHES:
+                self._matches_by_id.clear()
+            found = self._matches_by_id[ingredient_id] = self._matching(vocabulary.name(ingredient_id))
+        return found
+
+    def names_matching(self, name: str) -> np.ndarray:
+        """Ids into `names` that fuzzy-match a name outside the vocabulary (not memoized)."""
+        return self._matching(canonical(name))
+
+    def _matching(self, key: str) -> np.ndarray:
+        matched = self.name_index.matching_ids(key)
+        return np.fromiter(matched, dtype=np.int64, count=len(matched))
+
+    @property
+    def ingredient_bm25(self) -> BM25Index:
+        """BM25 over each recipe's normalized ingredient names (built on first use)."""
+        if self._ingredient_bm25 is None:
+            self._ingredient_bm25 = BM25Index(self.line_offsets, self.line_name_ids, len(self.names))
+        return self._ingredient_bm25
+
+    @property
+    def title_bm25(self) -> BM25Index:
+        """BM25 over each recipe's title tokens (built on first use)."""
+        if self._title_bm25 is None:
+            vocab: dict[str, int] = {}
+            offsets, token_ids = [0], []
+            for i in range(len(self)):
+                token_ids.extend(vocab.setdefault(t, len(vocab)) for t in tokenize(self.titles[i]))
+                offsets.append(len(token_ids))
+            self._title_vocab = vocab
+            self._title_bm25 = BM25Index(np.asarray(offsets), np.asarray(token_ids, dtype=np.int64), len(vocab))
+        return self._title_bm25
+
+    def title_term_ids(self, names: list[str]) -> np.ndarray:
+        """Distinct title-token ids for the tokens of `names` (unknown tokens dropped)."""
+        self.title_bm25  # builds the vocabulary
+        ids = {self._title_vocab[t] for name in names for t in tokenize(name) if t in self._title_vocab}
+        return np.fromiter(ids, dtype=np.int64, count=len(ids))
+
+    def eligible(self, facets: list[str]) -> np.ndarray | None:
+        """Bool mask of recipes tagged with every facet in `facets`; None when nothing is excluded."""
+        return eligible(self.facet_bits, self.meta["facets"], facets, len(self))
+
+    def recipe(self, i: int, **match_stats) -> RecipeRecord:
+        """Recipe i as a record; `match_stats` fills its search match fields."""
+        start, stop = int(self.line_offsets[i]), int(self.line_offsets[i + 1])
+        name_list = self.name_list
+        ingredients = tuple(
+            Ingredient.create(self.lines[j], name_list[name_id])
+            for j, name_id in zip(range(start, stop), self.line_name_ids[start:stop].tolist())
+        )
+        return RecipeRecord(
+            id=f"recipe_{int(self.row_index[i]) + 1:03d}",
+            title=self.titles[i],
+            ingredients=ingredients,
+            pantry_ingredients=tuple(self.pantry.slice(int(self.pantry_offsets[i]), int(self.pantry_offsets[i + 1]))),
+            instructions=tuple(self.steps.slice(int(self.step_offsets[i]), int(self.step_offsets[i + 1]))),
+            academic_fuel_score=float(self.fuel_scores[i]),
+            fuel_summary=self.meta["fuel_summaries"][int(self.fuel_summary_ids[i])],
+            **match_stats,
+        )
+
+    @classmethod
+    def build(
+        cls,
+        rows: list[dict],
+        extract_name: Callable[[str], str],
+        split_lines: Callable[[str], list[str]],
+    ) -> "RecipeCorpus":
+        """Parse sheet rows (header whitespace already stripped) into a corpus."""
+        titles, lines, pantry, steps, row_index = [], [], [], [], []
+        line_offsets, pantry_offsets, step_offsets = [0], [0], [0]
+        vocab: dict[str, int] = {}
+        line_name_ids = []
+
+        for idx, record in enumerate(rows):
+            title = str(record.get("Recipe", "")).strip()
+            if not title:
+                continue
+            ingredient_lines = split_lines(str(record.get("Ingredients", "")))
+            if not ingredient_lines:
+                continue
+
+            titles.append(title)
+            row_index.append(idx)
+            for line in ingredient_lines:
+                lines.append(line)
+                line_name_ids.append(vocab.setdefault(extract_name(line), len(vocab)))
+            line_offsets.append(len(lines))
+            pantry.extend(split_lines(str(record.get("Ingredient(s) at The Pantry", ""))))
+            pantry_offsets.append(len(pantry))
+            steps.extend(split_lines(str(record.get("Preparation", ""))))
+            step_offsets.append(len(steps))
+
+        # The planner scores recipes on their ingredient lines; precompute the same
+        fuel = calculate_academic_fuel_scores([
+            lines[line_offsets[i]:line_offsets[i + 1]] for i in range(len(titles))
+        ])
+        # Facet tags: ingredient flags once per distinct name, OR-ed per recipe
+        names = list(vocab)
+        name_flags = np.asarray([ingredient_flags(name) for name in names], dtype=np.uint8)
+        recipe_flags = (
+            np.bitwise_or.reduceat(name_flags[line_name_ids], line_offsets[:-1]).tolist() if titles else []
+        )
+        tags = [
+            recipe_facets(flags, steps[step_offsets[i]:step_offsets[i + 1]])
+            for i, flags in enumerate(recipe_flags)
+        ]
+        summaries = sorted({summary for _, summary in fuel})
+        summary_ids = {summary: i for i, summary in enumerate(summaries)}
+
+        arrays = {}
+        for name, strings in (("titles", titles), ("lines", lines), ("names", names),
+                              ("pantry", pantry), ("steps", steps)):
+            table = StringTable.build(strings)
+            arrays[f"{name}_bytes"] = table.data
+            arrays[f"{name}_bounds"] = table.offsets
+        arrays.update({
+            "line_offsets": np.asarray(line_offsets, dtype=np.int64),
+            "pantry_offsets": np.asarray(pantry_offsets, dtype=np.int64),
+            "step_offsets": np.asarray(step_offsets, dtype=np.int64),
+            "line_name_ids": np.asarray(line_name_ids, dtype=np.int32),
+            "row_index": np.asarray(row_index, dtype=np.int32),
+            "fuel_scores": np.asarray([score for score, _ in fuel], dtype=np.float64),
+            "fuel_summary_ids": np.asarray([summary_ids[s] for _, s in fuel], dtype=np.uint8),
+            "facet_bits": facet_bitmaps(tags),
+        })
+        meta = {
+            "format": INDEX_FORMAT,
+            "version": INDEX_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "recipes": len(titles),
+            "fuel_summaries": summaries,
+            "facets": list(FACETS),
+        }
+        return cls(arrays, meta)
+
+    # ---------- Snapshot I/O ----------
+
+    def save(self, root: str) -> str:
+        """Write a new snapshot under `root` and make it CURRENT. Returns its path."""
+        os.makedirs(root, exist_ok=True)
+        snapshot_id = f"v{INDEX_VERSION}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid4().hex[:8]}"
+        tmp_dir = os.path.join(root, f".tmp-{snapshot_id}")
+        os.makedirs(tmp_dir)
+        for name, array in self._arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+        final_dir = os.path.join(root, snapshot_id)
+        os.rename(tmp_dir, final_dir)
+
+        pointer_tmp = os.path.join(root, f".CURRENT-{snapshot_id}")
+        with open(pointer_tmp, "w") as f:
+            f.write(snapshot_id)
+        os.replace(pointer_tmp, os.path.join(root, "CURRENT"))
+        _prune_snapshots(root, keep=snapshot_id)
+        self.snapshot_id = snapshot_id
+        return final_dir
+
+    @classmethod
+    def load(cls, root: str) -> "RecipeCorpus | None":
+        """Memory-map the CURRENT snapshot under `root`; None if missing or incompatible."""
+        try:
+            snapshot_id = _current_snapshot_id(root)
+            snapshot_dir = os.path.join(root, snapshot_id)
+            with open(os.path.join(snapshot_dir, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("format") != INDEX_FORMAT or meta.get("version") != INDEX_VERSION:
+            return None
+
+        arrays = {}
+        try:
+            for filename in os.listdir(snapshot_dir):
+                if filename.endswith(".npy"):
+                    arrays[filename[:-4]] = np.load(os.path.join(snapshot_dir, filename), mmap_mode="r")
+        except (OSError, ValueError):
+            return None  # Pruned by another worker since CURRENT was read; the caller refreshes
+        try:
+            corpus = cls(arrays, meta)
+        except KeyError:
+            return None
+        corpus.snapshot_id = snapshot_id
+        return corpus
+
+
+def _current_snapshot_id(root: str) -> str:
+    with open(os.path.join(root, "CURRENT")) as f:
+        return f.read().strip()
+
+
+def _prune_snapshots(root: str, keep: str):
+    """Drop old snapshot directories, keeping the newest KEEP_SNAPSHOTS (always `keep`)."""
+    versions = sorted(
+        (d for d in os.listdir(root) if d.startswith("v") and os.path.isdir(os.path.join(root, d))),
+        key=lambda d: os.path.getmtime(os.path.join(root, d)),
+        reverse=True,
+    )
+    for old in [d for d in versions if d != keep][KEEP_SNAPSHOTS - 1:]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+class RecipeIndex:
+    """
+    Process-wide recipe corpus. Starts from the on-disk snapshot when there
+    is one, and refreshes from the sheet in a background thread once the
+    corpus is older than the TTL. A failed refresh keeps serving the old
+    corpus, so a Sheets outage doesn't take search down.
+
+    With a snapshot directory, refreshes are coordinated across the workers
+    sharing it (see module docstring).
+    """
+
+    def __init__(self, snapshot_dir: str = "", ttl_seconds: int = 600):
+        self._snapshot_dir = snapshot_dir
+        self._ttl = ttl_seconds
+        self._corpus: RecipeCorpus | None = None
+        self._loaded_at: float = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._started_at = time.time()
+        self._refresh_lock = FileLock(os.path.join(snapshot_dir, ".refresh.lock")) if snapshot_dir else None
+
+    @property
+    def is_stale(self) -> bool:
+        return self._corpus is None or (time.time() - self._loaded_at) > self._ttl
+
+    def load_snapshot(self) -> bool:
+        """Adopt the on-disk snapshot if there is one. It counts as stale so a refresh follows."""
+        if not self._snapshot_dir:
+            return False
+        corpus = RecipeCorpus.load(self._snapshot_dir)
+        if corpus is None:
+            return False
+        with self._lock:
+            if self._corpus is None:
+                self._corpus = corpus
+                self._loaded_at = 0
+        logger.info("Loaded recipe index snapshot", extra={"recipes": len(corpus)})
+        return True
+
+    def _adopt_published(self) -> bool:
+        """
+        Adopt the corpus another worker published (or confirmed unchanged)
+        since this process started, if that was within the TTL. True when
+        there is nothing to fetch.
+        """
+        if not self._snapshot_dir:
+            return False
+        try:
+            published_at = os.path.getmtime(os.path.join(self._snapshot_dir, "CURRENT"))
+            snapshot_id = _current_snapshot_id(self._snapshot_dir)
+        except OSError:
+            return False
+        if published_at < self._started_at or (time.time() - published_at) > self._ttl:
+            return False
+        corpus = self._corpus
+        if corpus is None or corpus.snapshot_id != snapshot_id:
+            corpus = RecipeCorpus.load(self._snapshot_dir)
+            if corpus is None:
+                return False
+            logger.info("Adopted recipe index snapshot", extra={"recipes": len(corpus), "snapshot": snapshot_id})
+        with self._lock:
+            self._corpus = corpus
+            self._loaded_at = published_at
+        return True
+
+    def refresh(self, fetch_rows: FetchRows, extract_name, split_lines) -> RecipeCorpus:
+        """
+        Rebuild from the sheet now, persist the snapshot and swap it in.
+        If the source reports it is unchanged since the current corpus was
+        built, the corpus is just marked fresh.
+        """
+        current = self._corpus
+        known_version = current.meta.get("source_version", "") if current is not None else ""
+        rows, version = fetch_rows(known_version)
+        if rows is None and current is not None:
+            if current.snapshot_id and self._snapshot_dir:
+                try:
+                    # Tell the other workers the published corpus is still current
+                    os.utime(os.path.join(self._snapshot_dir, "CURRENT"))
+                except OSError:
+                    pass
+            with self._lock:
+                self._loaded_at = time.time()
+            return current
+
+        corpus = RecipeCorpus.build(rows or [], extract_name, split_lines)
+        corpus.meta["source_version"] = version
+        if self._snapshot_dir:
+            try:
+                corpus.save(self._snapshot_dir)
+            except OSError as e:
+                logger.warning("Could not write recipe index snapshot: %s", e)
+        with self._lock:
+            self._corpus = corpus
+            self._loaded_at = time.time()
+        return corpus
+
+    def _refresh_as_leader(self, *args, wait: bool = False) -> bool:
+        """Refresh unless another worker holds the refresh lock (with `wait`, wait for it instead)."""
+        if self._refresh_lock is None:
+            self.refresh(*args)
+            return True
+        if not self._refresh_lock.acquire(blocking=wait):
+            return False
+        try:
+            # The previous leader may have just published
+            if not self._adopt_published():
+                self.refresh(*args)
+        finally:
+            self._refresh_lock.release()
+        return True
+
+    def _background_refresh(self, *args):
+        try:
+            if not self._refresh_as_leader(*args):
+                # Another worker is refreshing; pick up its snapshot in a moment
+                self._loaded_at = time.time() - self._ttl + FOLLOWER_RECHECK_SECONDS
+        except Exception as e:
+            logger.warning("Recipe index refresh failed; serving previous corpus: %s", e)
+            self._loaded_at = time.time()  # Retry after another TTL rather than on every search
+        finally:
+            self._refreshing = False
+
+    def get(self, fetch_rows: FetchRows, extract_name, split_lines) -> RecipeCorpus:
+        """
+        Current corpus. With nothing in memory, the snapshot is tried first
+        and the sheet is fetched synchronously only if there is no snapshot.
+        A stale corpus is returned as-is while a background refresh runs,
+        unless another worker has already published a fresher one.
+        """
+        if self._corpus is None and not self.load_snapshot():
+            self._refresh_as_leader(fetch_rows, extract_name, split_lines, wait=True)
+            return self._corpus
+
+        if self.is_stale and not self._refreshing and not self._adopt_published():
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(
+                    target=self._background_refresh,
+                    args=(fetch_rows, extract_name, split_lines),
+                    daemon=True,
+                ).start()
+        return self._corpus
+
+    def invalidate(self):
+        with self._lock:
+            self._corpus = None
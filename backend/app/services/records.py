@@ -0,0 +1,53 @@
+"""
+Compact record types for pantry items and recipes.
+
+Slotted frozen dataclasses: no per-object __dict__, and only the parsed
+fields (a recipe carries its ingredient lines, not the raw sheet text they
+were split from). Strings that repeat across records (ingredient lines and
+names, pantry categories) are interned so every record shares one copy.
+orjson serializes these natively, so tool adapters and scan sessions can
+dump them as they are.
+"""
+
+import sys
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class PantryItem:
+    name: str
+    category: str
+    available: bool
+
+    @classmethod
+    def create(cls, name: str, category: str, available: bool) -> "PantryItem":
+        return cls(sys.intern(name), sys.intern(category), available)
+
+
+@dataclass(frozen=True, slots=True)
+class Ingredient:
+    line: str  # As written in the recipe, e.g. "1 cup rice"
+    name: str  # Normalized ingredient name, e.g. "rice"
+
+    @classmethod
+    def create(cls, line: str, name: str) -> "Ingredient":
+        return cls(sys.intern(line), sys.intern(name))
+
+
+@dataclass(frozen=True, slots=True)
+class RecipeRecord:
+    id: str
+    title: str
+    ingredients: tuple[Ingredient, ...]
+    pantry_ingredients: tuple[str, ...]
+    instructions: tuple[str, ...]
+    academic_fuel_score: float
+    fuel_summary: str
+    # Search match stats (left at 0 outside a search)
+    match_count: int = 0
+    match_pct: float = 0.0
+    relevance: float = 0.0
+
+    @property
+    def ingredient_lines(self) -> list[str]:
+        return [ingredient.line for ingredient in self.ingredients]
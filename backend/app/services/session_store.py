@@ -0,0 +1,104 @@
+import asyncio
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+import orjson
+
+from app.services.metrics import record_cache
+
+# Expired rows are deleted from the SQLite tier at most this often
+PRUNE_INTERVAL_SECONDS = 60
+
+
+class SessionStore:
+    """TTL store for /scan results, keyed by session_id.
+
+    Sessions live in memory (bounded, oldest evicted first). If a db_path is
+    given, they are also written through to a local SQLite file so they
+    survive restarts and can be read back after in-memory eviction.
+    """
+
+    def __init__(self, ttl_seconds: int = 1800, max_entries: int = 1000, db_path: str = ""):
+        self._sessions: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._db_path = db_path
+        self._db_ready = False
+        self._pruned_at = 0.0
+
+    def _expired(self, created_at: float) -> bool:
+        return (time.time() - created_at) > self._ttl
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_path)
+        if not self._db_ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(session_id TEXT PRIMARY KEY, created_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_created_at ON sessions (created_at)")
+            self._db_ready = True
+        return conn
+
+    def _db_put(self, session_id: str, created_at: float, data: dict) -> float:
+        """Write a session; an existing row keeps its (earlier) created_at, which is returned."""
+        with closing(self._connect()) as conn, conn:
+            created_at = conn.execute(
+                "INSERT INTO sessions (session_id, created_at, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, "
+                "created_at = MIN(created_at, excluded.created_at) RETURNING created_at",
+                (session_id, created_at, orjson.dumps(data).decode()),
+            ).fetchone()[0]
+            now = time.time()
+            if now - self._pruned_at >= PRUNE_INTERVAL_SECONDS:
+                conn.execute("DELETE FROM sessions WHERE created_at < ?", (now - self._ttl,))
+                self._pruned_at = now
+        return created_at
+
+    def _db_get(self, session_id: str) -> tuple[float, dict] | None:
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT created_at, data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], orjson.loads(row[1])
+
+    def _remember(self, session_id: str, created_at: float, data: dict):
+        self._sessions[session_id] = (created_at, data)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self._max_entries:
+            self._sessions.popitem(last=False)
+
+    async def put(self, session_id: str, data: dict):
+        """Store a session. Updating an existing one keeps its created_at, so its TTL isn't restarted."""
+        entry = self._sessions.get(session_id)
+        created_at = entry[0] if entry is not None else time.time()
+        self._remember(session_id, created_at, data)
+        if self._db_path:
+            try:
+                stored_at = await asyncio.to_thread(self._db_put, session_id, created_at, data)
+            except sqlite3.Error:
+                return  # Disk tier is best-effort; memory still has it
+            if stored_at != created_at and session_id in self._sessions:
+                # Evicted from memory but still on disk: keep the original timestamp
+                self._sessions[session_id] = (stored_at, data)
+
+    async def get(self, session_id: str) -> dict | None:
+        entry = self._sessions.get(session_id)
+        if entry is None and self._db_path:
+            try:
+                entry = await asyncio.to_thread(self._db_get, session_id)
+            except sqlite3.Error:
+                entry = None
+            if entry is not None and not self._expired(entry[0]):
+                self._remember(session_id, *entry)
+
+        if entry is None or self._expired(entry[0]):
+            self._sessions.pop(session_id, None)
+            record_cache("session", hit=False)
+            return None
+        record_cache("session", hit=True)
+        return entry[1]
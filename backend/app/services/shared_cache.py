@@ -0,0 +1,84 @@
+"""
+Building blocks for caches shared by the uvicorn workers on one host.
+
+FileLock elects a refresh leader: whichever worker gets the lock fetches
+from upstream while the others keep serving what they have, so upstream
+traffic doesn't grow with the worker count. SnapshotStore keeps the latest
+snapshot per key in a SQLite file in WAL mode (readers never block the
+writer), with a version counter so a worker only decodes a snapshot when
+it changed.
+"""
+
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, every worker refreshes
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive advisory lock (flock) on a file; also excludes other threads in this process."""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._fd: int | None = None
+
+    def acquire(self, blocking: bool = False) -> bool:
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fd, self._fd = self._fd, None
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+class SnapshotStore:
+    """Latest snapshot per key, with a version bumped on every write and the time it was fetched."""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._path, timeout=10)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots "
+                "(key TEXT PRIMARY KEY, version INTEGER NOT NULL, fetched_at REAL NOT NULL, data BLOB NOT NULL)"
+            )
+            self._ready = True
+        return conn
+
+    def read(self, key: str, known_version: int = 0) -> tuple[int, float, bytes | None] | None:
+        """(version, fetched_at, data) for `key`; data is None if the version is still known_version."""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "SELECT version, fetched_at, CASE WHEN version != ? THEN data END FROM snapshots WHERE key = ?",
+                (known_version, key),
+            ).fetchone()
+
+    def write(self, key: str, data: bytes, fetched_at: float | None = None) -> int:
+        """Replace the snapshot for `key`; returns its new version."""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "INSERT INTO snapshots (key, version, fetched_at, data) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET version = version + 1, fetched_at = excluded.fetched_at, "
+                "data = excluded.data RETURNING version",
+                (key, fetched_at or time.time(), data),
+            ).fetchone()[0]
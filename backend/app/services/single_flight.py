@@ -0,0 +1,70 @@
+"""
+Single-flight request coalescing: concurrent calls with the same key share
+one in-flight execution and all receive its result (or its exception).
+
+Each waiter awaits the shared task through asyncio.shield, so one waiter
+disconnecting doesn't cancel the call for the others; the shared call is
+only cancelled once every waiter has gone. The shared call runs outside
+the starting request's trace, since it serves every waiter; each waiter's
+trace gets an llm_flight span for its wait instead.
+"""
+
+import asyncio
+import hashlib
+import json
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from app.services.metrics import LLM_COALESCED
+from app.services.tracing import detached_context, span
+
+T = TypeVar("T")
+
+
+def canonical_key(*parts: Any) -> str:
+    """Stable hash of JSON-serializable inputs (dict keys sorted)."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]], label: str = "") -> T:
+        """Run fn() unless a call with `key` is already in flight; either way, await its result."""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.get_running_loop().create_task(fn(), context=detached_context()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+        else:
+            LLM_COALESCED.inc(label or "unlabeled")
+
+        call.waiters += 1
+        try:
+            with span("llm_flight", caller=label):
+                return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Last waiter cancelled: nobody wants the result any more
+                call.task.cancel()
+                self._forget(key, call)
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+# Shared by the LLM callers; keys are namespaced by caller
+llm_flights = SingleFlight()
@@ -0,0 +1,149 @@
+"""
+Structured JSON output for the LLM callers.
+
+The chat model is asked for JSON matching a Pydantic schema (Ollama's
+`format` takes the JSON schema itself; Groq gets JSON mode), and the reply
+goes through one parser:
+
+  - a well-formed reply (the common case) is validated straight from the
+    string by pydantic's JSON parser; the lenient steps below only run if
+    that fails
+  - markdown fences and prose around the JSON value are ignored; the value
+    is decoded from its first bracket, not found with a greedy regex
+  - a reply cut off mid-value (e.g. at the token limit) is decoded with
+    pydantic_core's partial-JSON mode, so the complete leading elements
+    still validate
+  - a bare array is accepted where the schema wraps a single list field
+
+If validation still fails, the model gets one repair turn with the error
+instead of the caller silently returning nothing.
+"""
+
+import json
+import logging
+import re
+import time
+from typing import TypeVar
+
+import pydantic_core
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from pydantic import BaseModel, ValidationError
+
+from app.services.metrics import LLM_REPAIRS, track_llm_call
+from app.services.rate_governor import groq_governor
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+MAX_REPAIRS = 1
+
+_FENCE = re.compile(r"```(?:json)?", re.IGNORECASE)
+_decoder = json.JSONDecoder()
+
+REPAIR_PROMPT = """Your previous reply could not be used: {error}
+Reply again with ONLY the corrected JSON, matching this schema exactly:
+{schema}"""
+
+
+class StructuredOutputError(ValueError):
+    """The LLM reply didn't contain JSON matching the requested schema."""
+
+
+def _wrapped_list_field(model: type[BaseModel]) -> str | None:
+    fields = model.model_fields
+    if len(fields) == 1:
+        name, field = next(iter(fields.items()))
+        if getattr(field.annotation, "__origin__", None) is list:
+            return name
+    return None
+
+
+def parse_structured(content: str, model: type[M]) -> M:
+    """Validate an LLM reply against `model`, raising StructuredOutputError."""
+    field = _wrapped_list_field(model)
+    text = content.strip()
+    if field is not None and text.startswith("["):
+        text = f'{{"{field}":{text}}}'
+    try:
+        return model.model_validate_json(text)
+    except ValidationError:
+        pass  # Fences, prose, truncation or a schema error: take the lenient path
+
+    text = _FENCE.sub("", content).strip()
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise StructuredOutputError("the reply contained no JSON value")
+    start = min(starts)
+
+    truncated = False
+    try:
+        data, _ = _decoder.raw_decode(text, start)
+    except json.JSONDecodeError:
+        try:
+            data = pydantic_core.from_json(text[start:], allow_partial=True)
+            truncated = True
+        except ValueError as e:
+            raise StructuredOutputError(f"invalid JSON: {e}") from e
+
+    if field is not None and isinstance(data, list):
+        data = {field: data}
+    try:
+        return model.model_validate(data)
+    except ValidationError as e:
+        # A truncated reply usually ends in one incomplete element; keep the rest
+        items = data.get(field) if field is not None and isinstance(data, dict) else None
+        if truncated and isinstance(items, list) and len(items) > 1:
+            try:
+                return model.model_validate({**data, field: items[:-1]})
+            except ValidationError:
+                pass
+        raise StructuredOutputError(str(e)) from e
+
+
+def groq_json_mode() -> dict:
+    """ChatGroq model_kwargs for JSON mode (Groq takes no schema, so the prompt carries the shape)."""
+    return {"response_format": {"type": "json_object"}}
+
+
+async def ainvoke_structured(
+    llm: BaseChatModel,
+    messages: list[BaseMessage],
+    model: type[M],
+    provider: str,
+    caller: str,
+) -> M:
+    """
+    Call `llm` and validate its reply against `model`, with up to MAX_REPAIRS
+    repair turns. Every call is counted by track_llm_call and its latency fed
+    to the Groq rate governor (for Ollama routing); raises
+    StructuredOutputError if the last reply still doesn't validate.
+    """
+    for attempt in range(MAX_REPAIRS + 1):
+        start = time.perf_counter()
+        with track_llm_call(provider, caller):
+            response = await llm.ainvoke(messages)
+        groq_governor.observe_latency(provider, caller, time.perf_counter() - start)
+        try:
+            result = parse_structured(response.content, model)
+        except StructuredOutputError as e:
+            error = e
+            logger.warning(
+                "LLM reply failed schema validation",
+                extra={"caller": caller, "attempt": attempt, "error": str(e)[:300]},
+            )
+            messages = [
+                *messages,
+                AIMessage(content=response.content),
+                HumanMessage(content=REPAIR_PROMPT.format(
+                    error=str(e)[:500], schema=json.dumps(model.model_json_schema()),
+                )),
+            ]
+            continue
+        if attempt:
+            LLM_REPAIRS.inc(caller, "repaired")
+        return result
+
+    LLM_REPAIRS.inc(caller, "failed")
+    raise error
@@ -0,0 +1,165 @@
+"""
+Request tracing and structured logging.
+
+Each sampled request gets a Trace (held in a context variable, so it
+follows the request into awaited calls and asyncio.to_thread workers).
+Code marks stages with span(); the finished trace is summarized into a
+Server-Timing header and one structured log record. Tasks that outlive
+the request or are shared between requests run in detached_context(), so
+their spans don't land on whichever request happened to start them.
+
+Log records from the app are emitted through a QueueHandler so the
+request path never blocks on stdout; a QueueListener thread writes them
+out as JSON lines.
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+from contextlib import contextmanager
+from contextvars import Context, ContextVar, copy_context
+from uuid import uuid4
+
+_current_trace: ContextVar["Trace | None"] = ContextVar("current_trace", default=None)
+_listener: logging.handlers.QueueListener | None = None
+_queue_handler: logging.handlers.QueueHandler | None = None
+
+# Attributes every LogRecord has; anything else was passed via extra= and is logged as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class Trace:
+    def __init__(self, trace_id: str | None = None):
+        self.trace_id = trace_id or uuid4().hex[:16]
+        self.start = time.perf_counter()
+        self.spans: list[dict] = []
+        self._stack: list[int] = []
+
+    def timings(self) -> list[tuple[str, float, int]]:
+        """(name, total ms, count) per span name, in first-seen order."""
+        totals: dict[str, list] = {}
+        for s in self.spans:
+            entry = totals.setdefault(s["name"], [0.0, 0])
+            entry[0] += s["duration_ms"]
+            entry[1] += 1
+        return [(name, ms, count) for name, (ms, count) in totals.items()]
+
+    def server_timing(self, total_ms: float) -> str:
+        parts = []
+        for name, ms, count in self.timings():
+            part = f"{name};dur={ms:.1f}"
+            if count > 1:
+                part += f';desc="x{count}"'
+            parts.append(part)
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+def detached_context() -> Context:
+    """A copy of the current context without the request's trace, for background and shared tasks."""
+    context = copy_context()
+    context.run(_current_trace.set, None)
+    return context
+
+
+def start_trace(sample_rate: float, force: bool = False) -> Trace | None:
+    """Start a trace for this request if it is sampled (or forced)."""
+    if not force and random.random() >= sample_rate:
+        return None
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Record a timed span on the current trace; a no-op for unsampled requests."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    record = {
+        "name": name,
+        "parent": trace._stack[-1] if trace._stack else None,
+        "offset_ms": round((time.perf_counter() - trace.start) * 1000, 2),
+        **attrs,
+    }
+    trace.spans.append(record)
+    index = len(trace.spans) - 1
+    trace._stack.append(index)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        if trace._stack and trace._stack[-1] == index:
+            trace._stack.pop()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the trace id and any extra= fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        trace = getattr(record, "trace_id", None)
+        if trace:
+            data["trace_id"] = trace
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key not in data:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class _TraceIdFilter(logging.Filter):
+    """Stamp records with the current trace id before they leave the request context."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = _current_trace.get()
+        if trace is not None and not hasattr(record, "trace_id"):
+            record.trace_id = trace.trace_id
+        return True
+
+
+def configure_logging(level: str = "INFO"):
+    """Route the `app` logger through a queue so logging never blocks a request."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    _queue_handler.addFilter(_TraceIdFilter())
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter())
+
+    logger = logging.getLogger("app")
+    logger.setLevel(level.upper())
+    logger.addHandler(_queue_handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        logging.getLogger("app").removeHandler(_queue_handler)
+        _listener.stop()
+        _listener = None
+        _queue_handler = None
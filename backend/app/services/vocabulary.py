@@ -0,0 +1,83 @@
+"""
+Canonical ingredient vocabulary: every ingredient name the app sees is
+resolved once to a dense integer id, so the rest of the pipeline compares
+ints (set / bitset operations) instead of re-lowercasing and re-comparing
+strings.
+
+A name's canonical form is its fuzzy_match tokens joined by spaces, so
+"Tomatoes", "tomato" and "Tomato (diced)" share an id. Aliases map other
+spellings or regional names onto an existing canonical name.
+"""
+
+import threading
+from collections.abc import Iterable
+from functools import lru_cache
+
+from app.services.fuzzy_match import tokenize
+
+# alias → canonical name
+INGREDIENT_ALIASES: dict[str, str] = {
+    "scallion": "green onion",
+    "spring onion": "green onion",
+    "garbanzo bean": "chickpea",
+    "yoghurt": "yogurt",
+    "capsicum": "bell pepper",
+    "coriander": "cilantro",
+    "aubergine": "eggplant",
+    "courgette": "zucchini",
+    "parmigiano-reggiano cheese": "parmesan cheese",
+    "rolled oat": "oat",
+    "sriracha sauce": "sriracha",
+}
+
+
+@lru_cache(maxsize=65536)
+def canonical(name: str) -> str:
+    return " ".join(tokenize(name))
+
+
+class Vocabulary:
+    """Thread-safe interning of canonical ingredient names to dense ids."""
+
+    def __init__(self, aliases: dict[str, str] | None = None):
+        self._ids: dict[str, int] = {}
+        self._names: list[str] = []
+        self._lock = threading.Lock()
+        for alias, target in (aliases or {}).items():
+            self.add_alias(alias, target)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def intern(self, name: str) -> int:
+        """Id for `name`, assigning the next one if it is new."""
+        key = canonical(name)
+        found = self._ids.get(key)
+        if found is not None:
+            return found
+        with self._lock:
+            found = self._ids.get(key)
+            if found is None:
+                found = self._ids[key] = len(self._names)
+                self._names.append(key)
+            return found
+
+    def lookup(self, name: str) -> int | None:
+        """Id for `name` if it is already known; never assigns one."""
+        return self._ids.get(canonical(name))
+
+    def add_alias(self, alias: str, target: str):
+        """Make `alias` resolve to the id of `target`."""
+        target_id = self.intern(target)
+        with self._lock:
+            self._ids[canonical(alias)] = target_id
+
+    def name(self, ingredient_id: int) -> str:
+        """Canonical name for an id."""
+        return self._names[ingredient_id]
+
+    def intern_all(self, names: Iterable[str]) -> frozenset[int]:
+        return frozenset(self.intern(name) for name in names if name.strip())
+
+
+vocabulary = Vocabulary(INGREDIENT_ALIASES)
@@ -8,33 +8,129 @@ Spreadsheet columns:
   - "Preparation"                  → newline-separated cooking steps
 """
 
-import json
+import logging
 import re
 import asyncio
+import threading
 
 import gspread
+import numpy as np
+import orjson
 from google.oauth2.service_account import Credentials
 from langchain_core.tools import tool
 
 from app.config import settings
-
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
-
-
-def _get_sheet():
-    creds = Credentials.from_service_account_file(
-        settings.GOOGLE_SERVICE_ACCOUNT_JSON, scopes=SCOPES
-    )
-    gc = gspread.authorize(creds)
-    return gc.open_by_key(settings.GOOGLE_SHEETS_RECIPE_SPREADSHEET_ID).sheet1
+from app.services.bm25 import top_k
+from app.services.metrics import time_stage
+from app.services.recipe_index import RecipeCorpus, RecipeIndex
+from app.services.records import RecipeRecord
+from app.services.vocabulary import vocabulary
+
+logger = logging.getLogger(__name__)
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets.readonly",
+    "https://www.googleapis.com/auth/drive.metadata.readonly",  # modifiedTime for change detection
+]
+# The only columns the app reads; everything else in the sheet is never downloaded
+RECIPE_COLUMNS = ("Recipe", "Ingredients", "Ingredient(s) at The Pantry", "Preparation")
+# Without these a fetch is an error, so the index keeps its current corpus
+REQUIRED_COLUMNS = ("Recipe", "Ingredients")
+# Title-token matches count for this fraction of an ingredient match
+TITLE_WEIGHT = 0.5
+
+recipe_index = RecipeIndex(settings.RECIPE_INDEX_DIR, settings.RECIPE_INDEX_TTL_SECONDS)
+
+# Authorized once per process; google-auth refreshes the token on the client's session
+_client: gspread.Client | None = None
+_sheet: gspread.Worksheet | None = None
+_column_letters: dict[str, str] = {}
+_client_lock = threading.Lock()
+
+
+def _get_client() -> gspread.Client:
+    global _client
+    with _client_lock:
+        if _client is None:
+            creds = Credentials.from_service_account_file(
+                settings.GOOGLE_SERVICE_ACCOUNT_JSON, scopes=SCOPES
+            )
+            _client = gspread.authorize(creds)
+        return _client
+
+
+def _get_sheet() -> gspread.Worksheet:
+    global _sheet
+    if _sheet is None:
+        _sheet = _get_client().open_by_key(settings.GOOGLE_SHEETS_RECIPE_SPREADSHEET_ID).sheet1
+    return _sheet
+
+
+def _sheet_version() -> str:
+    """The spreadsheet's Drive modifiedTime, or "" if it can't be read (forces a full fetch)."""
+    try:
+        meta = _get_client().get_file_drive_metadata(settings.GOOGLE_SHEETS_RECIPE_SPREADSHEET_ID)
+    except Exception as e:
+        logger.debug("Sheet version check failed: %s", e)
+        return ""
+    return meta.get("modifiedTime", "")
+
+
+def _locate_columns(sheet: gspread.Worksheet) -> dict[str, str]:
+    """Column letter of each RECIPE_COLUMNS header (header whitespace ignored)."""
+    headers = [h.strip() for h in sheet.row_values(1)]
+    letters = {}
+    for name in RECIPE_COLUMNS:
+        if name in headers:
+            letters[name] = gspread.utils.rowcol_to_a1(1, headers.index(name) + 1).rstrip("1")
+    return letters
 
 
 def _fetch_all_recipes() -> list[dict]:
-    """Fetch all recipes from the spreadsheet (sync). Strip whitespace from keys."""
-    sheet = _get_sheet()
-    raw = sheet.get_all_records()
-    # Strip whitespace from column headers (e.g. "Recipe " → "Recipe")
-    return [{k.strip(): v for k, v in record.items()} for record in raw]
+    """
+    Fetch the recipe columns from the spreadsheet (sync) in one batched
+    values request, as one dict per data row keyed by stripped header.
+    Column positions are remembered and re-located if the header moves.
+    Raises ValueError if a required column is missing or the headers
+    still don't line up after re-locating them.
+    """
+    global _sheet, _column_letters
+    try:
+        sheet = _get_sheet()
+        for attempt in range(2):
+            if not _column_letters or attempt:
+                _column_letters = _locate_columns(sheet)
+            missing = [name for name in REQUIRED_COLUMNS if name not in _column_letters]
+            if missing:
+                _column_letters = {}
+                raise ValueError(f"Recipe sheet is missing columns: {', '.join(missing)}")
+            names = list(_column_letters)
+            ranges = sheet.batch_get([f"{_column_letters[n]}:{_column_letters[n]}" for n in names])
+            columns = [[row[0] if row else "" for row in value_range] for value_range in ranges]
+            if all(col and col[0].strip() == name for name, col in zip(names, columns)):
+                break
+        else:
+            _column_letters = {}
+            raise ValueError("Recipe sheet headers moved during the fetch")
+    except Exception:
+        _sheet = None  # Re-open on the next fetch
+        raise
+
+    n_rows = max((len(col) for col in columns), default=1) - 1
+    by_name = dict(zip(names, columns))
+    return [
+        {name: col[row] if row < len(col) else "" for name, col in by_name.items()}
+        for row in range(1, n_rows + 1)
+    ]
+
+
+def _fetch_if_changed(known_version: str) -> tuple[list[dict] | None, str]:
+    """Recipe rows, or None when the spreadsheet is still at `known_version`."""
+    version = _sheet_version()
+    if version and version == known_version:
+        return None, version
+    with time_stage("sheets_fetch"):
+        return _fetch_all_recipes(), version
 
 
 def _extract_ingredient_name(raw: str) -> str:
@@ -79,69 +175,75 @@ def _parse_ingredient_lines(raw: str) -> list[str]:
     return [line.strip() for line in raw.strip().split("\n") if line.strip()]
 
 
-def _search_recipes_sync(ingredients: list[str], max_results: int = 5) -> list[dict]:
-    """Search recipes by ingredient match percentage."""
-    all_recipes = _fetch_all_recipes()
-    available = {i.strip().lower() for i in ingredients}
-
-    scored = []
-    for idx, recipe in enumerate(all_recipes):
-        title = recipe.get("Recipe", "").strip()
-        if not title:
-            continue
+def get_corpus() -> RecipeCorpus:
+    """The parsed recipe corpus (snapshot-backed, refreshed from the sheet in the background)."""
+    return recipe_index.get(_fetch_if_changed, _extract_ingredient_name, _parse_ingredient_lines)
 
-        # Parse ingredient lines (newline-separated)
-        raw_ingredients = str(recipe.get("Ingredients", ""))
-        ingredient_lines = _parse_ingredient_lines(raw_ingredients)
 
-        if not ingredient_lines:
-            continue
+def _search_recipes_sync(ingredients: list[str], max_results: int = 5, facets: list[str] = ()) -> list[RecipeRecord]:
+    """Search recipes by BM25 relevance to the available ingredients."""
+    corpus = get_corpus()
+    with time_stage("recipe_search"):
+        return _rank_recipes(corpus, ingredients, max_results, facets)
 
-        # Extract base ingredient names for matching
-        ingredient_names = [_extract_ingredient_name(line) for line in ingredient_lines]
 
-        # Match against available ingredients (fuzzy: check if user item appears in recipe item or vice versa)
-        match_count = 0
-        for recipe_ing in ingredient_names:
-            for user_ing in available:
-                if user_ing in recipe_ing or recipe_ing in user_ing:
-                    match_count += 1
-                    break
-
-        match_pct = match_count / len(ingredient_names)
-
-        # Pantry-available ingredients from the spreadsheet
-        pantry_raw = str(recipe.get("Ingredient(s) at The Pantry", ""))
-        pantry_lines = _parse_ingredient_lines(pantry_raw)
-
-        # Preparation steps (newline-separated)
-        prep_raw = str(recipe.get("Preparation", ""))
-        prep_steps = _parse_ingredient_lines(prep_raw)
-
-        scored.append({
-            "id": f"recipe_{idx + 1:03d}",
-            "title": title,
-            "ingredients_raw": raw_ingredients,
-            "ingredient_lines": ingredient_lines,
-            "pantry_ingredients": pantry_lines,
-            "instructions_raw": prep_raw,
-            "instructions": prep_steps,
-            "match_pct": round(match_pct, 2),
-            "match_count": match_count,
-            "total_ingredients": len(ingredient_names),
-        })
-
-    scored.sort(key=lambda x: x["match_pct"], reverse=True)
-    return scored[:max_results]
+def _rank_recipes(
+    corpus: RecipeCorpus, ingredients: list[str], max_results: int, facets: list[str] = (),
+) -> list[RecipeRecord]:
+    """
+    Rank recipes by BM25 relevance to the available ingredients and return the
+    best matches. Recipes missing any of `facets` (e.g. "Vegetarian") are
+    excluded up front via the corpus facet bitmaps.
+    """
+    if not len(corpus):
+        return []
+    mask = corpus.eligible(facets)
+    if mask is not None and not mask.any():
+        return []
+    # Resolve each user item to the corpus names it fuzzy-matches; those names
+    # are the query terms. Known ingredients are memoized per vocabulary id.
+    # Request-only names (client edits, vision output) are matched directly
+    # and never interned, so requests can't grow the vocabulary.
+    name_matches = np.zeros(len(corpus.names), dtype=bool)
+    for name in dict.fromkeys(n for n in ingredients if n.strip()):
+        ingredient_id = vocabulary.lookup(name)
+        if ingredient_id is None:
+            name_matches[corpus.names_matching(name)] = True
+        else:
+            name_matches[corpus.name_ids_matching(ingredient_id)] = True
+    scores = corpus.ingredient_bm25.scores(np.flatnonzero(name_matches))
+    scores += TITLE_WEIGHT * corpus.title_bm25.scores(corpus.title_term_ids(ingredients))
+    if mask is not None:
+        scores[~mask] = 0.0
+    top = top_k(scores, max_results)
+
+    results = []
+    for i in top.tolist():
+        start, stop = int(corpus.line_offsets[i]), int(corpus.line_offsets[i + 1])
+        match_count = int(name_matches[corpus.line_name_ids[start:stop]].sum())
+        results.append(corpus.recipe(
+            i,
+            match_count=match_count,
+            match_pct=round(match_count / (stop - start), 2),
+            relevance=round(float(scores[i]), 3),
+        ))
+    return results
+
+
+async def search_recipes(ingredients: list[str], max_results: int = 5, facets: list[str] = ()) -> list[RecipeRecord]:
+    """The recipes most relevant to `ingredients` (best first), carrying every facet in `facets`."""
+    return await asyncio.to_thread(_search_recipes_sync, ingredients, max_results, facets)
 
 
 @tool
-async def query_recipe_database(ingredients: list[str], max_results: int = 5) -> str:
+async def query_recipe_database(
+    ingredients: list[str], max_results: int = 5, facets: list[str] | None = None
+) -> str:
     """Search the recipe spreadsheet for recipes matching the given ingredients.
-    Returns recipes sorted by how many ingredients match.
+    Returns the most relevant recipes first (rare ingredients count more than staples).
     Args:
         ingredients: list of available ingredient names
         max_results: max number of recipes to return (default 5)
+        facets: only return recipes tagged with all of these (e.g. "Vegetarian", "No-Cook")
     """
-    results = await asyncio.to_thread(_search_recipes_sync, ingredients, max_results)
-    return json.dumps(results)
+    return orjson.dumps(await search_recipes(ingredients, max_results, facets or [])).decode()
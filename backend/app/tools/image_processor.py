@@ -2,13 +2,14 @@
 Vision tool: analyze pantry images.
 
 Primary: YOLOv8 for instant object detection (~0.2s on CPU)
-Fallback: llava via Ollama for items YOLO can't detect (packaged goods, etc.)
+Fallback: llava via Ollama for items YOLO can't detect (packaged goods, etc.),
+on every image or only where YOLO comes up short, depending on VISION_MODE
 """
 
+import asyncio
 import base64
 import io
-import json
-import re
+import threading
 
 from PIL import Image
 from ultralytics import YOLO
@@ -16,9 +17,17 @@ from langchain_ollama import ChatOllama
 from langchain_core.messages import HumanMessage
 
 from app.config import Settings
+from app.services.metrics import VISION_PATHS, time_stage
+from app.services.structured_output import ainvoke_structured
+from app.schemas.llm import DetectedItems
+from app.schemas.scan import VisionMode
 
 MAX_IMAGE_SIZE = 1024
 
+# Scan paths reported to the client
+YOLO_PATH = "yolo"
+LLAVA_PATH = "yolo+llava"
+
 # COCO classes that are food-related
 FOOD_CLASSES = {
     "banana", "apple", "sandwich", "orange", "broccoli",
@@ -38,6 +47,8 @@ LABEL_MAP = {
 
 # Load YOLO model once at module level
 _yolo_model = None
+# Scans decode and detect in worker threads; the predictor isn't thread-safe
+_yolo_lock = threading.Lock()
 
 
 def _get_yolo() -> YOLO:
@@ -66,99 +77,200 @@ def _image_to_b64(img: Image.Image) -> str:
     return base64.b64encode(buf.getvalue()).decode("utf-8")
 
 
-async def analyze_pantry_image(image_bytes: bytes, settings: Settings) -> list[dict]:
+async def analyze_pantry_image(
+    image_bytes: bytes, settings: Settings, mode: VisionMode | None = None
+) -> tuple[list[dict], str]:
     """
     Identify food items in a pantry image.
 
-    Always runs llava for accurate identification (compressed image for speed).
-    YOLO runs in parallel as a fast supplement — its results are merged in.
+    YOLO always runs; whether llava runs too depends on the vision mode
+    (see _needs_llava). When it does, its items come first and YOLO fills
+    the gaps. Returns (items, path taken: "yolo" or "yolo+llava").
     """
-    img = _compress_image(image_bytes)
+    items, paths = await _cascade([image_bytes], settings, mode or settings.VISION_MODE)
+    return items, paths[0]
 
-    # Run YOLO instantly for whatever it can detect
-    yolo_items = _run_yolo(img)
 
-    # Always run llava for full identification (it's far more accurate)
-    try:
-        llava_items = await _run_llava(img, settings)
-    except Exception:
-        llava_items = []
+async def analyze_pantry_images(
+    images: list[bytes], settings: Settings, mode: VisionMode | None = None
+) -> tuple[list[dict], str]:
+    """
+    Identify food items across several photos (cupboard, fridge, shelf...).
 
-    # Merge: llava is primary, YOLO fills gaps
-    seen = set()
-    merged = []
-    for item in llava_items:
-        key = item["name"].lower()
-        if key not in seen:
-            merged.append(item)
-            seen.add(key)
-    for item in yolo_items:
-        key = item["name"].lower()
-        if key not in seen:
-            merged.append(item)
-            seen.add(key)
-
-    return merged
-
-
-def _run_yolo(img: Image.Image) -> list[dict]:
-    """Run YOLOv8 on the image and return food items."""
-    model = _get_yolo()
-    results = model(img, conf=0.3, verbose=False)
+    YOLO runs over all images in one batched forward pass; llava gets one
+    prompt per image that needs it, with at most VISION_BATCH_CONCURRENCY in
+    flight, since llava handles a single image per prompt best. Items are
+    merged and deduplicated across images, keeping each item's highest
+    confidence. The path is "yolo+llava" if any image went to llava.
+    """
+    items, paths = await _cascade(images, settings, mode or settings.VISION_MODE)
+    return items, LLAVA_PATH if LLAVA_PATH in paths else YOLO_PATH
+
+
+async def _cascade(images: list[bytes], settings: Settings, mode: VisionMode) -> tuple[list[dict], list[str]]:
+    """YOLO on every image, llava on those _needs_llava picks; merged items and the path per image."""
+    images_b64, detections = await _decode_and_detect(images, settings, encode=mode != "fast")
+    yolo_items = [items for items, _ in detections]
+    needs_llava = [_needs_llava(items, coverage, mode, settings) for items, coverage in detections]
+
+    semaphore = asyncio.Semaphore(max(1, settings.VISION_BATCH_CONCURRENCY))
+
+    async def identify(image_b64: str) -> list[dict]:
+        async with semaphore:
+            try:
+                with time_stage("llava"):
+                    return await _run_llava(image_b64, settings)
+            except Exception:
+                return []
+
+    llava_items = await asyncio.gather(*(
+        identify(image_b64) for image_b64, needed in zip(images_b64, needs_llava) if needed
+    ))
+
+    paths = [LLAVA_PATH if needed else YOLO_PATH for needed in needs_llava]
+    for path in paths:
+        VISION_PATHS.inc(mode, path)
+    return _merge_items(llava_items, yolo_items), paths
+
+
+def _needs_llava(items: list[dict], coverage: float, mode: VisionMode, settings: Settings) -> bool:
+    """
+    fast: never. accurate: always. auto: when YOLO found fewer than
+    VISION_AUTO_MIN_ITEMS food items, any of them below
+    VISION_AUTO_MIN_CONFIDENCE, or food made up less than
+    VISION_AUTO_MIN_COVERAGE of the objects it detected (the rest being
+    bottles, cups and the like that llava can name).
+    """
+    if mode == "fast":
+        return False
+    if mode == "accurate":
+        return True
+    return (
+        len(items) < settings.VISION_AUTO_MIN_ITEMS
+        or coverage < settings.VISION_AUTO_MIN_COVERAGE
+        or any(item["confidence"] < settings.VISION_AUTO_MIN_CONFIDENCE for item in items)
+    )
+
+
+async def _decode_and_detect(
+    images: list[bytes], settings: Settings, encode: bool = True
+) -> tuple[list[str | None], list[tuple[list[dict], float]]]:
+    """
+    The CPU part of a scan: decode and resize each image, JPEG-encode it for
+    llava (unless `encode` is off) and run YOLO. Returns (base64 JPEG or None,
+    (YOLO items, food coverage)) per image. Runs in the vision process pool
+    with VISION_PROCESS_POOL, else in a worker thread of this process so the
+    event loop keeps serving other requests meanwhile.
+    """
+    if settings.VISION_PROCESS_POOL:
+        from app.tools import vision_pool
+
+        return await vision_pool.analyze(images, settings, encode)
+
+    return await asyncio.to_thread(_decode_and_detect_sync, images, encode)
+
+
+def _decode_and_detect_sync(
+    images: list[bytes], encode: bool
+) -> tuple[list[str | None], list[tuple[list[dict], float]]]:
+    with time_stage("image_decode"):
+        imgs = [_compress_image(data) for data in images]
+
+    with time_stage("yolo"):
+        detections = _run_yolo_batch(imgs)
+
+    return [_image_to_b64(img) if encode else None for img in imgs], detections
+
+
+def _merge_items(llava_items: list[list[dict]], yolo_items: list[list[dict]]) -> list[dict]:
+    """Deduplicate by name: llava items first, YOLO fills gaps; keep the highest confidence."""
+    merged: dict[str, dict] = {}
+    for items in [*llava_items, *yolo_items]:
+        for item in items:
+            key = item["name"].lower()
+            if key not in merged:
+                merged[key] = dict(item)
+            elif item["confidence"] > merged[key]["confidence"]:
+                merged[key]["confidence"] = item["confidence"]
+    return list(merged.values())
 
+
+def _run_yolo_batch(imgs: list[Image.Image]) -> list[tuple[list[dict], float]]:
+    """Run YOLOv8 over several images in one batched call; (food items, food coverage) per image."""
+    if not imgs:
+        return []
+    with _yolo_lock:
+        results = _get_yolo()(imgs, conf=0.3, verbose=False)
+    return [_detections(r) for r in results]
+
+
+def warm_up_yolo():
+    """Load the YOLO weights and run one dummy inference (the first call also builds the predictor)."""
+    _run_yolo_batch([Image.new("RGB", (640, 640))])
+
+
+def _detections(r) -> tuple[list[dict], float]:
+    """
+    Food items from one YOLO result, and the share of its detected objects
+    (utensils aside) that are food: 0.0 when it detected nothing.
+    """
     items = []
     seen = set()
-    for r in results:
-        for box in r.boxes:
-            label = r.names[int(box.cls)]
-            conf = round(float(box.conf), 2)
+    objects = food = 0
+    for box in r.boxes:
+        label = r.names[int(box.cls)]
+        conf = round(float(box.conf), 2)
 
-            # Skip non-food items
-            if label not in FOOD_CLASSES:
-                continue
+        if LABEL_MAP.get(label, label) is not None:
+            objects += 1
 
-            # Apply label mapping
-            mapped = LABEL_MAP.get(label, label)
-            if mapped is None:
-                continue
+        # Skip non-food items
+        if label not in FOOD_CLASSES:
+            continue
+        food += 1
 
-            # Capitalize properly
-            display_name = mapped.title()
+        # Apply label mapping
+        mapped = LABEL_MAP.get(label, label)
+        if mapped is None:
+            continue
 
-            # Deduplicate (don't list "Banana" 4 times)
-            if display_name.lower() in seen:
-                continue
-            seen.add(display_name.lower())
+        # Capitalize properly
+        display_name = mapped.title()
 
-            items.append({
-                "name": display_name,
-                "confidence": conf,
-            })
+        # Deduplicate (don't list "Banana" 4 times)
+        if display_name.lower() in seen:
+            continue
+        seen.add(display_name.lower())
 
-    return items
+        items.append({
+            "name": display_name,
+            "confidence": conf,
+        })
 
+    return items, food / objects if objects else 0.0
 
-async def _run_llava(img: Image.Image, settings: Settings) -> list[dict]:
-    """Fallback: use llava for detailed food identification."""
+
+async def _run_llava(image_b64: str, settings: Settings) -> list[dict]:
+    """Fallback: use llava for detailed food identification (reply constrained to the DetectedItems schema)."""
     llm = ChatOllama(
         model=settings.OLLAMA_VISION_MODEL,
         base_url=settings.OLLAMA_BASE_URL,
+        keep_alive=settings.OLLAMA_KEEP_ALIVE,
         temperature=0,
+        format=DetectedItems.model_json_schema(),
     )
 
-    image_b64 = _image_to_b64(img)
-
     message = HumanMessage(
         content=[
             {
                 "type": "text",
                 "text": (
                     "You are a food identification assistant. Identify ALL food items "
-                    "visible in this pantry/grocery image. Return ONLY a JSON array of "
-                    "objects, each with 'name' (string, the food item) and 'confidence' "
-                    "(float 0-1, how confident you are). Example:\n"
-                    '[{"name": "Peanut Butter", "confidence": 0.95}]\n'
-                    "Return ONLY the JSON array, no other text."
+                    "visible in this pantry/grocery image. Return ONLY a JSON object whose "
+                    "'items' is an array of objects, each with 'name' (string, the food item) "
+                    "and 'confidence' (float 0-1, how confident you are). Example:\n"
+                    '{"items": [{"name": "Peanut Butter", "confidence": 0.95}]}\n'
+                    "Return ONLY the JSON object, no other text."
                 ),
             },
             {
@@ -168,38 +280,5 @@ async def _run_llava(img: Image.Image, settings: Settings) -> list[dict]:
         ]
     )
 
-    response = await llm.ainvoke([message])
-    return _parse_items_response(response.content)
-
-
-def _parse_items_response(content: str) -> list[dict]:
-    """Parse LLM response into a list of identified items."""
-    try:
-        items = json.loads(content)
-        if isinstance(items, list):
-            return _validate_items(items)
-    except json.JSONDecodeError:
-        pass
-
-    match = re.search(r"\[.*\]", content, re.DOTALL)
-    if match:
-        try:
-            items = json.loads(match.group())
-            if isinstance(items, list):
-                return _validate_items(items)
-        except json.JSONDecodeError:
-            pass
-
-    return []
-
-
-def _validate_items(items: list) -> list[dict]:
-    """Ensure each item has name and confidence fields."""
-    validated = []
-    for item in items:
-        if isinstance(item, dict) and "name" in item:
-            validated.append({
-                "name": str(item["name"]),
-                "confidence": float(item.get("confidence", 0.7)),
-            })
-    return validated
+    result = await ainvoke_structured(llm, [message], DetectedItems, "ollama", "vision")
+    return [item.model_dump() for item in result.items]
@@ -5,15 +5,28 @@ Uses httpx directly with Notion-Version 2022-06-28 because the
 notion-client SDK v2.7+ uses the 2025-09-03 API which broke databases.query.
 """
 
-import json
+import time
+
 import httpx
+import orjson
 from langchain_core.tools import tool
 
 from app.config import settings
+from app.services.metrics import time_stage
+from app.services.pantry_cache import PantryCache
+from app.services.records import PantryItem
 
 NOTION_API_BASE = "https://api.notion.com/v1"
 NOTION_VERSION = "2022-06-28"
 
+# Every pantry read goes through this cache (incremental sync, shared snapshot)
+pantry_cache = PantryCache(
+    ttl_seconds=settings.PANTRY_CACHE_TTL_SECONDS,
+    incremental=settings.PANTRY_SYNC_INCREMENTAL,
+    full_resync_seconds=settings.PANTRY_FULL_RESYNC_SECONDS,
+    shared_path=settings.PANTRY_SHARED_CACHE_PATH,
+)
+
 
 def _headers() -> dict:
     return {
@@ -23,50 +36,57 @@ def _headers() -> dict:
     }
 
 
-async def _query_database(db_id: str, filter_body: dict | None = None) -> list[dict]:
-    """Query a single Notion database and return parsed items."""
-    body = filter_body or {}
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            f"{NOTION_API_BASE}/databases/{db_id}/query",
-            headers=_headers(),
-            json=body,
-        )
-    if resp.status_code != 200:
-        return []
+def _parse_page(page: dict) -> PantryItem | None:
+    """Pantry item from a Notion page, or None if it has no name."""
+    props = page["properties"]
+    try:
+        name = props["Name"]["title"][0]["plain_text"]
+    except (KeyError, IndexError):
+        return None
 
-    data = resp.json()
-    items = []
-    for page in data.get("results", []):
-        props = page["properties"]
-        try:
-            name = props["Name"]["title"][0]["plain_text"]
-        except (KeyError, IndexError):
-            continue
+    cat = props.get("Category", {}).get("select", {})
+    category = cat.get("name", "Unknown") if cat else "Unknown"
 
-        cat = props.get("Category", {}).get("select", {})
-        category = cat.get("name", "Unknown") if cat else "Unknown"
+    # Availability can be "status" or "select" depending on API version
+    avail_prop = props.get("Availability", {})
+    avail_type = avail_prop.get("type", "")
+    if avail_type == "status":
+        avail_name = avail_prop.get("status", {}).get("name", "")
+    elif avail_type == "select":
+        sel = avail_prop.get("select")
+        avail_name = sel.get("name", "") if sel else ""
+    else:
+        avail_name = ""
 
-        # Availability can be "status" or "select" depending on API version
-        avail_prop = props.get("Availability", {})
-        avail_type = avail_prop.get("type", "")
-        if avail_type == "status":
-            avail_name = avail_prop.get("status", {}).get("name", "")
-        elif avail_type == "select":
-            sel = avail_prop.get("select")
-            avail_name = sel.get("name", "") if sel else ""
-        else:
-            avail_name = ""
+    is_available = avail_name.lower() == "in stock"
 
-        is_available = avail_name.lower() == "in stock"
+    return PantryItem.create(name.strip(), category, is_available)
 
-        items.append({
-            "name": name.strip(),
-            "category": category,
-            "available": is_available,
-        })
 
-    return items
+async def _query_pages(db_id: str, filter_body: dict | None = None) -> list[dict] | None:
+    """All pages of a Notion database query (following next_cursor); None on error."""
+    body = dict(filter_body or {})
+    pages = []
+    async with httpx.AsyncClient() as client:
+        while True:
+            resp = await client.post(
+                f"{NOTION_API_BASE}/databases/{db_id}/query",
+                headers=_headers(),
+                json=body,
+            )
+            if resp.status_code != 200:
+                return None
+            data = resp.json()
+            pages.extend(data.get("results", []))
+            if not data.get("has_more") or not data.get("next_cursor"):
+                return pages
+            body["start_cursor"] = data["next_cursor"]
+
+
+async def _query_database(db_id: str, filter_body: dict | None = None) -> list[PantryItem]:
+    """Query a single Notion database and return parsed items."""
+    pages = await _query_pages(db_id, filter_body) or []
+    return [item for item in map(_parse_page, pages) if item is not None]
 
 
 async def _find_child_databases(page_id: str) -> list[str]:
@@ -82,7 +102,7 @@ async def _find_child_databases(page_id: str) -> list[str]:
     return [b["id"] for b in blocks if b["type"] == "child_database"]
 
 
-async def get_all_pantry_items() -> list[dict]:
+async def get_all_pantry_items() -> list[PantryItem]:
     """
     Query all child databases under the ASUCD Pantry page
     and return a merged, deduplicated list of available items.
@@ -91,43 +111,131 @@ async def get_all_pantry_items() -> list[dict]:
         return []
 
     page_id = settings.NOTION_PANTRY_DATABASE_ID
-    db_ids = await _find_child_databases(page_id)
+    with time_stage("notion_fetch"):
+        db_ids = await _find_child_databases(page_id)
+
+        all_items = []
+        for db_id in db_ids:
+            items = await _query_database(db_id)
+            all_items.extend(items)
+
+    return _dedupe(all_items)
 
-    all_items = []
-    for db_id in db_ids:
-        items = await _query_database(db_id)
-        all_items.extend(items)
 
-    # Deduplicate by name (keep the first occurrence with availability info)
+def _dedupe(all_items: list[PantryItem]) -> list[PantryItem]:
+    """Deduplicate by name (keep the first occurrence with availability info)."""
     seen = {}
     for item in all_items:
-        key = item["name"].lower()
+        key = item.name.lower()
         if key not in seen:
             seen[key] = item
-        elif item["available"] and not seen[key]["available"]:
+        elif item.available and not seen[key].available:
             seen[key] = item  # prefer "In stock" version
 
     return list(seen.values())
 
 
-@tool
-async def query_pantry_inventory(category: str = "") -> str:
-    """Query the ASUCD Pantry Notion database for currently available items.
-    Optionally filter by category (e.g., 'Produce', 'Canned/Jarred Foods', 'Dry/Baking Goods').
-    Returns a JSON list of available pantry items."""
-
-    all_items = await get_all_pantry_items()
+class IncrementalPantrySync:
+    """
+    Keeps the pantry as a per-database map of page id → item and, between
+    full resyncs, only asks Notion for pages edited since that database's
+    last_edited_time high-water mark. Deleted pages and newly added child
+    databases only show up on a full resync.
+
+    Notion's last_edited_time is minute-granular, so the incremental query
+    uses on_or_after and re-reads the last minute's edits; patching is
+    idempotent.
+    """
 
+    def __init__(self, full_resync_seconds: int = 3600):
+        self._full_resync = full_resync_seconds
+        self._pages: dict[str, dict[str, PantryItem]] = {}
+        self._high_water: dict[str, str] = {}
+        self._last_full: float = 0
+
+    def _apply(self, db_id: str, pages: list[dict]):
+        items = self._pages.setdefault(db_id, {})
+        for page in pages:
+            page_id = page.get("id", "")
+            item = None if page.get("archived") or page.get("in_trash") else _parse_page(page)
+            if item is None:
+                items.pop(page_id, None)
+            else:
+                items[page_id] = item
+            edited = page.get("last_edited_time", "")
+            if edited > self._high_water.get(db_id, ""):
+                self._high_water[db_id] = edited
+
+    async def _full_sync(self):
+        db_ids = await _find_child_databases(settings.NOTION_PANTRY_DATABASE_ID)
+        if not db_ids:
+            # Page lookup failed (or found nothing): keep what we have, and leave
+            # _last_full alone so the next sync retries the full sync
+            return
+
+        old_pages, old_high_water = self._pages, self._high_water
+        self._pages, self._high_water = {}, {}
+        for db_id in db_ids:
+            pages = await _query_pages(db_id)
+            if pages is None:
+                # Keep this database's last known items rather than dropping them
+                self._pages[db_id] = old_pages.get(db_id, {})
+                if db_id in old_high_water:
+                    self._high_water[db_id] = old_high_water[db_id]
+                continue
+            self._apply(db_id, pages)
+        self._last_full = time.time()
+
+    async def _incremental_sync(self):
+        for db_id in self._pages:
+            since = self._high_water.get(db_id)
+            filter_body = {
+                "filter": {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": since}}
+            } if since else None
+            pages = await _query_pages(db_id, filter_body)
+            if pages is None:
+                continue  # Keep this database's last known items; retried next sync
+            self._apply(db_id, pages)
+
+    async def sync(self) -> list[PantryItem]:
+        """Bring the pantry up to date and return the deduplicated item list."""
+        if not settings.NOTION_API_KEY or not settings.NOTION_PANTRY_DATABASE_ID:
+            return []
+
+        with time_stage("notion_fetch"):
+            if time.time() - self._last_full > self._full_resync:
+                await self._full_sync()
+            else:
+                await self._incremental_sync()
+
+        return _dedupe([item for items in self._pages.values() for item in items.values()])
+
+
+def filter_food_items(all_items: list[PantryItem], category: str = "") -> list[PantryItem]:
+    """Drop non-food categories and optionally keep a single category."""
     # Return all pantry food items (for substitution engine to use as swap options)
     # Filter out non-food categories
     non_food = {"personal care"}
-    food_items = [i for i in all_items if i["category"].lower() not in non_food]
+    food_items = [i for i in all_items if i.category.lower() not in non_food]
 
     # Optional category filter
     if category:
         food_items = [
             i for i in food_items
-            if i["category"].lower() == category.lower()
+            if i.category.lower() == category.lower()
         ]
 
-    return json.dumps(food_items)
+    return food_items
+
+
+async def get_pantry_food_items(category: str = "") -> list[PantryItem]:
+    """Currently available pantry food items, optionally from one category (served from pantry_cache)."""
+    return filter_food_items(await pantry_cache.get_items(), category)
+
+
+@tool
+async def query_pantry_inventory(category: str = "") -> str:
+    """Query the ASUCD Pantry Notion database for currently available items.
+    Optionally filter by category (e.g., 'Produce', 'Canned/Jarred Foods', 'Dry/Baking Goods').
+    Returns a JSON list of available pantry items."""
+    return orjson.dumps(await get_pantry_food_items(category)).decode()
@@ -3,6 +3,8 @@ LangChain tool: wraps the Substitution Expert chain as a callable tool.
 """
 
 import json
+
+import orjson
 from langchain_core.tools import tool
 
 from app.agents.substitution_expert import run_substitution_check as _run_check
@@ -30,4 +32,4 @@ async def run_substitution_check(recipe_ingredients: str, pantry_items: str) ->
         pantry_items=pantry,
         settings=settings,
     )
-    return json.dumps(result)
+    return orjson.dumps(result).decode()
@@ -0,0 +1,173 @@
+"""
+Process pool for the CPU half of a scan: image decode, resize, the JPEG
+re-encode for llava (skipped in the "fast" vision mode), and YOLO detection.
+
+By default that work runs in the API process and competes for the GIL with
+request handling. With VISION_PROCESS_POOL it runs in worker processes
+instead, so one API process can use every core for scans.
+
+Frames don't go through pickle. The uploads are copied into one shared
+memory segment. Each decode task (one per image, spread over the workers)
+writes its resized RGB frame into a fixed-size slot of a second segment.
+Then a single detect task runs YOLO over those slots in one batched
+forward pass. Only the small results (item lists, the JPEG for llava)
+come back through the pool's pipe.
+
+Workers are spawned (torch doesn't survive a fork) and load YOLO in their
+initializer, so the detector stays resident for the life of the pool.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from app.config import Settings
+from app.services.metrics import time_stage
+from app.tools.image_processor import MAX_IMAGE_SIZE, _compress_image, _detections, _get_yolo, _image_to_b64, warm_up_yolo
+
+logger = logging.getLogger(__name__)
+
+# One frame slot: the largest image _compress_image can return, RGB
+FRAME_BYTES = MAX_IMAGE_SIZE * MAX_IMAGE_SIZE * 3
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def pool_size(settings: Settings) -> int:
+    return settings.VISION_POOL_WORKERS if settings.VISION_POOL_WORKERS > 0 else available_cores()
+
+
+def _get_pool(settings: Settings) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        workers = pool_size(settings)
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            # Split the cores between workers so torch doesn't oversubscribe them
+            initargs=(max(1, available_cores() // workers),),
+        )
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def warm_up(settings: Settings):
+    """Start every worker and make sure each has YOLO loaded (raises if it can't load)."""
+    pool = _get_pool(settings)
+    # Submitting one task per worker at once makes the pool spawn all of them
+    futures = [pool.submit(_ping) for _ in range(pool_size(settings))]
+    for future in futures:
+        future.result()
+
+
+async def analyze(
+    images: list[bytes], settings: Settings, encode: bool = True
+) -> tuple[list[str | None], list[tuple[list[dict], float]]]:
+    """
+    Decode, resize and detect `images` in the pool: (JPEG base64 for llava,
+    or None without `encode`; (YOLO items, food coverage)) per image.
+    """
+    pool = _get_pool(settings)
+    loop = asyncio.get_running_loop()
+    offsets = np.cumsum([0, *map(len, images)]).tolist()
+    uploads = SharedMemory(create=True, size=max(1, offsets[-1]))
+    frames = SharedMemory(create=True, size=FRAME_BYTES * len(images))
+    try:
+        for data, start in zip(images, offsets):
+            uploads.buf[start:start + len(data)] = data
+
+        with time_stage("image_decode"):
+            decoded = await asyncio.gather(*(
+                loop.run_in_executor(pool, _decode, uploads.name, start, end, frames.name, slot, encode)
+                for slot, (start, end) in enumerate(zip(offsets, offsets[1:]))
+            ))
+        shapes = [(height, width) for height, width, _ in decoded]
+
+        with time_stage("yolo"):
+            detections = await loop.run_in_executor(pool, _detect, frames.name, shapes)
+    except BrokenProcessPool:
+        shutdown()  # A worker died; start a fresh pool on the next scan
+        raise
+    finally:
+        uploads.close()
+        uploads.unlink()
+        frames.close()
+        frames.unlink()
+
+    return [image_b64 for _, _, image_b64 in decoded], detections
+
+
+# ---------- Worker side ----------
+
+def _init_worker(torch_threads: int):
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    try:
+        warm_up_yolo()
+    except Exception as e:
+        # Scans will surface the error; don't kill the worker over it
+        logger.warning("YOLO failed to load in vision worker", extra={"error": str(e)})
+
+
+def _ping() -> int:
+    _get_yolo()
+    return os.getpid()
+
+
+def _decode(
+    uploads_name: str, start: int, end: int, frames_name: str, slot: int, encode: bool
+) -> tuple[int, int, str | None]:
+    """Decode one upload into its frame slot; returns the frame's shape and the JPEG for llava (if `encode`)."""
+    uploads = SharedMemory(name=uploads_name)
+    frames = SharedMemory(name=frames_name)
+    try:
+        img = _compress_image(bytes(uploads.buf[start:end]))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        pixels = np.asarray(img)
+        height, width = pixels.shape[:2]
+        frame = np.ndarray((height, width, 3), dtype=np.uint8, buffer=frames.buf, offset=slot * FRAME_BYTES)
+        frame[:] = pixels
+        del frame  # Release the view so the segment can close
+        return height, width, _image_to_b64(img) if encode else None
+    finally:
+        uploads.close()
+        frames.close()
+
+
+def _detect(frames_name: str, shapes: list[tuple[int, int]]) -> list[tuple[list[dict], float]]:
+    """YOLO over the decoded frames in one batched call; (food items, food coverage) per frame."""
+    frames = SharedMemory(name=frames_name)
+    try:
+        # Ultralytics takes NumPy frames as BGR. The flip copies, which also keeps
+        # the predictor (it holds on to its last inputs) off the shared buffer.
+        batch = [
+            np.ascontiguousarray(
+                np.ndarray((height, width, 3), dtype=np.uint8, buffer=frames.buf, offset=slot * FRAME_BYTES)[..., ::-1]
+            )
+            for slot, (height, width) in enumerate(shapes)
+        ]
+    finally:
+        frames.close()
+    results = _get_yolo()(batch, conf=0.3, verbose=False)
+    return [_detections(r) for r in results]
@@ -0,0 +1,117 @@
+"""
+Synthetic data generators for the benchmarks.
+
+Everything is seeded so two runs at the same size see the same corpus.
+Names are drawn from the real nutrient/substitution tables plus a long
+tail of made-up ingredients, so both hit and miss paths get exercised.
+"""
+
+import io
+import json
+import random
+
+from PIL import Image
+
+from app.services.academic_fuel import NUTRIENT_PROFILES
+from app.services.records import PantryItem
+from app.agents.substitution_expert import SUBSTITUTION_TABLE
+
+QUANTITIES = ["1", "2", "1/2", "¼", "3", "1-2", "½", "200", ""]
+UNITS = ["cup", "cups", "tbsp", "tsp", "oz", "lbs", "can of", "slices", "cloves", "pinch", ""]
+ADJECTIVES = ["fresh", "large", "chopped", "diced", "dried", "ground", "ripe", "organic", "canned", ""]
+PREP_NOTES = ["", "", ", finely chopped", ", drained", ", to taste", ", at room temperature"]
+CATEGORIES = ["Produce", "Canned/Jarred Foods", "Dry/Baking Goods", "Dairy", "Frozen", "Personal Care"]
+
+
+def ingredient_vocabulary(size: int = 2000, seed: int = 0) -> list[str]:
+    """Known ingredient names followed by synthetic long-tail names."""
+    rng = random.Random(seed)
+    known = sorted(set(NUTRIENT_PROFILES) | set(SUBSTITUTION_TABLE))
+    vocab = list(known)
+    syllables = ["ka", "lo", "mi", "ra", "ten", "bu", "sho", "pa", "zel", "qui", "dor", "fen"]
+    while len(vocab) < size:
+        word = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.3:
+            word = f"{word} {rng.choice(known)}"
+        vocab.append(word)
+    return vocab
+
+
+def ingredient_line(rng: random.Random, vocab: list[str]) -> str:
+    """One free-form recipe ingredient line, e.g. '2 cups chopped spinach, drained'."""
+    parts = [rng.choice(QUANTITIES), rng.choice(UNITS), rng.choice(ADJECTIVES), rng.choice(vocab)]
+    return " ".join(p for p in parts if p) + rng.choice(PREP_NOTES)
+
+
+def ingredient_lines(n: int, seed: int = 0, vocab: list[str] | None = None) -> list[str]:
+    rng = random.Random(seed)
+    vocab = vocab or ingredient_vocabulary(seed=seed)
+    return [ingredient_line(rng, vocab) for _ in range(n)]
+
+
+def recipe_sheet(n_recipes: int, seed: int = 0, vocab: list[str] | None = None) -> list[dict]:
+    """Rows shaped like _fetch_all_recipes() output (header whitespace already stripped)."""
+    rng = random.Random(seed)
+    vocab = vocab or ingredient_vocabulary(seed=seed)
+    rows = []
+    for i in range(n_recipes):
+        lines = [ingredient_line(rng, vocab) for _ in range(rng.randint(3, 14))]
+        steps = [f"Step {j + 1}: cook the {rng.choice(vocab)} for {rng.randint(1, 20)} minutes"
+                 for j in range(rng.randint(2, 8))]
+        rows.append({
+            "Recipe": f"Synthetic Recipe {i + 1}",
+            "Ingredients": "\n".join(lines),
+            "Ingredient(s) at The Pantry": "\n".join(rng.sample(lines, k=min(2, len(lines)))),
+            "Preparation": "\n".join(steps),
+        })
+    return rows
+
+
+def pantry_inventory(n_items: int, seed: int = 0, vocab: list[str] | None = None) -> list[PantryItem]:
+    """Items like get_all_pantry_items() output."""
+    rng = random.Random(seed + 1)
+    vocab = vocab or ingredient_vocabulary(size=max(2000, n_items), seed=seed)
+    names = rng.sample(vocab, k=min(n_items, len(vocab)))
+    return [
+        PantryItem.create(name.title(), rng.choice(CATEGORIES), rng.random() < 0.7)
+        for name in names
+    ]
+
+
+def llm_recipes_response(n_recipes: int, seed: int = 0, wrapped: bool = False) -> str:
+    """A generative-chef style LLM reply; `wrapped` adds prose around the JSON."""
+    rng = random.Random(seed)
+    vocab = ingredient_vocabulary(seed=seed)
+    recipes = [
+        {
+            "title": f"Chef Special {i + 1}",
+            "ingredients": [
+                {"name": rng.choice(vocab), "quantity": f"{rng.randint(1, 4)} cups"}
+                for _ in range(rng.randint(3, 10))
+            ],
+            "instructions": [f"Step {j + 1}..." for j in range(rng.randint(3, 8))],
+        }
+        for i in range(n_recipes)
+    ]
+    body = json.dumps(recipes, indent=2)
+    if wrapped:
+        return f"Sure! Here are some recipes you can make:\n```json\n{body}\n```\nEnjoy!"
+    return body
+
+
+def pantry_photo(width: int = 4032, height: int = 3024, fmt: str = "JPEG", seed: int = 0) -> bytes:
+    """Encoded image bytes at phone-camera resolution."""
+    rng = random.Random(seed)
+    img = Image.new("RGB", (width, height), (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+    # Some structure so the encoder/decoder does real work
+    for _ in range(200):
+        x, y = rng.randint(0, width - 1), rng.randint(0, height - 1)
+        w, h = rng.randint(20, width // 4), rng.randint(20, height // 4)
+        color = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+        img.paste(color, (x, y, min(width, x + w), min(height, y + h)))
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        img.save(buf, format=fmt, quality=90)
+    else:
+        img.save(buf, format=fmt)
+    return buf.getvalue()
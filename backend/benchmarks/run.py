@@ -0,0 +1,249 @@
+"""
+Microbenchmarks for the pure (no network, no LLM) hot paths.
+
+Run from backend/:
+    python -m benchmarks.run                                  # default sizes
+    python -m benchmarks.run --recipes 1000,10000,100000 --pantry 100,1000,5000
+    python -m benchmarks.run --only search,fuel --out before.json
+    python -m benchmarks.run --compare before.json --out after.json
+
+Results are written as JSON (one entry per benchmark x size) so two runs
+can be diffed with --compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks import generators
+
+DEFAULT_RECIPES = "1000,10000"
+DEFAULT_PANTRY = "100,1000"
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def _time(fn, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _result(name: str, params: dict, n_items: int, timings: list[float]) -> dict:
+    median = statistics.median(timings)
+    return {
+        "name": name,
+        "params": params,
+        "n_items": n_items,
+        "repeat": len(timings),
+        "min_s": min(timings),
+        "median_s": median,
+        "mean_s": statistics.fmean(timings),
+        "per_item_us": median / n_items * 1e6 if n_items else None,
+    }
+
+
+# ---------- Benchmarks ----------
+# Each yields result dicts for every size it runs at.
+
+def bench_search(recipe_sizes, pantry_sizes, repeat):
+    """_search_recipes_sync over an in-memory index of a stubbed sheet: user items + pantry vs corpus."""
+    from app.services.recipe_index import RecipeIndex
+    from app.services.vocabulary import vocabulary
+    from app.tools import google_sheets_recipes as sheets
+
+    original_fetch, original_index = sheets._fetch_all_recipes, sheets.recipe_index
+    try:
+        for n_recipes in recipe_sizes:
+            rows = generators.recipe_sheet(n_recipes)
+            sheets._fetch_all_recipes = lambda rows=rows: rows
+            sheets.recipe_index = RecipeIndex()
+            sheets.get_corpus()
+            for n_pantry in pantry_sizes:
+                available = [item.name for item in generators.pantry_inventory(n_pantry)]
+                vocabulary.intern_all(available)  # As PantryCache does for the pantry it serves
+                timings = _time(lambda: sheets._search_recipes_sync(available, 5), repeat)
+                yield _result("search_recipes", {"recipes": n_recipes, "available": n_pantry}, n_recipes, timings)
+    finally:
+        sheets._fetch_all_recipes, sheets.recipe_index = original_fetch, original_index
+
+
+def bench_index(recipe_sizes, pantry_sizes, repeat):
+    """Building the recipe corpus from sheet rows vs saving / memory-mapping its snapshot."""
+    import tempfile
+    from app.services.recipe_index import RecipeCorpus
+    from app.tools.google_sheets_recipes import _extract_ingredient_name, _parse_ingredient_lines
+
+    for n_recipes in recipe_sizes:
+        rows = generators.recipe_sheet(n_recipes)
+        build = lambda: RecipeCorpus.build(rows, _extract_ingredient_name, _parse_ingredient_lines)
+        timings = _time(build, repeat)
+        yield _result("recipe_index_build", {"recipes": n_recipes}, n_recipes, timings)
+
+        corpus = build()
+        with tempfile.TemporaryDirectory() as root:
+            timings = _time(lambda: corpus.save(root), repeat)
+            yield _result("recipe_index_save", {"recipes": n_recipes}, n_recipes, timings)
+            timings = _time(lambda: RecipeCorpus.load(root), repeat)
+            yield _result("recipe_index_load", {"recipes": n_recipes}, n_recipes, timings)
+
+
+def bench_normalize(recipe_sizes, pantry_sizes, repeat):
+    """_extract_ingredient_name and _normalize_ingredient over raw ingredient lines."""
+    from app.tools.google_sheets_recipes import _extract_ingredient_name
+    from app.agents.substitution_expert import _normalize_ingredient
+
+    for n_recipes in recipe_sizes:
+        lines = generators.ingredient_lines(n_recipes * 8)
+        for name, fn in (("extract_ingredient_name", _extract_ingredient_name),
+                         ("normalize_ingredient", _normalize_ingredient)):
+            timings = _time(lambda fn=fn: [fn(line) for line in lines], repeat)
+            yield _result(name, {"lines": len(lines)}, len(lines), timings)
+
+
+def bench_substitution(recipe_sizes, pantry_sizes, repeat):
+    """_is_available against pantries of each size, and _find_substitution table lookups."""
+    from app.agents.substitution_expert import _is_available, _find_substitution
+    from app.services.fuzzy_match import FuzzyIndex
+
+    lines = generators.ingredient_lines(2000)
+    for n_pantry in pantry_sizes:
+        pantry = FuzzyIndex(item.name.lower() for item in generators.pantry_inventory(n_pantry))
+        timings = _time(lambda: [_is_available(line, pantry) for line in lines], repeat)
+        yield _result("is_available", {"lines": len(lines), "pantry": n_pantry}, len(lines), timings)
+
+    timings = _time(lambda: [_find_substitution(line) for line in lines], repeat)
+    yield _result("find_substitution", {"lines": len(lines)}, len(lines), timings)
+
+
+def bench_fuel(recipe_sizes, pantry_sizes, repeat):
+    """calculate_academic_fuel_score per recipe vs calculate_academic_fuel_scores over the batch."""
+    from app.services.academic_fuel import calculate_academic_fuel_score, calculate_academic_fuel_scores
+    from app.tools.google_sheets_recipes import _extract_ingredient_name
+
+    for n_recipes in recipe_sizes:
+        rows = generators.recipe_sheet(n_recipes)
+        recipes = [
+            [_extract_ingredient_name(line) for line in row["Ingredients"].split("\n")]
+            for row in rows
+        ]
+        timings = _time(lambda: [calculate_academic_fuel_score(names) for names in recipes], repeat)
+        yield _result("academic_fuel_score", {"recipes": n_recipes}, n_recipes, timings)
+        timings = _time(lambda: calculate_academic_fuel_scores(recipes), repeat)
+        yield _result("academic_fuel_scores_batch", {"recipes": n_recipes}, n_recipes, timings)
+
+
+def bench_parse_recipes(recipe_sizes, pantry_sizes, repeat):
+    """parse_structured(GeneratedRecipes) on clean JSON and on prose-wrapped JSON."""
+    from app.schemas.llm import GeneratedRecipes
+    from app.services.structured_output import parse_structured
+
+    for wrapped in (False, True):
+        for n in (3, 50):
+            content = generators.llm_recipes_response(n, wrapped=wrapped)
+            batch = 200
+            timings = _time(lambda: [parse_structured(content, GeneratedRecipes) for _ in range(batch)], repeat)
+            yield _result("parse_recipes_json", {"recipes": n, "wrapped": wrapped}, batch, timings)
+
+
+def bench_compress_image(recipe_sizes, pantry_sizes, repeat):
+    """_compress_image (decode + resize) on phone-sized JPEG and PNG uploads."""
+    from app.tools.image_processor import _compress_image
+
+    for fmt, (w, h) in (("JPEG", (4032, 3024)), ("JPEG", (1280, 960)), ("PNG", (2048, 1536))):
+        data = generators.pantry_photo(w, h, fmt=fmt)
+        timings = _time(lambda: _compress_image(data), repeat)
+        yield _result("compress_image", {"format": fmt, "width": w, "height": h, "bytes": len(data)}, 1, timings)
+
+
+BENCHMARKS = {
+    "search": bench_search,
+    "index": bench_index,
+    "normalize": bench_normalize,
+    "substitution": bench_substitution,
+    "fuel": bench_fuel,
+    "parse": bench_parse_recipes,
+    "image": bench_compress_image,
+}
+
+
+# ---------- Reporting ----------
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _key(result: dict) -> str:
+    return f"{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+
+
+def _print_result(result: dict, baseline: dict | None):
+    line = f"{_key(result):<70} median {result['median_s'] * 1000:10.2f} ms"
+    if result["per_item_us"] is not None:
+        line += f"  ({result['per_item_us']:.2f} µs/item)"
+    if baseline is not None:
+        line += f"  x{result['median_s'] / baseline['median_s']:.2f} vs baseline"
+    print(line, flush=True)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", default=DEFAULT_RECIPES, help="comma-separated corpus sizes")
+    parser.add_argument("--pantry", default=DEFAULT_PANTRY, help="comma-separated pantry sizes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", default="", help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--out", default="", help="JSON output path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default="", help="previous results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    recipe_sizes = [int(s) for s in args.recipes.split(",") if s]
+    pantry_sizes = [int(s) for s in args.pantry.split(",") if s]
+    selected = [s for s in args.only.split(",") if s] or list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {_key(r): r for r in json.load(f)["results"]}
+
+    results = []
+    for name in selected:
+        for result in BENCHMARKS[name](recipe_sizes, pantry_sizes, args.repeat):
+            _print_result(result, baseline.get(_key(result)))
+            results.append(result)
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(out, "w") as f:
+        json.dump({
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "git_commit": _git_commit(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "args": vars(args),
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"Wrote {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Local stand-ins for the upstream services the backend talks to.
+
+Each fake is a small FastAPI app that speaks just enough of the real API
+for app.main to run unmodified against it:
+
+  - Notion:  GET /v1/blocks/{id}/children, POST /v1/databases/{id}/query
+  - Ollama:  GET /api/tags, POST /api/chat (vision + text, streaming NDJSON),
+             POST /api/generate (preload only), GET /api/ps
+  - Groq:    POST /openai/v1/chat/completions (OpenAI-compatible)
+
+Latency, error rate and a requests-per-minute limit are configurable per
+fake via Behavior.
+"""
+
+import asyncio
+import json
+import random
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.records import PantryItem
+
+
+@dataclass
+class Behavior:
+    """How a fake upstream misbehaves."""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rpm_limit: int = 0  # 0 = unlimited
+    seed: int = 0
+    _calls: deque = field(default_factory=deque, repr=False)
+    _rng: random.Random = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+
+    async def delay(self, scale: float = 1.0):
+        ms = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        if ms > 0:
+            await asyncio.sleep(ms * scale / 1000)
+
+    def should_fail(self) -> bool:
+        return self._rng.random() < self.error_rate
+
+    def rate_limited(self) -> float | None:
+        """Seconds until a slot frees up if over the RPM limit, else None (and count the call)."""
+        if not self.rpm_limit:
+            return None
+        now = time.monotonic()
+        while self._calls and now - self._calls[0] > 60:
+            self._calls.popleft()
+        if len(self._calls) >= self.rpm_limit:
+            return 60 - (now - self._calls[0])
+        self._calls.append(now)
+        return None
+
+    @classmethod
+    def parse(cls, spec: str) -> "Behavior":
+        """Build from 'latency=200,jitter=50,errors=0.01,rpm=30'."""
+        keys = {"latency": "latency_ms", "jitter": "jitter_ms", "errors": "error_rate", "rpm": "rpm_limit", "seed": "seed"}
+        kwargs = {}
+        for part in filter(None, spec.split(",")):
+            key, _, value = part.partition("=")
+            name = keys[key.strip()]
+            kwargs[name] = int(value) if name in ("rpm_limit", "seed") else float(value)
+        return cls(**kwargs)
+
+
+async def _gate(behavior: Behavior, limited_headers=None) -> JSONResponse | None:
+    """Apply rate limit, latency and random errors; return an error response or None."""
+    wait = behavior.rate_limited()
+    if wait is not None:
+        headers = {"retry-after": str(max(1, int(wait)))}
+        if limited_headers:
+            headers.update(limited_headers(wait))
+        return JSONResponse({"error": {"message": "Rate limit reached", "type": "rate_limit"}}, 429, headers)
+    await behavior.delay()
+    if behavior.should_fail():
+        return JSONResponse({"error": {"message": "Injected upstream failure"}}, 500)
+    return None
+
+
+def _json_list_after(label: str, text: str) -> list:
+    """Pull the JSON list that follows `label:` in one of our prompts."""
+    match = re.search(re.escape(label) + r":\s*(\[.*?\])", text, re.DOTALL)
+    if not match:
+        return []
+    try:
+        return json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return []
+
+
+def fake_llm_reply(prompt: str, has_images: bool, rng: random.Random) -> str:
+    """Plausible content for each of the app's prompts."""
+    if has_images:
+        foods = ["Peanut Butter", "Rice", "Black Beans", "Oats", "Banana", "Pasta", "Tuna", "Soy Sauce"]
+        return json.dumps({"items": [
+            {"name": name, "confidence": round(rng.uniform(0.6, 0.99), 2)}
+            for name in rng.sample(foods, k=rng.randint(2, 6))
+        ]})
+    if "substitution expert" in prompt:
+        missing = _json_list_after("Missing ingredients", prompt)
+        return json.dumps({str(name): f"any pantry stand-in for {name}" for name in missing})
+    if "expert chef" in prompt:
+        available = _json_list_after("Available ingredients", prompt) or ["rice"]
+        return json.dumps({"recipes": [
+            {
+                "title": f"Load Test Bowl {i + 1}",
+                "ingredients": [
+                    {"name": name, "quantity": "1 cup"}
+                    for name in rng.sample(available, k=min(len(available), 4))
+                ],
+                "instructions": ["Combine everything.", "Heat and serve."],
+            }
+            for i in range(rng.randint(1, 3))
+        ]})
+    return "{}"
+
+
+def _prompt_text(messages: list[dict]) -> tuple[str, bool]:
+    """Flatten chat messages to text and report whether any carried an image."""
+    parts, has_images = [], False
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, list):
+            for block in content:
+                if block.get("type") == "text":
+                    parts.append(block.get("text", ""))
+                elif block.get("type") in ("image_url", "image"):
+                    has_images = True
+        else:
+            parts.append(str(content))
+        if message.get("images"):
+            has_images = True
+    return "\n".join(parts), has_images
+
+
+def build_notion_app(behavior: Behavior, pantry_items: list[PantryItem], n_databases: int = 3) -> FastAPI:
+    """Fake Notion API serving `pantry_items` split across child databases."""
+    app = FastAPI()
+    db_ids = [f"fake-db-{i}" for i in range(n_databases)]
+
+    def page(i: int, item: PantryItem) -> dict:
+        return {
+            "object": "page",
+            "id": f"fake-page-{i}",
+            "last_edited_time": "2026-01-01T00:00:00.000Z",
+            "properties": {
+                "Name": {"type": "title", "title": [{"plain_text": item.name}]},
+                "Category": {"type": "select", "select": {"name": item.category}},
+                "Availability": {
+                    "type": "status",
+                    "status": {"name": "In stock" if item.available else "Out of stock"},
+                },
+            },
+        }
+
+    @app.get("/v1/blocks/{page_id}/children")
+    async def children(page_id: str):
+        if (error := await _gate(behavior)) is not None:
+            return error
+        return {"results": [{"id": db_id, "type": "child_database"} for db_id in db_ids], "has_more": False}
+
+    @app.post("/v1/databases/{db_id}/query")
+    async def query(db_id: str, request: Request):
+        if (error := await _gate(behavior)) is not None:
+            return error
+        if db_id not in db_ids:
+            return JSONResponse({"object": "error", "status": 404}, 404)
+        body = await request.json() if await request.body() else {}
+        shard = db_ids.index(db_id)
+        pages = [page(i, item) for i, item in enumerate(pantry_items) if i % n_databases == shard]
+
+        # Supports the last_edited_time filter and cursor pagination the incremental sync uses
+        since = body.get("filter", {}).get("last_edited_time", {}).get("on_or_after")
+        if since:
+            pages = [p for p in pages if p["last_edited_time"] >= since]
+        start = int(body.get("start_cursor") or 0)
+        size = min(int(body.get("page_size", 100)), 100)
+        end = start + size
+        more = end < len(pages)
+        return {"object": "list", "results": pages[start:end], "has_more": more, "next_cursor": str(end) if more else None}
+
+    return app
+
+
+def build_ollama_app(behavior: Behavior, vision_latency_scale: float = 3.0) -> FastAPI:
+    """Fake Ollama server. Vision calls take `vision_latency_scale` x the text latency."""
+    app = FastAPI()
+    loaded: dict[str, str] = {}  # model -> keep_alive it was last loaded with
+
+    def load(model: str, keep_alive):
+        name = model if ":" in model else f"{model}:latest"
+        loaded[name] = str(keep_alive or "5m")
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "llava:latest"}, {"name": "llama3:latest"}]}
+
+    @app.get("/api/ps")
+    async def ps():
+        return {"models": [{"name": name, "model": name, "keep_alive": keep} for name, keep in loaded.items()]}
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        # Only the empty-prompt preload the backend sends at startup / keep-warm
+        body = await request.json()
+        await behavior.delay()
+        load(body.get("model", "llama3"), body.get("keep_alive"))
+        return {"model": body.get("model"), "response": "", "done": True, "done_reason": "load"}
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        prompt, has_images = _prompt_text(body.get("messages", []))
+        wait = behavior.rate_limited()
+        if wait is not None:
+            return JSONResponse({"error": "server busy"}, 503)
+        await behavior.delay(vision_latency_scale if has_images else 1.0)
+        if behavior.should_fail():
+            return JSONResponse({"error": "Injected upstream failure"}, 500)
+
+        content = fake_llm_reply(prompt, has_images, behavior._rng)
+        model = body.get("model", "llama3")
+        load(model, body.get("keep_alive"))
+        created = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        final = {
+            "model": model, "created_at": created,
+            "message": {"role": "assistant", "content": ""},
+            "done": True, "done_reason": "stop",
+            "prompt_eval_count": len(prompt) // 4, "eval_count": len(content) // 4,
+        }
+        if not body.get("stream", True):
+            final["message"]["content"] = content
+            return final
+
+        async def stream():
+            step = max(1, len(content) // 4)
+            for i in range(0, len(content), step):
+                chunk = {"model": model, "created_at": created,
+                         "message": {"role": "assistant", "content": content[i:i + step]}, "done": False}
+                yield json.dumps(chunk) + "\n"
+            yield json.dumps(final) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    return app
+
+
+def build_groq_app(behavior: Behavior) -> FastAPI:
+    """Fake Groq (OpenAI-compatible) chat completions endpoint with rate-limit headers."""
+    app = FastAPI()
+
+    def limit_headers(wait: float) -> dict:
+        return {
+            "x-ratelimit-limit-requests": str(behavior.rpm_limit),
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": f"{wait:.2f}s",
+        }
+
+    @app.post("/openai/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        if (error := await _gate(behavior, limit_headers)) is not None:
+            return error
+        prompt, has_images = _prompt_text(body.get("messages", []))
+        content = fake_llm_reply(prompt, has_images, behavior._rng)
+        headers = {}
+        if behavior.rpm_limit:
+            headers = {
+                "x-ratelimit-limit-requests": str(behavior.rpm_limit),
+                "x-ratelimit-remaining-requests": str(max(0, behavior.rpm_limit - len(behavior._calls))),
+            }
+        return JSONResponse({
+            "id": f"chatcmpl-{behavior._rng.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "llama-3.1-8b-instant"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            },
+        }, headers=headers)
+
+    return app
@@ -0,0 +1,35 @@
+"""
+Fixture loaders that replace upstreams we don't fake over HTTP.
+
+The Google Sheets fetch goes through gspread's own auth flow, so instead
+of a fake server the sheet fetch is swapped for a fixture loader.
+"""
+
+import json
+import time
+
+from app.services.recipe_index import RecipeIndex
+from benchmarks import generators
+
+
+def load_sheet_rows(path: str = "", n_recipes: int = 500) -> list[dict]:
+    """Rows from a JSON fixture (list of sheet records), or a synthetic sheet."""
+    if path:
+        with open(path) as f:
+            rows = json.load(f)
+        return [{k.strip(): v for k, v in row.items()} for row in rows]
+    return generators.recipe_sheet(n_recipes)
+
+
+def install_sheet_fixture(rows: list[dict], latency_ms: float = 0.0):
+    """Point the recipe tool's sheet fetch at `rows`, with optional simulated fetch latency."""
+    from app.tools import google_sheets_recipes
+
+    def fetch_fixture() -> list[dict]:
+        if latency_ms:
+            time.sleep(latency_ms / 1000)  # Runs in a worker thread like the real fetch
+        return rows
+
+    google_sheets_recipes._fetch_all_recipes = fetch_fixture
+    # Fresh in-memory index: don't read or overwrite the on-disk snapshot
+    google_sheets_recipes.recipe_index = RecipeIndex()
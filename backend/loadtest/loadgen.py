@@ -0,0 +1,122 @@
+"""
+Async load generator: N concurrent workers issuing a weighted mix of
+requests against a running backend, reporting per-endpoint throughput and
+latency percentiles.
+"""
+
+import asyncio
+import math
+import random
+import time
+from uuid import uuid4
+
+import httpx
+
+DEFAULT_ITEMS = ["Peanut Butter", "Rice", "Black Beans", "Oats", "Soy Sauce"]
+
+
+def percentile(sorted_values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        base_url: str,
+        mix: dict[str, float],
+        image_bytes: bytes,
+        concurrency: int = 10,
+        timeout: float = 120.0,
+        seed: int = 0,
+    ):
+        self.base_url = base_url
+        self.mix = mix
+        self.image_bytes = image_bytes
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._rng = random.Random(seed)
+        self._sessions: list[str] = []
+        self._samples: dict[str, list[tuple[float, int]]] = {name: [] for name in mix}
+
+    def _pick(self) -> str:
+        names = list(self.mix)
+        return self._rng.choices(names, weights=[self.mix[n] for n in names])[0]
+
+    async def _request(self, client: httpx.AsyncClient, endpoint: str) -> int:
+        if endpoint in ("scan", "scan-batch"):
+            if endpoint == "scan":
+                resp = await client.post("/scan", files={"image": ("pantry.jpg", self.image_bytes, "image/jpeg")})
+            else:
+                files = [("images", (f"pantry{i}.jpg", self.image_bytes, "image/jpeg")) for i in range(3)]
+                resp = await client.post("/scan/batch", files=files)
+            if resp.status_code == 200:
+                self._sessions.append(resp.json()["session_id"])
+                del self._sessions[:-100]
+            return resp.status_code
+        if endpoint == "health":
+            return (await client.get("/health")).status_code
+
+        # generate-recipes / generate-ai-recipe: reuse a scan session when we have one
+        body = {
+            "session_id": self._rng.choice(self._sessions) if self._sessions else str(uuid4()),
+            "identified_items": DEFAULT_ITEMS,
+        }
+        if self._sessions and self._rng.random() < 0.5:
+            body.pop("identified_items")
+        return (await client.post(f"/{endpoint}", json=body)).status_code
+
+    async def _worker(self, client: httpx.AsyncClient, deadline: float, budget: list[int]):
+        while time.monotonic() < deadline and budget[0] != 0:
+            budget[0] -= 1
+            endpoint = self._pick()
+            start = time.perf_counter()
+            try:
+                status = await self._request(client, endpoint)
+            except httpx.HTTPError:
+                status = 0
+            self._samples[endpoint].append((time.perf_counter() - start, status))
+
+    async def run(self, duration: float = 30.0, max_requests: int = -1) -> dict:
+        """Run until `duration` seconds pass or `max_requests` are sent (-1 = no cap)."""
+        budget = [max_requests]
+        limits = httpx.Limits(max_connections=self.concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+            start = time.monotonic()
+            deadline = start + duration
+            await asyncio.gather(*(self._worker(client, deadline, budget) for _ in range(self.concurrency)))
+            elapsed = time.monotonic() - start
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint, samples in self._samples.items():
+            ok = sorted(latency for latency, status in samples if 200 <= status < 300)
+            statuses: dict[str, int] = {}
+            for _, status in samples:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "errors": len(samples) - len(ok),
+                "statuses": statuses,
+                "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+                "p50_ms": _ms(percentile(ok, 50)),
+                "p95_ms": _ms(percentile(ok, 95)),
+                "p99_ms": _ms(percentile(ok, 99)),
+                "max_ms": _ms(ok[-1] if ok else None),
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "elapsed_s": elapsed,
+            "concurrency": self.concurrency,
+            "total_requests": total,
+            "total_throughput_rps": total / elapsed if elapsed else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 2) if seconds is not None else None
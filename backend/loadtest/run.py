@@ -0,0 +1,141 @@
+"""
+End-to-end load test: the real app.main against local fake upstreams.
+
+Run from backend/:
+    python -m loadtest.run --concurrency 20 --duration 60
+    python -m loadtest.run --groq "latency=300,rpm=30" --ollama "latency=1500,errors=0.02"
+    python -m loadtest.run --mix scan=1,generate-recipes=3 --sheet-fixture recipes.json --out report.json
+
+Fake Notion, Ollama and Groq servers are started on free local ports, the
+app's settings are pointed at them, the Google Sheets fetch is replaced
+by a fixture loader, and the app itself is served by uvicorn in-process.
+Groq is only used when --groq is given, mirroring the app's GROQ_API_KEY
+switch.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks import generators
+from loadtest.fakes import Behavior, build_groq_app, build_notion_app, build_ollama_app
+from loadtest.fixtures import install_sheet_fixture, load_sheet_rows
+from loadtest.loadgen import LoadGenerator
+
+HOST = "127.0.0.1"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def _serve(app, port: int) -> uvicorn.Server:
+    """Start a uvicorn server on a background thread and wait until it accepts connections."""
+    server = uvicorn.Server(uvicorn.Config(app, host=HOST, port=port, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in filter(None, spec.split(",")):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--requests", type=int, default=-1, help="stop after this many requests")
+    parser.add_argument("--mix", default="scan=1,generate-recipes=2,generate-ai-recipe=1",
+                        help="endpoint weights; endpoints: scan, scan-batch, generate-recipes, generate-ai-recipe, health")
+    parser.add_argument("--notion", default="latency=150,jitter=50", help="fake Notion behavior")
+    parser.add_argument("--ollama", default="latency=800,jitter=200", help="fake Ollama behavior")
+    parser.add_argument("--groq", default="", help="fake Groq behavior; empty = no Groq key (Ollama only)")
+    parser.add_argument("--vision-scale", type=float, default=3.0, help="vision latency multiplier over text")
+    parser.add_argument("--pantry-items", type=int, default=300)
+    parser.add_argument("--pantry-ttl", type=int, default=300, help="pantry cache TTL seconds")
+    parser.add_argument("--pantry-incremental", action="store_true", help="incremental Notion pantry sync")
+    parser.add_argument("--sheet-fixture", default="", help="JSON list of sheet rows (default: synthetic)")
+    parser.add_argument("--sheet-recipes", type=int, default=500, help="synthetic sheet size")
+    parser.add_argument("--sheet-latency", type=float, default=400.0, help="simulated sheet fetch ms")
+    parser.add_argument("--skip-yolo", action="store_true", help="don't run YOLO (no local weights)")
+    parser.add_argument("--out", default="", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    notion_port = _serve(build_notion_app(Behavior.parse(args.notion), generators.pantry_inventory(args.pantry_items)),
+                         _free_port()).config.port
+    ollama_port = _serve(build_ollama_app(Behavior.parse(args.ollama), args.vision_scale), _free_port()).config.port
+
+    # app.config.settings is shared by every module, so point it at the fakes in place
+    from app.config import settings
+    settings.NOTION_API_KEY = "fake-notion-key"
+    settings.NOTION_PANTRY_DATABASE_ID = "fake-pantry-page"
+    settings.PANTRY_CACHE_TTL_SECONDS = args.pantry_ttl
+    settings.PANTRY_SYNC_INCREMENTAL = args.pantry_incremental
+    settings.OLLAMA_BASE_URL = f"http://{HOST}:{ollama_port}"
+    settings.GROQ_API_KEY = ""
+    if args.groq:
+        groq_port = _serve(build_groq_app(Behavior.parse(args.groq)), _free_port()).config.port
+        settings.GROQ_API_KEY = "fake-groq-key"
+        os.environ["GROQ_API_BASE"] = f"http://{HOST}:{groq_port}"  # read by ChatGroq
+
+    from app import main as app_main
+    from app.tools import notion_pantry, image_processor
+
+    notion_pantry.NOTION_API_BASE = f"http://{HOST}:{notion_port}/v1"
+    install_sheet_fixture(load_sheet_rows(args.sheet_fixture, args.sheet_recipes), args.sheet_latency)
+    if args.skip_yolo:
+        image_processor._run_yolo_batch = lambda imgs: [([], 0.0) for _ in imgs]
+
+    app_port = _serve(app_main.app, _free_port()).config.port
+
+    generator = LoadGenerator(
+        base_url=f"http://{HOST}:{app_port}",
+        mix=_parse_mix(args.mix),
+        image_bytes=generators.pantry_photo(1280, 960),
+        concurrency=args.concurrency,
+    )
+    print(f"Running {args.concurrency} workers for {args.duration}s against {generator.base_url} ...", flush=True)
+    report = asyncio.run(generator.run(args.duration, args.requests))
+    report["config"] = vars(args)
+
+    print(f"\n{'endpoint':<22}{'reqs':>7}{'errs':>6}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"{endpoint:<22}{stats['requests']:>7}{stats['errors']:>6}{stats['throughput_rps']:>8.2f}"
+              f"{stats['p50_ms'] or 0:>10.0f}{stats['p95_ms'] or 0:>10.0f}{stats['p99_ms'] or 0:>10.0f}")
+    print(f"\nTotal: {report['total_requests']} requests in {report['elapsed_s']:.1f}s "
+          f"({report['total_throughput_rps']:.2f} req/s)")
+
+    # Which provider served the LLM calls, and how the Groq rate governor routed them
+    metrics = httpx.get(f"{generator.base_url}/metrics").text
+    report["llm_routing"] = [
+        line for line in metrics.splitlines()
+        if line.startswith(("aggie_llm_calls_total", "aggie_groq_routing_total"))
+    ]
+    for line in report["llm_routing"]:
+        print(line)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
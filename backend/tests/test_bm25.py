@@ -0,0 +1,58 @@
+import numpy as np
+
+from app.services.bm25 import BM25Index, top_k
+
+
+def _index(docs: list[list[int]], n_terms: int) -> BM25Index:
+    offsets = np.cumsum([0] + [len(d) for d in docs])
+    terms = np.array([t for d in docs for t in d], dtype=np.int64)
+    return BM25Index(offsets, terms, n_terms)
+
+
+def test_rare_terms_outweigh_common_ones():
+    # Term 0 ("salt") is in every document, term 1 only in document 2
+    index = _index([[0, 2], [0, 3], [0, 1], [0, 4]], n_terms=5)
+    assert index.idf[1] > index.idf[0]
+    scores = index.scores([0, 1])
+    assert scores.argmax() == 2
+    assert scores[0] == scores[1] == scores[3] > 0
+
+
+def test_shorter_documents_score_higher_for_the_same_match():
+    index = _index([[0, 1], [0, 1, 2, 3, 4, 5]], n_terms=6)
+    scores = index.scores([0])
+    assert scores[0] > scores[1]
+
+
+def test_repeated_terms_saturate():
+    index = _index([[0], [0, 0], [0, 0, 0, 0, 0, 0, 0, 0], [1]], n_terms=2)
+    one, two, eight = index.scores([0])[:3]
+    assert one < two < eight
+    # Term frequency gains are capped by k1: eight occurrences are far from 8x
+    assert eight / one < 3
+
+
+def test_scores_with_no_matches_are_float_zeros():
+    index = _index([[0], [1]], n_terms=3)
+    scores = index.scores([2])
+    assert scores.dtype == np.float64
+    assert not scores.any()
+    assert index.scores(np.array([], dtype=np.int64)).tolist() == [0.0, 0.0]
+
+
+def test_top_k_orders_best_first_and_breaks_ties_by_index():
+    scores = np.array([0, 1, 3, 3, 2, 0], dtype=np.float64)
+    assert top_k(scores, 3).tolist() == [2, 3, 4]
+    assert top_k(scores, 1).tolist() == [2]
+
+
+def test_top_k_skips_zero_scores_and_handles_small_k():
+    scores = np.array([0, 0.5, 0, 0.25])
+    assert top_k(scores, 10).tolist() == [1, 3]
+    assert top_k(scores, 0).tolist() == []
+    assert top_k(np.zeros(4), 2).tolist() == []
+
+
+def test_top_k_keeps_lowest_indices_among_many_ties():
+    scores = np.ones(50)
+    assert top_k(scores, 5).tolist() == [0, 1, 2, 3, 4]
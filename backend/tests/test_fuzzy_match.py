@@ -0,0 +1,59 @@
+from app.services.fuzzy_match import FuzzyIndex, index_for, similarity, singularize, tokenize
+
+
+def test_singularize_folds_common_plurals():
+    assert singularize("tomatoes") == "tomato"
+    assert singularize("berries") == "berry"
+    assert singularize("eggs") == "egg"
+    assert singularize("dishes") == "dish"
+    # Words that only look plural are left alone
+    assert singularize("hummus") == "hummus"
+    assert singularize("glass") == "glass"
+    assert singularize("gas") == "gas"
+
+
+def test_tokenize_drops_parentheticals_stopwords_and_plurals():
+    assert tokenize("Tomatoes (diced)") == ("tomato",)
+    assert tokenize("Cream of Tartar") == ("cream", "tartar")
+    assert tokenize("salt and pepper") == ("salt", "pepper")
+    assert tokenize("(optional)") == ()
+
+
+def test_similarity_token_containment_is_exact_match():
+    assert similarity("oil", "olive oil") == 1.0
+    assert similarity("creamy peanut butter", "peanut butter") == 1.0
+
+
+def test_similarity_spelling_variants_and_unrelated_names():
+    assert similarity("parmesan", "parmesean") >= 0.7
+    assert similarity("oil", "boiled eggs") < 0.7
+    assert similarity("", "rice") == 0.0
+
+
+def test_index_matches_containment_and_spelling_variants():
+    index = FuzzyIndex(["olive oil", "boiled eggs", "parmesean cheese", "Peanut Butter"])
+    assert index.matches("oil") == ["olive oil"]
+    assert index.matches("parmesan cheese") == ["parmesean cheese"]
+    assert index.matches("creamy peanut butter") == ["Peanut Butter"]
+    assert index.matches("chocolate") == []
+
+
+def test_index_agrees_with_pairwise_similarity():
+    names = ["chicken breast", "chickpeas", "green onion", "onion", "red bell pepper", "pepper", "rice"]
+    index = FuzzyIndex(names)
+    for query in ["chicken", "onions", "bell peppers", "brown rice", "chick peas", "tofu"]:
+        expected = {i for i, name in enumerate(names) if similarity(query, name) >= index.threshold}
+        assert index.matching_ids(query) == expected, query
+
+
+def test_contains_and_empty_queries():
+    index = FuzzyIndex(["milk", "eggs"])
+    assert index.contains("whole milk")
+    assert not index.contains("flour")
+    assert not index.contains("(to taste)")
+    assert index.matching_ids("") == set()
+
+
+def test_index_for_reuses_the_index_for_the_same_names():
+    assert index_for(["milk", "eggs"]) is index_for(iter(["milk", "eggs"]))
+    assert index_for(["milk"]) is not index_for(["eggs"])
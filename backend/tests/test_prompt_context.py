@@ -0,0 +1,47 @@
+from app.services.prompt_context import (
+    estimate_tokens,
+    ingredient_role,
+    select_for_generation,
+    select_for_substitution,
+)
+
+
+def test_ingredient_roles():
+    assert ingredient_role("chicken breasts") == "protein"
+    assert ingredient_role("peanut butter") == "protein"
+    assert ingredient_role("Tomatoes (diced)") == "produce"
+    assert ingredient_role("paper towels") is None
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_small_pantries_are_sent_whole():
+    pantry = ["rice", "beans", "rice"]
+    assert select_for_substitution(["lentils"], pantry, budget_tokens=100) == ["rice", "beans"]
+    assert select_for_generation(["beans"], pantry, budget_tokens=100) == ["beans", "rice"]
+
+
+def test_substitution_prefers_similar_and_same_role_items():
+    pantry = [f"snack {i}" for i in range(20)] + ["greek yogurt", "sour cream", "tofu"]
+    selected = select_for_substitution(["plain yogurt", "chicken"], pantry, budget_tokens=12)
+    assert selected[:2] == ["greek yogurt", "tofu"]
+    assert sum(estimate_tokens(s) + 1 for s in selected) <= 12
+
+
+def test_generation_keeps_user_items_and_fills_missing_roles_first():
+    available = ["Chicken", "tofu", "salmon", "rice", "spinach", "olive oil"]
+    selected = select_for_generation(["chicken"], available, budget_tokens=8)
+    assert selected[0] == "Chicken"
+    # Another protein is the least useful addition to a dish that already has one
+    assert not {"tofu", "salmon"} & set(selected[1:])
+    assert len(selected) > 1
+
+
+def test_generation_never_drops_user_items_over_budget():
+    assert select_for_generation(["a very long ingredient name"], ["salt"], budget_tokens=1) == [
+        "a very long ingredient name"
+    ]
@@ -0,0 +1,124 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.rate_governor import RateGovernor, _Budget, parse_reset
+
+
+def test_parse_reset_formats():
+    assert parse_reset("7.66s") == pytest.approx(7.66)
+    assert parse_reset("2m59.56s") == pytest.approx(179.56)
+    assert parse_reset("1h2m3s") == pytest.approx(3723)
+    assert parse_reset("120ms") == pytest.approx(0.12)
+    assert parse_reset("12") == 12.0
+    assert parse_reset("") is None
+    assert parse_reset("soon") is None
+
+
+def test_budget_allows_a_burst_then_spaces_requests():
+    budget = _Budget(limit=3)
+    now = 1000.0
+    for _ in range(3):
+        start = budget.start_time(1, now)
+        assert start == now
+        budget.reserve(1, start)
+    assert budget.start_time(1, now) == pytest.approx(now + 20)
+    budget.release(1)
+    assert budget.start_time(1, now) == now
+
+
+def test_budget_sync_remaining_only_tightens():
+    budget = _Budget(limit=60)
+    now = 1000.0
+    budget.sync_remaining(60, now)
+    assert budget.start_time(1, now) == now
+    budget.sync_remaining(0, now)
+    assert budget.start_time(1, now) == pytest.approx(now + 1)
+    budget.sync_remaining(60, now)
+    assert budget.start_time(1, now) == pytest.approx(now + 1)
+
+
+def test_disabled_budget_never_waits():
+    budget = _Budget(limit=0)
+    budget.reserve(10_000, 5.0)
+    assert budget.start_time(10_000, 5.0) == 5.0
+
+
+def test_acquire_reroutes_when_the_queue_is_longer_than_ollama():
+    async def main():
+        governor = RateGovernor(rpm_limit=2, tpm_limit=0, ollama_latency_seconds=10)
+        assert await governor.acquire("gen", "prompt")
+        assert await governor.acquire("gen", "prompt")
+        assert governor.projected_wait(1) == pytest.approx(30, abs=0.1)
+        # The next slot is 30s away, Ollama takes ~10s: reroute and reserve nothing
+        assert not await governor.acquire("gen", "prompt")
+        assert governor.projected_wait(1) == pytest.approx(30, abs=0.1)
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_gives_back_its_slot():
+    async def main():
+        governor = RateGovernor(rpm_limit=2, tpm_limit=0, ollama_latency_seconds=10)
+        await governor.acquire("gen", "prompt")
+        await governor.acquire("gen", "prompt")
+        queued = asyncio.create_task(governor.acquire("gen", "prompt", can_fall_back=False))
+        await asyncio.sleep(0.01)
+        assert governor.projected_wait(1) == pytest.approx(60, abs=0.1)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert governor.projected_wait(1) == pytest.approx(30, abs=0.1)
+
+    asyncio.run(main())
+
+
+def test_token_budget_counts_prompt_and_completion():
+    async def main():
+        governor = RateGovernor(rpm_limit=0, tpm_limit=1200, ollama_latency_seconds=100)
+        # 400 characters ≈ 100 prompt tokens, plus 500 completion tokens
+        assert await governor.acquire("gen", "x" * 400, completion_tokens=500)
+        assert await governor.acquire("gen", "x" * 400, completion_tokens=500)
+        assert governor.projected_wait(600) == pytest.approx(30, abs=0.1)
+        assert governor.projected_wait(1) == pytest.approx(0.05, abs=0.1)
+
+    asyncio.run(main())
+
+
+def test_ollama_latency_is_an_ewma_per_caller():
+    governor = RateGovernor(rpm_limit=2, tpm_limit=0, ollama_latency_seconds=10)
+    assert governor.expected_ollama_latency("gen") == 10
+    governor.observe_latency("groq", "gen", 1.0)
+    assert governor.expected_ollama_latency("gen") == 10
+    governor.observe_latency("ollama", "gen", 4.0)
+    assert governor.expected_ollama_latency("gen") == 4.0
+    governor.observe_latency("ollama", "gen", 9.0)
+    assert governor.expected_ollama_latency("gen") == pytest.approx(5.0)
+    assert governor.expected_ollama_latency("sub") == 10
+
+
+def test_headers_tighten_the_budgets():
+    governor = RateGovernor(rpm_limit=30, tpm_limit=6000, ollama_latency_seconds=10)
+    assert governor.projected_wait(100) <= 0
+    governor.observe_headers(httpx.Headers({"x-ratelimit-remaining-tokens": "0"}), 200)
+    assert governor.projected_wait(100) == pytest.approx(1, abs=0.1)
+
+    governor = RateGovernor(rpm_limit=30, tpm_limit=6000, ollama_latency_seconds=10)
+    governor.observe_headers(httpx.Headers({"retry-after": "7"}), 429)
+    assert governor.projected_wait(1) == pytest.approx(7, abs=0.1)
+
+    governor = RateGovernor(rpm_limit=30, tpm_limit=6000, ollama_latency_seconds=10)
+    governor.observe_headers(
+        httpx.Headers({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2m"}), 200,
+    )
+    assert governor.projected_wait(1) == pytest.approx(120, abs=0.1)
+
+
+def test_disabled_governor_admits_immediately():
+    async def main():
+        governor = RateGovernor(rpm_limit=0, tpm_limit=0, ollama_latency_seconds=0)
+        assert not governor.enabled
+        assert all([await governor.acquire("gen", "prompt") for _ in range(100)])
+
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+import numpy as np
+
+from app.services.recipe_facets import (
+    ANIMAL_FLAG,
+    DAIRY_FLAG,
+    FACETS,
+    GLUTEN_FLAG,
+    MEAT_FLAG,
+    NUTS_FLAG,
+    PROTEIN_FLAG,
+    eligible,
+    facet_bitmaps,
+    ingredient_flags,
+    recipe_facets,
+    requested_facets,
+)
+
+
+def test_dairy_keywords_and_false_friends():
+    assert ingredient_flags("1 cup cream") == DAIRY_FLAG
+    assert ingredient_flags("shredded cheddar cheese") == DAIRY_FLAG
+    assert ingredient_flags("1 tsp cream of tartar") == 0
+    assert ingredient_flags("coconut milk") == 0
+    assert ingredient_flags("peanut butter") == NUTS_FLAG | PROTEIN_FLAG
+    # An exception phrase only covers its own tokens
+    assert ingredient_flags("peanut butter and milk") & DAIRY_FLAG
+
+
+def test_gluten_keywords_and_exceptions():
+    assert ingredient_flags("spaghetti") == GLUTEN_FLAG
+    assert ingredient_flags("all-purpose flour") == GLUTEN_FLAG
+    assert ingredient_flags("rice noodles") == 0
+    assert ingredient_flags("corn tortillas") == 0
+    assert ingredient_flags("flour tortillas") == GLUTEN_FLAG
+
+
+def test_meat_animal_and_nut_flags():
+    assert ingredient_flags("hot dogs") & MEAT_FLAG
+    assert ingredient_flags("chicken thighs") == MEAT_FLAG | PROTEIN_FLAG
+    assert ingredient_flags("2 eggs") == ANIMAL_FLAG | PROTEIN_FLAG
+    assert ingredient_flags("honey") == ANIMAL_FLAG
+    assert ingredient_flags("coconut") == 0
+    assert ingredient_flags("nutmeg") == 0
+    assert ingredient_flags("chopped walnuts") == NUTS_FLAG
+
+
+def test_recipe_facets_dietary_tags():
+    assert recipe_facets(0, ["Cook the rice."]) >= {"Vegetarian", "Vegan", "No Dairy", "Gluten Free", "Nut Free"}
+    egg = recipe_facets(ANIMAL_FLAG | PROTEIN_FLAG, ["Scramble the eggs."])
+    assert {"Vegetarian", "High Protein"} <= egg
+    assert "Vegan" not in egg
+    meat = recipe_facets(MEAT_FLAG | DAIRY_FLAG | GLUTEN_FLAG, ["Bake for 40 minutes."])
+    assert not meat & {"Vegetarian", "Vegan", "No Dairy", "Gluten Free"}
+
+
+def test_recipe_facets_no_cook_and_quick():
+    assert {"No-Cook", "Quick (<15 min)"} <= recipe_facets(0, ["Slice the apple.", "Spread peanut butter."])
+    assert "No-Cook" not in recipe_facets(0, ["Boil the pasta."])
+    assert "No-Cook" not in recipe_facets(0, [])
+    assert "Quick (<15 min)" in recipe_facets(0, ["Simmer for 10 minutes."])
+    assert "Quick (<15 min)" not in recipe_facets(0, ["Simmer for 20 minutes."])
+    assert "Quick (<15 min)" not in recipe_facets(0, ["Bake for 1 hour."])
+    assert "Quick (<15 min)" not in recipe_facets(0, ["Refrigerate overnight."])
+    many_steps = [f"Step {i}." for i in range(6)]
+    assert "Quick (<15 min)" not in recipe_facets(0, many_steps)
+
+
+def test_requested_facets_are_case_insensitive_and_ordered():
+    assert requested_facets(["vegan", " NUT FREE ", "Halal", "Vegetarian"]) == ["Vegetarian", "Vegan", "Nut Free"]
+    assert requested_facets([]) == []
+
+
+def test_bitmaps_and_eligible_mask():
+    tags = [{"Vegan", "Vegetarian"}, {"Vegetarian"}, set(), {"Vegan", "Vegetarian", "Nut Free"}] * 3
+    bitmaps = facet_bitmaps(tags)
+    assert bitmaps.shape == (len(FACETS), 2)
+    names = list(FACETS)
+    mask = eligible(bitmaps, names, ["Vegan"], len(tags))
+    assert mask.tolist() == ["Vegan" in t for t in tags]
+    both = eligible(bitmaps, names, ["Vegan", "Nut Free"], len(tags))
+    assert np.flatnonzero(both).tolist() == [3, 7, 11]
+    assert eligible(bitmaps, names, [], len(tags)) is None
+    assert eligible(bitmaps, names, ["Halal"], len(tags)) is None
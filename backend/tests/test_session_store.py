@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from app.services.session_store import SessionStore
+
+
+def test_put_and_get_in_memory():
+    async def main():
+        store = SessionStore(ttl_seconds=60)
+        await store.put("s1", {"items": ["milk"]})
+        assert await store.get("s1") == {"items": ["milk"]}
+        assert await store.get("missing") is None
+
+    asyncio.run(main())
+
+
+def test_expired_sessions_are_dropped():
+    async def main():
+        store = SessionStore(ttl_seconds=60)
+        await store.put("s1", {"items": []})
+        store._sessions["s1"] = (time.time() - 61, {"items": []})
+        assert await store.get("s1") is None
+        assert "s1" not in store._sessions
+
+    asyncio.run(main())
+
+
+def test_update_keeps_created_at():
+    async def main():
+        store = SessionStore(ttl_seconds=60)
+        await store.put("s1", {"v": 1})
+        created_at = store._sessions["s1"][0]
+        await asyncio.sleep(0.01)
+        await store.put("s1", {"v": 2})
+        assert store._sessions["s1"] == (created_at, {"v": 2})
+
+    asyncio.run(main())
+
+
+def test_oldest_sessions_are_evicted_from_memory():
+    async def main():
+        store = SessionStore(ttl_seconds=60, max_entries=2)
+        for i in range(3):
+            await store.put(f"s{i}", {"v": i})
+        assert await store.get("s0") is None
+        assert await store.get("s2") == {"v": 2}
+
+    asyncio.run(main())
+
+
+def test_sqlite_tier_survives_eviction_and_restarts(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+
+    async def main():
+        store = SessionStore(ttl_seconds=60, max_entries=1, db_path=db_path)
+        await store.put("s0", {"v": 0})
+        created_at = store._sessions["s0"][0]
+        await store.put("s1", {"v": 1})
+        assert await store.get("s0") == {"v": 0}
+
+        restarted = SessionStore(ttl_seconds=60, db_path=db_path)
+        assert await restarted.get("s1") == {"v": 1}
+        # Re-storing an evicted session keeps its original timestamp
+        await store.put("s1", {"v": 1})
+        await store.put("s0", {"v": 10})
+        assert store._sessions["s0"] == (created_at, {"v": 10})
+
+    asyncio.run(main())
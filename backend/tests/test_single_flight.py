@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight, canonical_key
+
+
+def test_canonical_key_ignores_dict_order():
+    assert canonical_key("gen", {"a": 1, "b": [1, 2]}) == canonical_key("gen", {"b": [1, 2], "a": 1})
+    assert canonical_key("gen", {"a": 1}) != canonical_key("sub", {"a": 1})
+    assert canonical_key([1, 2]) != canonical_key([2, 1])
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def main():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do("k", fetch) for _ in range(5)))
+        assert flights.in_flight() == 0
+        # A later call starts a fresh execution
+        return results, await flights.do("k", fetch)
+
+    results, later = asyncio.run(main())
+    assert results == [1] * 5
+    assert later == 2
+
+
+def test_different_keys_run_separately():
+    async def main():
+        flights = SingleFlight()
+
+        async def value(v):
+            await asyncio.sleep(0)
+            return v
+
+        return await asyncio.gather(flights.do("a", lambda: value("a")), flights.do("b", lambda: value("b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+
+
+def test_exceptions_reach_every_waiter():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do("k", fail) for _ in range(3)), return_exceptions=True)
+        assert flights.in_flight() == 0
+        return results
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_one_waiter_cancelling_keeps_the_call_for_the_others():
+    started = 0
+
+    async def slow():
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flights = SingleFlight()
+        first = asyncio.create_task(flights.do("k", slow))
+        second = asyncio.create_task(flights.do("k", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+    assert started == 1
+
+
+def test_last_waiter_cancelling_cancels_the_call():
+    finished = False
+
+    async def slow():
+        nonlocal finished
+        await asyncio.sleep(0.05)
+        finished = True
+
+    async def main():
+        flights = SingleFlight()
+        waiter = asyncio.create_task(flights.do("k", slow))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert flights.in_flight() == 0
+        await asyncio.sleep(0.08)
+
+    asyncio.run(main())
+    assert not finished
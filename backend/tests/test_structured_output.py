@@ -0,0 +1,63 @@
+import pytest
+
+from app.schemas.llm import DetectedItems, GeneratedRecipe, GeneratedRecipes
+from app.services.structured_output import StructuredOutputError, parse_structured
+
+
+def test_well_formed_reply():
+    parsed = parse_structured('{"items": [{"name": "milk", "confidence": 0.9}]}', DetectedItems)
+    assert [(i.name, i.confidence) for i in parsed.items] == [("milk", 0.9)]
+
+
+def test_fences_and_prose_are_ignored():
+    reply = 'Sure! Here you go:\n```json\n{"items": [{"name": "eggs"}]}\n```\nEnjoy {your} meal.'
+    parsed = parse_structured(reply, DetectedItems)
+    assert [i.name for i in parsed.items] == ["eggs"]
+    assert parsed.items[0].confidence == 0.7
+
+
+def test_bare_array_is_wrapped_into_the_list_field():
+    parsed = parse_structured('[{"name": "rice"}, {"name": "beans"}]', DetectedItems)
+    assert [i.name for i in parsed.items] == ["rice", "beans"]
+    parsed = parse_structured('The items: [{"name": "rice"}]', DetectedItems)
+    assert [i.name for i in parsed.items] == ["rice"]
+
+
+def test_truncated_reply_keeps_the_complete_elements():
+    reply = '{"items": [{"name": "milk", "confidence": 0.9}, {"name": "bread", "confidence": 0.8}, {"name": "ch'
+    parsed = parse_structured(reply, DetectedItems)
+    assert [i.name for i in parsed.items] == ["milk", "bread"]
+
+
+def test_truncated_recipe_drops_the_incomplete_recipe():
+    reply = (
+        '{"recipes": [{"title": "Toast", "ingredients": ["bread"], "instructions": ["Toast it."]},'
+        ' {"title": "Soup", "ingredients": [{"name": "water", "quantity": 2}], "instr'
+    )
+    parsed = parse_structured(reply, GeneratedRecipes)
+    assert [r.title for r in parsed.recipes] == ["Toast"]
+
+
+def test_recipe_validators_accept_loose_shapes():
+    recipe = parse_structured(
+        '{"ingredients": ["bread", {"name": "butter", "quantity": 1}], "instructions": "Toast.\\n\\nButter."}',
+        GeneratedRecipe,
+    )
+    assert recipe.title == "AI Chef Recipe"
+    assert [(i.name, i.quantity) for i in recipe.ingredients] == [("bread", ""), ("butter", "1")]
+    assert recipe.instructions == ["Toast.", "Butter."]
+
+
+@pytest.mark.parametrize("reply", [
+    "I can't see any food in this picture.",
+    '{"items": [{"name": "milk", "confidence": 3}]}',
+    '{"things": []}',
+    '{"items": [{"conf',
+])
+def test_unusable_replies_raise(reply):
+    with pytest.raises(StructuredOutputError):
+        parse_structured(reply, DetectedItems)
+
+
+def test_error_is_a_value_error():
+    assert issubclass(StructuredOutputError, ValueError)
@@ -0,0 +1,51 @@
+import threading
+
+from app.services.vocabulary import Vocabulary, canonical
+
+
+def test_canonical_form():
+    assert canonical("Tomatoes (diced)") == "tomato"
+    assert canonical("Cream of Tartar") == "cream tartar"
+
+
+def test_intern_assigns_dense_ids_to_canonical_names():
+    vocab = Vocabulary()
+    assert vocab.intern("Tomatoes") == 0
+    assert vocab.intern("tomato (diced)") == 0
+    assert vocab.intern("onion") == 1
+    assert len(vocab) == 2
+    assert vocab.name(0) == "tomato"
+    assert vocab.intern_all(["onions", "basil", "  "]) == frozenset({1, 2})
+
+
+def test_lookup_never_assigns():
+    vocab = Vocabulary()
+    assert vocab.lookup("milk") is None
+    assert len(vocab) == 0
+    milk = vocab.intern("milk")
+    assert vocab.lookup("Milk") == milk
+
+
+def test_aliases_share_the_target_id():
+    vocab = Vocabulary({"scallion": "green onion", "yoghurt": "yogurt"})
+    assert vocab.lookup("scallions") == vocab.intern("green onions")
+    assert vocab.intern("Yoghurt") == vocab.lookup("yogurt")
+    assert len(vocab) == 2
+
+
+def test_concurrent_interning_is_consistent():
+    vocab = Vocabulary()
+    names = [f"item {i}" for i in range(200)]
+    results = []
+
+    def work():
+        results.append([vocab.intern(n) for n in names])
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(vocab) == len(names)
+    assert all(r == results[0] for r in results)
+    assert sorted(results[0]) == list(range(len(names)))